@@ -1,5 +1,6 @@
 import os
 import logging
+import threading
 from flask import Flask
 from flask_cors import CORS
 from app.config import Config
@@ -26,7 +27,7 @@ def create_app(test_config=None):
     CORS(app)
 
     # Register models (even if unused directly, this ensures Alembic sees them)
-    from app.models import user, attendance, leave, tour, otp, holiday, leave_balance, weekend_config, whatsapp_config, whatsapp_schedule
+    from app.models import user, attendance, leave, tour, otp, holiday, leave_balance, weekend_config, whatsapp_config, whatsapp_schedule, outbox, job_run, scheduler_lease, import_job, cache_version
 
     # Register all route blueprints here
     from app.routes import auth, attendance, leave_tour, admin, webhook
@@ -37,6 +38,15 @@ def create_app(test_config=None):
     app.register_blueprint(admin.admin_bp)
     app.register_blueprint(webhook.webhook_bp)
 
+    # Compile the email templates once, up front
+    from app import email_templates
+    email_templates.precompile()
+
+    # Pick up cache invalidations committed by other processes
+    if not app.testing:
+        from app.cache_sync import init_cache_sync
+        init_cache_sync(app)
+
     @app.route('/ping')
     def ping():
         return {'message': 'pong'}, 200
@@ -60,9 +70,10 @@ app = create_app()
 
 
 # ── Daily report scheduler ────────────────────────────────────────────
-# Only start the scheduler in the main process (not in Flask reloader's
-# child process) and not during testing.
+_report_scheduler = None
+
 def _start_scheduler():
+    global _report_scheduler
     from app.daily_report import send_daily_report, REPORT_HOUR, REPORT_MINUTE
     from app.office_config import OFFICE_TIMEZONE_NAME
     from app.mail import is_mail_configured
@@ -73,6 +84,8 @@ def _start_scheduler():
         logger.warning("SMTP not configured — daily report disabled. "
                         "Set SMTP_HOST, SMTP_USER, SMTP_PASS, REPORT_RECIPIENTS in .env to enable.")
         return
+    if _report_scheduler is not None:
+        return
 
     scheduler = BackgroundScheduler(daemon=True)
     scheduler.add_job(
@@ -87,194 +100,121 @@ def _start_scheduler():
         misfire_grace_time=3600,  # still run if up to 1 hour late
     )
     scheduler.start()
+    _report_scheduler = scheduler
     logger.info("Daily report scheduled at %02d:%02d %s", REPORT_HOUR, REPORT_MINUTE, OFFICE_TIMEZONE_NAME)
 
 
-# ── WhatsApp scheduled jobs (interval-based, reads times from DB) ─────
+def _stop_scheduler():
+    global _report_scheduler
+    if _report_scheduler is not None:
+        _report_scheduler.shutdown(wait=False)
+        _report_scheduler = None
+
+
+# ── WhatsApp scheduled jobs (cron jobs re-planned from DB config) ────
 def _start_whatsapp_scheduler():
-    from app.whatsapp import is_whatsapp_configured, send_whatsapp_to_all, send_whatsapp_to_all_personalized, _send_single, truncate_name_list
-    from app.office_config import OFFICE_TIMEZONE_NAME, OFFICE_TZ
-    from apscheduler.schedulers.background import BackgroundScheduler
-    from apscheduler.triggers.interval import IntervalTrigger
-    from datetime import datetime
+    from app.whatsapp import is_whatsapp_configured
+    from app.whatsapp_jobs import start_whatsapp_scheduler
 
     if not is_whatsapp_configured():
         logger.warning("WhatsApp not configured — WhatsApp scheduled jobs disabled. "
                         "Set WHATSAPP_PHONE_NUMBER_ID and WHATSAPP_ACCESS_TOKEN in .env to enable.")
         return
 
-    # Track which jobs already fired this minute to avoid duplicates
-    _fired = set()
+    start_whatsapp_scheduler(app)
+
+
+# ── Outbox worker (queued WhatsApp messages / emails) ─────────────────
+def _start_outbox_worker():
+    from app.mail import is_smtp_configured
+    from app.outbox import start_worker
+    from app.whatsapp import is_whatsapp_configured
+
+    # Nothing can be queued without a channel; otherwise drain anything
+    # left over from before a restart straight away.
+    if is_whatsapp_configured() or is_smtp_configured():
+        start_worker(app)
+
+
+# ── Leader election ───────────────────────────────────────────────────
+# Every process that imports this module competes for one lease row; only
+# the holder runs the schedulers and the outbox worker, so they fire once
+# per cluster.  Under gunicorn --preload that's the master of each
+# container — workers are forked afterwards and only serve HTTP.
+def _start_background_jobs():
+    from app.cache_sync import start_cache_sync
+
+    start_cache_sync(app)  # the leader follows schedule changes made by workers
+    _start_scheduler()
+    _start_whatsapp_scheduler()
+    _start_outbox_worker()
+
+
+def _stop_background_jobs():
+    from app.outbox import stop_worker
+    from app.whatsapp_jobs import stop_whatsapp_scheduler
+
+    _stop_scheduler()
+    stop_whatsapp_scheduler()
+    stop_worker(timeout=5)
+
 
-    def _dispatcher():
+def _start_leader_election():
+    from app.leader import start_leader_election
+    from app.mail import is_smtp_configured
+    from app.whatsapp import is_whatsapp_configured
+
+    if not (is_whatsapp_configured() or is_smtp_configured()):
+        logger.warning("Neither WhatsApp nor SMTP configured — no scheduled jobs to run.")
+        return
+    start_leader_election(app, on_elected=_start_background_jobs, on_demoted=_stop_background_jobs)
+
+
+# ── Presence index ("who is in right now") ────────────────────────────
+# Warmed off the request path in every process that serves requests:
+# each gunicorn worker right after --preload forks it, or the dev
+# server's reloader child.  Anywhere else it's built on first use.
+def _warm_presence():
+    from app.presence import warm_presence
+
+    def warm():
         with app.app_context():
-            from app.models.whatsapp_schedule import WhatsAppScheduleConfig
-            from app.models.user import User
-            from app.models.attendance import Attendance
-            from app.office_config import office_today
-
-            now = datetime.now(OFFICE_TZ)
-            current_hm = now.strftime("%H:%M")
-
-            # Reset the fired set at the start of each new minute
-            keys_to_remove = [k for k in _fired if k != current_hm]
-            for k in keys_to_remove:
-                _fired.discard(k)
-
-            config = WhatsAppScheduleConfig.get_current()
-            today = office_today()
-
-            # ── 1. Attendance Reminder → sent to each EMPLOYEE's phone ──
-            if config.reminder_enabled and current_hm == config.reminder_time and f"reminder_{current_hm}" not in _fired:
-                _fired.add(f"reminder_{current_hm}")
-                employees = User.query.filter(User.role != 'admin').all()
-                for emp in employees:
-                    if not emp.notify_reminder:
-                        continue  # employee opted out
-                    record = Attendance.query.filter_by(user_id=emp.id, date=today).first()
-                    if not record or not record.check_in_time:
-                        if not emp.phone_number:
-                            continue  # skip employees without a phone number
-                        # Calculate minutes until morning report
-                        try:
-                            mr_h, mr_m = map(int, config.morning_report_time.split(':'))
-                            rem_h, rem_m = map(int, config.reminder_time.split(':'))
-                            diff = (mr_h * 60 + mr_m) - (rem_h * 60 + rem_m)
-                            time_str = f"{diff} minutes" if diff > 0 else "soon"
-                        except Exception:
-                            time_str = "30 minutes"
-                        _send_single(
-                            to=emp.phone_number,
-                            template_name="daily_attendence_v2",
-                            params=[emp.name, time_str],
-                        )
-                logger.info("Attendance reminders sent to employees.")
-
-            # ── 2. Morning Report ─────────────────────────────────
-            if config.morning_report_enabled and current_hm == config.morning_report_time and f"morning_{current_hm}" not in _fired:
-                _fired.add(f"morning_{current_hm}")
-                employees = User.query.filter(User.role != 'admin').order_by(User.name).all()
-                logged_in = []
-                absent = []
-                for emp in employees:
-                    record = Attendance.query.filter_by(user_id=emp.id, date=today).first()
-                    if record and record.check_in_time:
-                        logged_in.append(emp.name)
-                    else:
-                        absent.append(emp.name)
-                send_whatsapp_to_all_personalized(
-                    template_name="daily_attendence_v3",
-                    params_fn=lambda label: [
-                        label,
-                        truncate_name_list(logged_in),
-                        truncate_name_list(absent),
-                    ],
-                )
-                logger.info("Morning WhatsApp report sent.")
-
-            # ── 3. Logoff Reminder (v5) → nudge for still-checked-in ─
-            if config.logoff_reminder_enabled and current_hm == config.logoff_reminder_time and f"logoff_{current_hm}" not in _fired:
-                _fired.add(f"logoff_{current_hm}")
-                employees = User.query.filter(User.role != 'admin').all()
-
-                # Compute minutes until evening report
-                try:
-                    eve_h, eve_m = map(int, config.evening_report_time.split(':'))
-                    now_h, now_m = map(int, current_hm.split(':'))
-                    diff = (eve_h * 60 + eve_m) - (now_h * 60 + now_m)
-                    if diff <= 0:
-                        diff = 15  # fallback
-                    minutes_label = f"{diff} minutes" if diff != 1 else "1 minute"
-                except Exception:
-                    minutes_label = "15 minutes"
-
-                for emp in employees:
-                    if not emp.notify_checkout:
-                        continue  # employee opted out
-                    record = Attendance.query.filter_by(user_id=emp.id, date=today).first()
-                    if record and record.check_in_time and not record.check_out_time:
-                        if record.is_overtime:
-                            continue  # overtime workers already know
-                        if not emp.phone_number:
-                            continue
-                        _send_single(
-                            to=emp.phone_number,
-                            template_name="daily_attendence_v5",
-                            params=[emp.name, minutes_label],
-                        )
-                logger.info("Logoff reminders (v5) sent to employees.")
-
-            # ── 4. Evening Report ─────────────────────────────────
-            if config.evening_report_enabled and current_hm == config.evening_report_time and f"evening_{current_hm}" not in _fired:
-                _fired.add(f"evening_{current_hm}")
-                employees = User.query.filter(User.role != 'admin').order_by(User.name).all()
-                total = len(employees)
-                logged_out = []
-                ghosted = []
-                still_online = []
-                overtime_workers = []
-                for emp in employees:
-                    record = Attendance.query.filter_by(user_id=emp.id, date=today).first()
-                    if record and record.check_in_time:
-                        if record.check_out_time:
-                            logged_out.append(emp.name)
-                        elif record.is_overtime:
-                            overtime_workers.append(emp.name)
-                        else:
-                            still_online.append(emp.name)
-                    else:
-                        ghosted.append(emp.name)
-
-                # Merge overtime into still_online display for the template
-                all_still_online = still_online + [f"{n} (OT)" for n in overtime_workers]
-                send_whatsapp_to_all_personalized(
-                    template_name="daily_attendence",
-                    params_fn=lambda label: [
-                        label,
-                        str(total),
-                        truncate_name_list(logged_out),
-                        truncate_name_list(ghosted),
-                        truncate_name_list(all_still_online),
-                    ],
-                )
-                logger.info("EOD WhatsApp wrap-up sent.")
-
-            # ── 5. Midnight Oil Alert → only non-overtime employees ─
-            if config.midnight_alert_enabled and current_hm == config.midnight_alert_time and f"midnight_{current_hm}" not in _fired:
-                _fired.add(f"midnight_{current_hm}")
-                employees = User.query.filter(User.role != 'admin').all()
-                for emp in employees:
-                    if not emp.notify_midnight:
-                        continue  # employee opted out
-                    record = Attendance.query.filter_by(user_id=emp.id, date=today).first()
-                    if record and record.check_in_time and not record.check_out_time:
-                        if record.is_overtime:
-                            continue  # skip — employee knowingly working overtime
-                        if not emp.phone_number:
-                            continue  # skip employees without a phone number
-                        _send_single(
-                            to=emp.phone_number,
-                            template_name="attendence_daily_v3",
-                            params=[emp.name],
-                        )
-                logger.info("Midnight oil alerts sent to non-overtime employees.")
+            try:
+                warm_presence()
+            except Exception:
+                logger.warning("Presence index not warmed — it will be built on first use", exc_info=True)
 
-    scheduler = BackgroundScheduler(daemon=True)
-    scheduler.add_job(
-        _dispatcher,
-        trigger=IntervalTrigger(seconds=60),
-        id="whatsapp_dispatcher",
-        replace_existing=True,
-        misfire_grace_time=120,
-    )
-    scheduler.start()
-    logger.info("WhatsApp interval dispatcher started (checks every 60s, timezone=%s)", OFFICE_TIMEZONE_NAME)
+    threading.Thread(target=warm, daemon=True, name="presence-warm").start()
+
+
+# ── Fork safety ──────────────────────────────────────────────────────
+# Under gunicorn --preload this module runs in the master, whose elector,
+# outbox and scheduler threads keep using pooled DB connections.  A forked
+# worker must never share those sockets: drop the inherited pool without
+# closing the master's connections, so the worker opens its own — before
+# anything in the worker (the presence warm-up included) touches the DB.
+def _after_fork_in_worker():
+    with app.app_context():
+        db.engine.dispose(close=False)
+    _warm_presence()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_worker)
+if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    _warm_presence()
+
+
+# ── Live dashboard events (own port, not gunicorn) ───────────────────
+# One server per container: gunicorn.conf.py starts it in the master;
+# the dev server starts it here, in the reloader child serving requests.
+if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    from app.event_stream import start_event_stream
+    start_event_stream(app)
 
 
 # Avoid double-scheduling when Flask reloader is active
 if os.environ.get("WERKZEUG_RUN_MAIN") == "true" or not app.debug:
-    _start_scheduler()
-    _start_whatsapp_scheduler()
+    _start_leader_election()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,207 @@
+"""
+Today's attendance board — one compact, cached snapshot of every
+employee's status for an office day.
+
+The WhatsApp dispatcher, the daily report and the admin dashboard all
+need the same "who is in / out / still online" view.  The board is built
+from a single LEFT OUTER JOIN of users against that day's attendance and
+cached per day; any committed change to an ``Attendance`` or ``User`` row
+(check-in, check-out, overtime toggle, new / deleted employee) drops the
+affected day(s) from the cache.  Other processes drop every day on a
+``User`` change within CACHE_SYNC_SECONDS (app/cache_sync.py); they pick
+up attendance changes — far too frequent to broadcast — after
+BOARD_TTL_SECONDS.
+"""
+
+import itertools
+import logging
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.cache_sync import bump, subscribe
+from app.extensions import db
+from app.models.user import User
+from app.models.attendance import Attendance
+from app.office_config import office_today
+from app.roster import roster_query
+
+logger = logging.getLogger("smartattend.attendance_board")
+
+# Safety net for changes committed by another worker process
+BOARD_TTL_SECONDS = 60
+
+# ── Per-employee status values ───────────────────────────────────────
+ABSENT = 'absent'
+ONLINE = 'online'            # checked in, not checked out, no overtime
+OVERTIME = 'overtime'        # checked in, not checked out, overtime on
+CHECKED_OUT = 'checked_out'
+
+
+class BoardEntry(NamedTuple):
+    """One employee's attendance state for the board's day."""
+    user_id: int
+    name: str
+    email: str
+    phone_number: str | None
+    notify_reminder: bool
+    notify_checkout: bool
+    notify_midnight: bool
+    check_in_time: datetime | None
+    check_out_time: datetime | None
+    is_overtime: bool
+
+    @property
+    def is_present(self) -> bool:
+        return self.check_in_time is not None
+
+    @property
+    def status(self) -> str:
+        if not self.check_in_time:
+            return ABSENT
+        if self.check_out_time:
+            return CHECKED_OUT
+        return OVERTIME if self.is_overtime else ONLINE
+
+
+class AttendanceBoard:
+    """Per-day status of every non-admin employee, ordered by name."""
+
+    def __init__(self, day: date, entries: list[BoardEntry]):
+        self.day = day
+        self.entries = entries
+        self._by_id = {e.user_id: e for e in entries}
+
+    def get(self, user_id: int) -> BoardEntry | None:
+        return self._by_id.get(user_id)
+
+    def with_status(self, *statuses: str) -> list[BoardEntry]:
+        return [e for e in self.entries if e.status in statuses]
+
+    @property
+    def present(self) -> list[BoardEntry]:
+        return [e for e in self.entries if e.is_present]
+
+    @property
+    def absent(self) -> list[BoardEntry]:
+        return self.with_status(ABSENT)
+
+    @property
+    def checked_out(self) -> list[BoardEntry]:
+        return self.with_status(CHECKED_OUT)
+
+    @property
+    def still_online(self) -> list[BoardEntry]:
+        """Checked in and not out, excluding employees on overtime."""
+        return self.with_status(ONLINE)
+
+    @property
+    def overtime(self) -> list[BoardEntry]:
+        return self.with_status(OVERTIME)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_board_cache = TTLCache(maxsize=8, ttl=BOARD_TTL_SECONDS)
+
+
+def build_board(day: date) -> AttendanceBoard:
+    """Build the board for *day* with one query (no caching)."""
+    query = roster_query(User.query.filter(User.role != 'admin'), day).with_entities(
+        User.id, User.name, User.email, User.phone_number,
+        User.notify_reminder, User.notify_checkout, User.notify_midnight,
+        Attendance.check_in_time, Attendance.check_out_time, Attendance.is_overtime,
+    ).order_by(User.name)
+
+    entries = [
+        BoardEntry(
+            user_id=row[0],
+            name=row[1],
+            email=row[2],
+            phone_number=row[3],
+            notify_reminder=bool(row[4]),
+            notify_checkout=bool(row[5]),
+            notify_midnight=bool(row[6]),
+            check_in_time=row[7],
+            check_out_time=row[8],
+            is_overtime=bool(row[9]),
+        )
+        for row in query.all()
+    ]
+    return AttendanceBoard(day, entries)
+
+
+def get_board(day: date | None = None) -> AttendanceBoard:
+    """Return the (cached) board for *day* (default: office today).
+
+    NOTE: Must be called inside an application context.
+    """
+    day = day or office_today()
+    return _board_cache.get_or_set(day, lambda: build_board(day))
+
+
+def invalidate_board(day: date | None = None) -> None:
+    """Drop the cached board for *day*, or every cached day if None."""
+    _versions[_ALL_DAYS if day is None else day] = next(_version_counter)
+    if day is None:
+        _board_cache.clear()
+    else:
+        _board_cache.invalidate(day)
+
+
+def board_versions(start: date, end: date | None = None) -> tuple[int, ...]:
+    """Version stamp of the boards for *start* … *end* (inclusive).
+
+    Changes whenever any of those days is invalidated, so caches derived
+    from the board (rendered reports) can tell whether they are stale.
+    """
+    days = [start] if end is None else [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return (_versions.get(_ALL_DAYS, 0), *(_versions.get(d, 0) for d in days))
+
+
+# ── Automatic invalidation on commit ─────────────────────────────────
+# Attendance changes only affect their own day; user changes (new,
+# renamed, deleted employees, notification preferences) affect them all.
+
+_ALL_DAYS = 'all'
+
+# day (or _ALL_DAYS) -> counter value at its last invalidation
+_versions: dict = {}
+_version_counter = itertools.count(1)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_board_changes(session, flush_context):
+    touched = session.info.setdefault('board_dirty', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Attendance):
+            touched.add(obj.date)
+        elif isinstance(obj, User):
+            touched.add(_ALL_DAYS)
+    if _ALL_DAYS in touched:
+        bump(session, 'users')
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_board_changes(session):
+    touched = session.info.pop('board_dirty', None)
+    if not touched:
+        return
+    if _ALL_DAYS in touched:
+        invalidate_board()
+    else:
+        for day in touched:
+            invalidate_board(day)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_board_changes(session):
+    session.info.pop('board_dirty', None)
+
+
+# Employees added, removed or changed in another process
+subscribe('users', lambda: invalidate_board())
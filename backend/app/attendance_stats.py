@@ -0,0 +1,280 @@
+"""
+Worked-hours and attendance analytics pushed down into SQL.
+
+Durations are summed by the database in one grouped query, bucketed per
+day, ISO week (Monday start) or calendar month, for one employee or many
+at once.  A day that is still open (checked in today, not yet checked
+out) counts up to "now"; open rows from past days are ignored, matching
+the original ``weekly_hours`` behaviour.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from app.extensions import db
+from app.models.attendance import Attendance
+from app.office_config import (
+    office_today, utc_now, OFFICE_TZ, OFFICE_START_HOUR, OFFICE_START_MINUTE,
+)
+from app.workdays import count_working_days
+
+BUCKETS = ('day', 'week', 'month')
+
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def effective_check_out(today: date, now: datetime):
+    """SQL expression: check-out time, or *now* for a row still open *today*."""
+    return db.func.coalesce(
+        Attendance.check_out_time,
+        db.case(
+            (Attendance.date == today, db.literal(now, db.DateTime)),
+            else_=None,
+        ),
+    )
+
+
+def duration_seconds(start, end):
+    """SQL expression: seconds between two DateTime expressions (NULL if either is NULL)."""
+    if _dialect() == 'postgresql':
+        return db.func.extract('epoch', end - start)
+    # SQLite (and tests): julianday() returns fractional days
+    return (db.func.julianday(end) - db.func.julianday(start)) * 86400
+
+
+def _bucket_expr(bucket: str):
+    if bucket == 'day':
+        return Attendance.date
+    if _dialect() == 'postgresql':
+        return db.func.date_trunc(bucket, Attendance.date)
+    if bucket == 'week':
+        return db.func.date(Attendance.date, 'weekday 0', '-6 days')
+    return db.func.date(Attendance.date, 'start of month')
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """Python twin of the SQL bucket expression."""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def hours_by_bucket(start: date, end: date, bucket: str = 'day', user_ids=None) -> dict:
+    """Sum worked seconds per user and bucket between *start* and *end* (inclusive).
+
+    *user_ids*: iterable of ids, or None for every user.
+    Returns ``{user_id: {bucket_start: (seconds, days_present)}}``.
+
+    NOTE: Must be called inside an application context.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+
+    today = office_today()
+    now = utc_now().replace(tzinfo=None)  # naive UTC, as stored
+    seconds = duration_seconds(Attendance.check_in_time, effective_check_out(today, now))
+    bucket_col = _bucket_expr(bucket).label('bucket')
+
+    query = db.session.query(
+        Attendance.user_id,
+        bucket_col,
+        db.func.coalesce(db.func.sum(seconds), 0),
+        db.func.count(Attendance.check_in_time),
+    ).filter(
+        Attendance.date >= start,
+        Attendance.date <= end,
+    ).group_by(Attendance.user_id, bucket_col)
+
+    if user_ids is not None:
+        query = query.filter(Attendance.user_id.in_(list(user_ids)))
+
+    result: dict = defaultdict(dict)
+    for user_id, bucket_value, total_seconds, days_present in query.all():
+        result[user_id][_as_date(bucket_value)] = (float(total_seconds or 0), int(days_present))
+    return result
+
+
+def total_seconds(user_id: int, start: date, end: date) -> float:
+    """Total worked seconds for one user between *start* and *end* (inclusive)."""
+    buckets = hours_by_bucket(start, end, 'month', [user_id]).get(user_id, {})
+    return sum(secs for secs, _days in buckets.values())
+
+
+# ── Organisation-wide analytics ──────────────────────────────────────
+
+def _weekday_expr():
+    """SQL expression: Python-style weekday of Attendance.date (Monday=0 … Sunday=6)."""
+    if _dialect() == 'postgresql':
+        return db.cast(db.func.extract('isodow', Attendance.date), db.Integer) - 1
+    return (db.cast(db.func.strftime('%w', Attendance.date), db.Integer) + 6) % 7
+
+
+def _check_in_offset_seconds():
+    """SQL expression: seconds from UTC midnight of the row's date to its check-in."""
+    if _dialect() == 'postgresql':
+        return db.func.extract('epoch', Attendance.check_in_time - db.cast(Attendance.date, db.DateTime))
+    return (db.func.julianday(Attendance.check_in_time) - db.func.julianday(Attendance.date)) * 86400
+
+
+def _late_thresholds(start: date, end: date) -> list[tuple[date, date, float]]:
+    """Office start time as seconds after UTC midnight, per date range.
+
+    Stored times are UTC, so the threshold shifts whenever the office
+    timezone's UTC offset changes (DST).  Returns contiguous
+    ``(from, to, seconds)`` segments covering *start* … *end*.
+    """
+    local_start = OFFICE_START_HOUR * 3600 + OFFICE_START_MINUTE * 60
+    segments: list[list] = []
+    day = start
+    while day <= end:
+        offset = datetime.combine(
+            day, time(OFFICE_START_HOUR, OFFICE_START_MINUTE), tzinfo=OFFICE_TZ,
+        ).utcoffset().total_seconds()
+        threshold = local_start - offset
+        if segments and segments[-1][2] == threshold:
+            segments[-1][1] = day
+        else:
+            segments.append([day, day, threshold])
+        day += timedelta(days=1)
+    return [tuple(s) for s in segments]
+
+
+def late_threshold_seconds(day: date) -> float:
+    """Office start on *day* as seconds after UTC midnight — the Python
+    twin of the SQL late-arrival check.
+    """
+    return _late_thresholds(day, day)[0][2]
+
+
+def _late_threshold_expr(start: date, end: date):
+    segments = _late_thresholds(start, end)
+    if len(segments) == 1:
+        return db.literal(segments[0][2])
+    return db.case(
+        *[(Attendance.date.between(s, e), db.literal(t)) for s, e, t in segments],
+        else_=db.literal(segments[-1][2]),
+    )
+
+
+def presence_by_day(start: date, end: date) -> dict[date, int]:
+    """Number of employees (admins excluded) who checked in on each day
+    between *start* and *end* (inclusive), from one grouped query.
+    Days nobody checked in are absent from the result.
+    """
+    from app.models.user import User
+
+    rows = db.session.query(
+        Attendance.date, db.func.count(Attendance.check_in_time),
+    ).join(User, User.id == Attendance.user_id).filter(
+        Attendance.date.between(start, end),
+        User.role != 'admin',
+    ).group_by(Attendance.date)
+    return {_as_date(day): int(count) for day, count in rows if count}
+
+
+def employee_analytics(start: date, end: date, grace_minutes: int = 0) -> dict:
+    """Punctuality, hours, late arrivals and absence per employee.
+
+    Everything per-row is done by one grouped SQL aggregate over
+    ``attendance``; Python only combines the per-employee totals with
+    the working-day calendar.  A check-in later than OFFICE_START plus
+    *grace_minutes* counts as a late arrival.  A working day (weekends
+    and holidays excluded) between the employee's join date and
+    min(*end*, today) with no check-in counts as an absence.
+
+    NOTE: Must be called inside an application context.
+    """
+    from app.models.holiday import Holiday
+    from app.models.user import User
+    from app.models.weekend_config import WeekendConfig
+
+    today = office_today()
+    now = utc_now().replace(tzinfo=None)
+    weekend = WeekendConfig.get_current().get_weekend_set()
+
+    seconds = duration_seconds(Attendance.check_in_time, effective_check_out(today, now))
+    late = _check_in_offset_seconds() > _late_threshold_expr(start, end) + (grace_minutes * 60 + 0.5)
+    on_working_day = db.and_(
+        Attendance.check_in_time.isnot(None),
+        _weekday_expr().notin_(sorted(weekend)),
+        Attendance.date.notin_(db.select(Holiday.date)),
+    )
+
+    stats = {
+        row[0]: row[1:]
+        for row in db.session.query(
+            Attendance.user_id,
+            db.func.count(Attendance.check_in_time),
+            db.func.sum(db.case((on_working_day, 1), else_=0)),
+            db.func.sum(db.case((db.and_(Attendance.check_in_time.isnot(None), late), 1), else_=0)),
+            db.func.count(seconds),
+            db.func.coalesce(db.func.sum(seconds), 0),
+        ).filter(
+            Attendance.date.between(start, end),
+        ).group_by(Attendance.user_id).all()
+    }
+
+    employees = db.session.query(User.id, User.name, User.created_at).filter(
+        User.role != 'admin'
+    ).order_by(User.name).all()
+
+    last_day = min(end, today)
+
+    org = {'working_days': 0, 'days_present': 0, 'absent_days': 0,
+           'late_arrivals': 0, 'worked_days': 0, 'total_seconds': 0.0}
+    results = []
+    for user_id, name, created_at in employees:
+        present, present_working, late_count, worked, total = stats.get(user_id, (0, 0, 0, 0, 0))
+        present, present_working, late_count, worked = (
+            int(present), int(present_working or 0), int(late_count or 0), int(worked))
+        total = float(total or 0)
+
+        joined = created_at.date() if created_at else start
+        expected = count_working_days(max(start, joined), last_day)
+        absent = max(expected - present_working, 0)
+
+        results.append({
+            'user_id': user_id,
+            'name': name,
+            'working_days': expected,
+            'days_present': present,
+            'absent_days': absent,
+            'absence_rate': round(absent / expected, 4) if expected else 0.0,
+            'late_arrivals': late_count,
+            'punctuality': round(1 - late_count / present, 4) if present else None,
+            'total_hours': round(total / 3600, 1),
+            'avg_hours': round(total / worked / 3600, 2) if worked else None,
+        })
+
+        org['working_days'] += expected
+        org['days_present'] += present
+        org['absent_days'] += absent
+        org['late_arrivals'] += late_count
+        org['worked_days'] += worked
+        org['total_seconds'] += total
+
+    return {
+        'employees': results,
+        'organisation': {
+            'employees': len(results),
+            'days_present': org['days_present'],
+            'absent_days': org['absent_days'],
+            'absence_rate': round(org['absent_days'] / org['working_days'], 4) if org['working_days'] else 0.0,
+            'late_arrivals': org['late_arrivals'],
+            'punctuality': round(1 - org['late_arrivals'] / org['days_present'], 4) if org['days_present'] else None,
+            'total_hours': round(org['total_seconds'] / 3600, 1),
+            'avg_hours': round(org['total_seconds'] / org['worked_days'] / 3600, 2) if org['worked_days'] else None,
+        },
+    }
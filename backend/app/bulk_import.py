@@ -0,0 +1,226 @@
+"""
+Background bulk employee import.
+
+Password hashing (scrypt/pbkdf2) is deliberately slow, so a large CSV
+can't be imported inside one HTTP request.  ``start_import`` validates
+nothing itself — the route does that — it just queues the parsed rows
+and returns a job whose progress can be polled:
+
+1. existing emails are prefetched in one query;
+2. passwords are hashed on a process pool, a chunk at a time;
+3. each chunk is written with a single bulk INSERT and committed.
+
+Progress is saved to ``bulk_import_jobs`` after every chunk, so a poll
+can land on any worker or container; rows are kept for JOB_TTL_SECONDS,
+which is enough for the admin UI to poll them to completion.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from app.attendance_board import invalidate_board
+from app.cache import TTLCache
+from app.cache_sync import bump
+from app.extensions import db
+from app.models.import_job import BulkImportJob
+from app.models.user import User
+from app.presence import invalidate_presence
+
+logger = logging.getLogger("smartattend.bulk_import")
+
+CHUNK_SIZE = 50
+HASH_WORKERS = min(4, os.cpu_count() or 1)
+JOB_TTL_SECONDS = 3600
+
+# Jobs started by this process, for ``ImportJob.wait``
+_jobs = TTLCache(maxsize=64, ttl=JOB_TTL_SECONDS)
+
+
+class ImportJob:
+    """Working state of one bulk import, in the process running it."""
+
+    def __init__(self, rows: list[dict], errors: list[dict]):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'  # queued → running → done | failed
+        self.rows = rows
+        self.total = len(rows) + len(errors)
+        self.processed = len(errors)
+        self.created: list[dict] = []
+        self.skipped: list[dict] = []
+        self.errors = list(errors)
+        self.error: str | None = None
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self._done = threading.Event()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the job has finished; returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def result(self) -> dict:
+        return {
+            'message': f'{len(self.created)} employee(s) created successfully',
+            'created': self.created,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'summary': {
+                'total_rows': self.total,
+                'created': len(self.created),
+                'skipped': len(self.skipped),
+                'errors': len(self.errors),
+            },
+        }
+
+    def to_dict(self) -> dict:
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'error': self.error,
+        }
+        if self.status == 'done':
+            data['result'] = self.result()
+        return data
+
+
+def get_job(job_id: str) -> ImportJob | None:
+    """The job *job_id* if this process started it."""
+    return _jobs.get(job_id)
+
+
+def job_status(job_id: str) -> dict | None:
+    """Saved progress of *job_id*, whichever process runs it; None if
+    unknown or expired.
+
+    NOTE: Must be called inside an application context.
+    """
+    row = db.session.get(BulkImportJob, job_id)
+    if row is None or row.created_at < _expiry_cutoff():
+        return None
+    return row.to_dict()
+
+
+def _expiry_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=JOB_TTL_SECONDS)
+
+
+def start_import(app, rows: list[dict], errors: list[dict]) -> ImportJob:
+    """Queue validated *rows* (dicts with row/name/email/password/role) for import.
+
+    *errors* are rows the caller already rejected; they are reported
+    as-is in the job result.
+
+    NOTE: Must be called inside an application context.
+    """
+    job = ImportJob(rows, errors)
+    db.session.execute(db.delete(BulkImportJob).where(BulkImportJob.created_at < _expiry_cutoff()))
+    db.session.add(BulkImportJob(id=job.id, total=job.total, processed=job.processed))
+    db.session.commit()
+    _jobs.set(job.id, job)
+    threading.Thread(target=_run, args=(app, job), daemon=True,
+                     name=f"bulk-import-{job.id[:8]}").start()
+    return job
+
+
+def _hash_pool() -> ProcessPoolExecutor:
+    # spawn: never fork a threaded server process (scheduler, request threads)
+    return ProcessPoolExecutor(max_workers=HASH_WORKERS,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def _save(job: ImportJob):
+    values = {'status': job.status, 'processed': job.processed}
+    if job.finished_at is not None:
+        values.update(error=job.error, finished_at=datetime.utcfromtimestamp(job.finished_at),
+                      result=job.result() if job.status == 'done' else None)
+    db.session.execute(db.update(BulkImportJob).where(BulkImportJob.id == job.id).values(**values))
+    db.session.commit()
+
+
+def _run(app, job: ImportJob):
+    with app.app_context():
+        try:
+            job.status = 'running'
+            _save(job)
+            with _hash_pool() as pool:
+                _import(job, pool)
+            job.status = 'done'
+        except Exception as e:
+            db.session.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+            logger.exception("Bulk import job %s failed", job.id)
+        finally:
+            job.rows = []  # drop plaintext passwords as soon as we're done
+            job.finished_at = time.time()
+            try:
+                _save(job)
+            except Exception:
+                logger.exception("Could not save the outcome of bulk import job %s", job.id)
+            job._done.set()
+
+
+def _import(job: ImportJob, pool: ProcessPoolExecutor):
+    emails = [r['email'] for r in job.rows]
+    existing = {e for (e,) in db.session.query(User.email).filter(User.email.in_(emails))}
+
+    try:
+        for offset in range(0, len(job.rows), CHUNK_SIZE):
+            chunk = []
+            for row in job.rows[offset:offset + CHUNK_SIZE]:
+                if row['email'] in existing:
+                    job.skipped.append({'row': row['row'], 'email': row['email'],
+                                        'reason': 'Email already exists'})
+                    job.processed += 1
+                else:
+                    existing.add(row['email'])  # later duplicates in the file are skipped
+                    chunk.append(row)
+            if chunk:
+                hashes = list(pool.map(generate_password_hash, [r['password'] for r in chunk]))
+                _insert_chunk(job, chunk, hashes)
+            job.processed = min(job.total, job.processed + len(chunk))
+            _save(job)
+    finally:
+        if job.created:
+            # Bulk INSERTs bypass the ORM unit-of-work hooks
+            invalidate_board()
+            invalidate_presence()
+
+
+def _insert_chunk(job: ImportJob, chunk: list[dict], hashes: list[str]):
+    values = [
+        {'name': r['name'], 'email': r['email'], 'password_hash': h, 'role': r['role']}
+        for r, h in zip(chunk, hashes)
+    ]
+    try:
+        db.session.execute(db.insert(User), values)
+        bump(db.session, 'users')  # other processes' rosters
+        db.session.commit()
+    except IntegrityError:
+        # Someone registered one of these emails since the prefetch:
+        # re-check this chunk and insert whatever is still free.
+        db.session.rollback()
+        taken = {e for (e,) in db.session.query(User.email).filter(
+            User.email.in_([r['email'] for r in chunk]))}
+        free = [(r, v) for r, v in zip(chunk, values) if r['email'] not in taken]
+        for r in chunk:
+            if r['email'] in taken:
+                job.skipped.append({'row': r['row'], 'email': r['email'], 'reason': 'Email already exists'})
+        if not free:
+            return
+        db.session.execute(db.insert(User), [v for _r, v in free])
+        bump(db.session, 'users')
+        db.session.commit()
+        chunk = [r for r, _v in free]
+
+    job.created.extend({'row': r['row'], 'email': r['email'], 'name': r['name']} for r in chunk)
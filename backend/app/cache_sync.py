@@ -0,0 +1,166 @@
+"""
+Cross-process cache invalidation.
+
+The caches in app/cache.py live in one process, and the commit hooks that
+invalidate them only run in the process that made the change.  For data
+where a stale copy matters — users (auth identities, the roster behind
+the attendance board and presence index), the holiday / weekend calendar
+and the WhatsApp schedule — those hooks also call ``bump``, which
+increments a named counter in the ``cache_versions`` table inside the
+same transaction.  Every process runs one small thread that reads that
+table every CACHE_SYNC_SECONDS and calls the callbacks ``subscribe``d to
+each name whose counter moved, so a change made in one worker reaches
+every other worker (and the scheduler leader) within that interval
+instead of after the caches' TTLs.  The committing process sees its own
+bump too; callbacks only drop caches or re-plan idempotently, so that's
+harmless.  The TTLs remain as a backstop if the database can't be read.
+
+One row per name, and only rarely-changing data is bumped; per-check-in
+data (attendance board, presence) relies on its short TTL instead.
+"""
+
+import logging
+import os
+import threading
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models.cache_version import CacheVersion
+
+logger = logging.getLogger("smartattend.cache_sync")
+
+CACHE_SYNC_SECONDS = float(os.getenv("CACHE_SYNC_SECONDS", "2"))
+
+_callbacks: dict[str, list[Callable[[], None]]] = {}
+_seen: dict[str, int] = {}  # last version acted on, per name
+_baseline_taken = False
+_lock = threading.Lock()
+
+
+def subscribe(name: str, callback: Callable[[], None]) -> None:
+    """Run *callback* whenever a change to *name* is committed (by any
+    process, this one included).
+
+    Callbacks run on the sync thread, inside an application context.
+    """
+    _callbacks.setdefault(name, []).append(callback)
+
+
+def bump(session: Session, name: str) -> None:
+    """Mark *name* as changed by *session*'s transaction (once per
+    transaction), e.g. from an ``after_flush`` hook.
+    """
+    bumped = session.info.setdefault('cache_bumps', set())
+    if name not in bumped:
+        CacheVersion.bump(session.connection(), name)
+        bumped.add(name)
+
+
+def sync() -> list[str]:
+    """Read every version once and run the callbacks of the names that
+    changed since the last call; returns those names.  The first call
+    only records where things stand.
+
+    NOTE: Must be called inside an application context.
+    """
+    global _baseline_taken
+    versions = CacheVersion.current()
+    changed = []
+    with _lock:
+        for name, version in versions.items():
+            seen = _seen.get(name)
+            if seen is None or version > seen:
+                _seen[name] = version
+                if _baseline_taken:
+                    changed.append(name)
+        _baseline_taken = True
+
+    for name in changed:
+        for callback in _callbacks.get(name, ()):
+            try:
+                callback()
+            except Exception:
+                logger.exception("Cache sync callback for %s failed", name)
+    return changed
+
+
+def reset_cache_sync() -> None:
+    """Forget every version seen, e.g. after the database was recreated."""
+    global _baseline_taken
+    with _lock:
+        _seen.clear()
+        _baseline_taken = False
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_bumps(session):
+    session.info.pop('cache_bumps', None)
+
+
+# ── Sync thread ──────────────────────────────────────────────────────
+
+class CacheSyncer:
+    """One daemon thread polling ``cache_versions`` for this process."""
+
+    def __init__(self, app, interval: float = CACHE_SYNC_SECONDS):
+        self.app = app
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="cache-sync")
+
+    def start(self):
+        self._thread.start()
+        logger.info("Cache sync started (every %.1fs)", self.interval)
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    sync()
+            except Exception:
+                logger.warning("Cache sync failed — relying on cache TTLs", exc_info=True)
+            self._stop.wait(self.interval)
+
+
+_syncer: CacheSyncer | None = None
+_syncer_lock = threading.Lock()
+
+
+def start_cache_sync(app) -> CacheSyncer:
+    """Start this process's sync thread (idempotent)."""
+    global _syncer
+    with _syncer_lock:
+        if _syncer is None:
+            _syncer = CacheSyncer(app)
+            _syncer.start()
+        return _syncer
+
+
+def init_cache_sync(app) -> None:
+    """Start syncing with the first request this process serves, so under
+    ``gunicorn --preload`` every worker runs its own thread.
+    """
+    @app.before_request
+    def _ensure_cache_sync():
+        if _syncer is None:
+            start_cache_sync(app)
+
+
+def _forget_after_fork() -> None:
+    # The parent's thread doesn't exist in a forked child, and it may
+    # have held a lock at the moment of the fork
+    global _syncer, _syncer_lock, _lock
+    _syncer = None
+    _syncer_lock = threading.Lock()
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
@@ -5,16 +5,20 @@ attendance for the current office day.
 Scheduled to run at OFFICE_END_HOUR + 4 hours (≈ 10 PM local).
 """
 
+import html as html_lib
 import logging
-from datetime import datetime, timezone as tz
+from datetime import datetime, time, timedelta, timezone as tz
+from functools import lru_cache
 from app.office_config import (
-    office_today, OFFICE_TZ, OFFICE_TIMEZONE_NAME,
+    office_today, utc_now, OFFICE_TZ, OFFICE_TIMEZONE_NAME,
     OFFICE_END_HOUR, OFFICE_END_MINUTE,
 )
 from app.extensions import db
-from app.models.user import User
-from app.models.attendance import Attendance
+from app.attendance_board import get_board
+from app.attendance_stats import late_threshold_seconds
+from app.email_templates import fragment, render_rows, row_parts
 from app.mail import send_html_email, is_mail_configured
+from app.models.job_run import ScheduledJobRun
 
 logger = logging.getLogger("smartattend.daily_report")
 
@@ -27,145 +31,95 @@ def _format_local(dt_utc) -> str:
     """Convert a naive-UTC datetime to office-local HH:MM AM/PM string."""
     if dt_utc is None:
         return "—"
-    utc_aware = dt_utc.replace(tzinfo=tz.utc)
+    return _format_minute(dt_utc.replace(second=0, microsecond=0))
+
+
+@lru_cache(maxsize=4096)
+def _format_minute(minute_utc) -> str:
+    # Check-ins cluster on the same few hundred minutes: convert each once
+    utc_aware = minute_utc.replace(tzinfo=tz.utc)
     local = utc_aware.astimezone(OFFICE_TZ)
     return local.strftime("%-I:%M %p")
 
 
-def generate_report_html() -> tuple[str, str]:
+def render_report(board) -> tuple[str, str]:
     """
-    Build the daily report.
+    Render the daily report for *board* (an AttendanceBoard) — any day,
+    not just today.
     Returns (subject, html_body).
     """
-    today = office_today()
-    today_str = today.strftime("%A, %B %d, %Y")  # e.g. "Tuesday, February 10, 2026"
+    today_str = board.day.strftime("%A, %B %d, %Y")  # e.g. "Tuesday, February 10, 2026"
+    present_badge = str(fragment("pill", "Present", "#16a34a"))  # green
+    absent_badge = str(fragment("pill", "Absent", "#dc2626"))    # red
+    p0, p1, p2, p3, p4, p5 = row_parts("report_row", 5)  # bg, name, status, entry, exit
 
-    # Fetch all employees (non-admin)
-    employees = User.query.filter(User.role != 'admin').order_by(User.name).all()
+    # Late = checked in after office start; hours count open rows up to
+    # now on the current day (as employee_analytics does)
+    day_start = datetime.combine(board.day, time.min)
+    late_after = day_start + timedelta(seconds=late_threshold_seconds(board.day) + 0.5)
+    now = utc_now().replace(tzinfo=None) if board.day == office_today() else None
 
     rows = []
-    present_count = 0
-    absent_count = 0
-
-    for emp in employees:
-        record = Attendance.query.filter_by(user_id=emp.id, date=today).first()
-
-        if record and record.check_in_time:
+    present_count = late_count = worked = 0
+    worked_seconds = 0.0
+    for i, emp in enumerate(board.entries):
+        bg = "#f9fafb" if i % 2 == 0 else "#ffffff"
+        if emp.is_present:
             present_count += 1
-            status = "Present"
-            status_color = "#16a34a"  # green
-            entry = _format_local(record.check_in_time)
-
-            if record.check_out_time:
-                exit_time = _format_local(record.check_out_time)
-            else:
-                exit_time = "Still Checked In"
+            late_count += emp.check_in_time > late_after
+            out = emp.check_out_time or now
+            if out is not None:
+                worked += 1
+                worked_seconds += (out - emp.check_in_time).total_seconds()
+            status, entry = present_badge, _format_local(emp.check_in_time)
+            exit_time = _format_local(emp.check_out_time) if emp.check_out_time else "Still Checked In"
         else:
-            absent_count += 1
-            status = "Absent"
-            status_color = "#dc2626"  # red
-            entry = "—"
-            exit_time = "—"
-
-        rows.append({
-            "name": emp.name,
-            "email": emp.email,
-            "status": status,
-            "status_color": status_color,
-            "entry": entry,
-            "exit": exit_time,
-        })
-
-    total = len(employees)
-    subject = f"📋 Daily Attendance Report — {today_str}"
-
-    # ── HTML template ─────────────────────────────────────────────────
-    employee_rows = ""
-    for i, r in enumerate(rows):
-        bg = "#f9fafb" if i % 2 == 0 else "#ffffff"
-        employee_rows += f"""
-        <tr style="background-color:{bg};">
-          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">{r['name']}</td>
-          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">
-            <span style="display:inline-block;padding:2px 10px;border-radius:9999px;
-                         font-size:12px;font-weight:600;color:#fff;background:{r['status_color']};">
-              {r['status']}
-            </span>
-          </td>
-          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">{r['entry']}</td>
-          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">{r['exit']}</td>
-        </tr>"""
-
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head><meta charset="utf-8"></head>
-    <body style="margin:0;padding:0;font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;background:#f3f4f6;">
-      <div style="max-width:680px;margin:30px auto;background:#fff;border-radius:12px;overflow:hidden;box-shadow:0 1px 3px rgba(0,0,0,0.1);">
-
-        <!-- Header -->
-        <div style="background:linear-gradient(135deg,#1e40af,#3b82f6);padding:28px 32px;color:#fff;">
-          <h1 style="margin:0;font-size:22px;">📋 Daily Attendance Report</h1>
-          <p style="margin:6px 0 0;font-size:14px;opacity:0.9;">{today_str} &middot; {OFFICE_TIMEZONE_NAME}</p>
-        </div>
-
-        <!-- Summary cards -->
-        <div style="display:flex;padding:20px 32px 10px;gap:16px;">
-          <div style="flex:1;background:#f0fdf4;border-radius:8px;padding:14px;text-align:center;">
-            <div style="font-size:28px;font-weight:700;color:#16a34a;">{present_count}</div>
-            <div style="font-size:12px;color:#15803d;margin-top:2px;">Present</div>
-          </div>
-          <div style="flex:1;background:#fef2f2;border-radius:8px;padding:14px;text-align:center;">
-            <div style="font-size:28px;font-weight:700;color:#dc2626;">{absent_count}</div>
-            <div style="font-size:12px;color:#b91c1c;margin-top:2px;">Absent</div>
-          </div>
-          <div style="flex:1;background:#eff6ff;border-radius:8px;padding:14px;text-align:center;">
-            <div style="font-size:28px;font-weight:700;color:#2563eb;">{total}</div>
-            <div style="font-size:12px;color:#1d4ed8;margin-top:2px;">Total</div>
-          </div>
-        </div>
-
-        <!-- Table -->
-        <div style="padding:16px 32px 28px;">
-          <table style="width:100%;border-collapse:collapse;font-size:14px;">
-            <thead>
-              <tr style="background:#f1f5f9;">
-                <th style="text-align:left;padding:10px 14px;border-bottom:2px solid #e2e8f0;color:#475569;font-weight:600;">Name</th>
-                <th style="text-align:left;padding:10px 14px;border-bottom:2px solid #e2e8f0;color:#475569;font-weight:600;">Status</th>
-                <th style="text-align:left;padding:10px 14px;border-bottom:2px solid #e2e8f0;color:#475569;font-weight:600;">Entry Time</th>
-                <th style="text-align:left;padding:10px 14px;border-bottom:2px solid #e2e8f0;color:#475569;font-weight:600;">Exit Time</th>
-              </tr>
-            </thead>
-            <tbody>
-              {employee_rows if employee_rows else '<tr><td colspan="4" style="padding:20px;text-align:center;color:#9ca3af;">No employees found</td></tr>'}
-            </tbody>
-          </table>
-        </div>
-
-        <!-- Footer -->
-        <div style="background:#f8fafc;padding:16px 32px;text-align:center;font-size:12px;color:#94a3b8;border-top:1px solid #e2e8f0;">
-          SmartAttend &middot; Auto-generated report &middot; {datetime.now(OFFICE_TZ).strftime("%-I:%M %p %Z")}
-        </div>
-      </div>
-    </body>
-    </html>
+            status, entry, exit_time = absent_badge, "—", "—"
+        rows.append(f"{p0}{bg}{p1}{html_lib.escape(emp.name)}{p2}{status}{p3}{entry}{p4}{exit_time}{p5}")
+
+    html = render_rows(
+        "daily_report.html",
+        rows,
+        today_str=today_str,
+        timezone=OFFICE_TIMEZONE_NAME,
+        present_count=present_count,
+        absent_count=len(rows) - present_count,
+        late_count=late_count,
+        avg_hours=f"{worked_seconds / worked / 3600:.1f}" if worked else "—",
+        total=len(rows),
+        generated_at=datetime.now(OFFICE_TZ).strftime("%-I:%M %p %Z"),
+    )
+    return f"📋 Daily Attendance Report — {today_str}", html
+
+
+def generate_report_html(day=None) -> tuple[str, str]:
     """
-
-    return subject, html
+    Build the daily report for *day* (default: the current office day).
+    Returns (subject, html_body).
+    """
+    # One bulk query (or a cache hit) for every non-admin employee
+    return render_report(get_board(day or office_today()))
 
 
 def send_daily_report():
     """Generate the report and email it. Called by the scheduler."""
     from app.app import app
+    from app.reports import get_report
 
     with app.app_context():
         if not is_mail_configured():
             logger.warning("SMTP not configured — skipping.")
             return
 
+        # A leadership hand-over around report time must not send it twice
+        if not ScheduledJobRun.claim('daily_report', office_today()):
+            logger.info("Daily report for %s already sent — skipping.", office_today())
+            return
+
         try:
             logger.info("Generating report for %s …", office_today())
-            subject, html = generate_report_html()
+            # Reuses the rendered report if an admin previewed it since
+            subject, html, _etag, _versions = get_report(office_today())
         except Exception as e:
             logger.error("Failed to generate daily report: %s", e, exc_info=True)
             db.session.rollback()
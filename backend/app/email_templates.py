@@ -0,0 +1,91 @@
+"""
+HTML email templates — Jinja2 layouts under app/templates/email.
+
+Every template is compiled once (``precompile`` runs from create_app) and
+kept for the life of the process: no per-render parsing, and no
+re-formatting of the large inline-CSS layouts with f-strings.  Row loops
+compile to generators whose output is joined once, so a report renders
+in time linear in its rows.
+
+Small static pieces repeated on every row or email — status pills — are
+rendered once per distinct argument tuple by ``fragment`` and reused
+as-is.  For tables with thousands of rows, ``row_parts`` splits a row
+macro into its static pieces once; rows are stitched from those pieces
+and ``render_rows`` splices them into the rendered layout with a single
+join, skipping per-cell template overhead.
+
+Autoescaping is on: pass plain text, or ``Markup`` for trusted HTML.
+"""
+
+import logging
+import os
+from functools import lru_cache
+from itertools import chain
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+
+logger = logging.getLogger("smartattend.email_templates")
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates", "email")
+
+
+def _multiline(text: str | None) -> Markup:
+    """Escape *text* and keep its line breaks (``<br>``); "—" when empty."""
+    if not text:
+        return Markup("—")
+    return escape(text).replace("\n", Markup("<br>"))
+
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    auto_reload=False,   # templates ship with the code; never re-stat them
+    cache_size=-1,       # keep every compiled template
+)
+env.filters["multiline"] = _multiline
+
+_ROWS_SLOT = Markup("\x00rows\x00")
+
+
+def precompile() -> int:
+    """Compile every email template now rather than on first send."""
+    names = [n for n in env.list_templates() if n.endswith(".html")]
+    for name in names:
+        env.get_template(name)
+    logger.debug("Compiled %d email template(s)", len(names))
+    return len(names)
+
+
+def render(name: str, /, **context) -> str:
+    """Render the compiled template *name* with *context*."""
+    return env.get_template(name).render(**context)
+
+
+def render_rows(name: str, rows: list[str], /, **context) -> str:
+    """Render *name* with its ``{{ rows }}`` slot filled by *rows* (HTML
+    strings, already escaped), spliced in after rendering.
+    """
+    head, slot, tail = render(name, rows=_ROWS_SLOT, **context).partition(_ROWS_SLOT)
+    if not slot:  # the template skipped the slot (e.g. its "no rows" branch)
+        return head
+    return "\n".join(chain((head,), rows, (tail,)))
+
+
+@lru_cache(maxsize=256)
+def fragment(macro: str, *args) -> Markup:
+    """Output of ``_fragments.html``'s *macro* for *args*, rendered once."""
+    return Markup(getattr(env.get_template("_fragments.html").module, macro)(*args))
+
+
+@lru_cache(maxsize=32)
+def row_parts(macro: str, fields: int) -> tuple[str, ...]:
+    """*macro* from ``_fragments.html`` split into the ``fields + 1``
+    static pieces around its arguments, so a row is just
+    ``p[0] + arg0 + p[1] + … + p[fields]``.
+
+    Values are inserted verbatim: escape untrusted text first.
+    """
+    return tuple(str(fragment(macro, *[Markup("\x00")] * fields)).split("\x00"))
@@ -0,0 +1,444 @@
+"""
+Live attendance events for the admin dashboard (Server-Sent Events).
+
+Every check-in, check-out and overtime toggle is published as a delta —
+that one employee's new state, in the shape of an ``/admin/employees``
+entry — so an open dashboard patches its roster in place instead of
+re-pulling it.
+
+Streams are not served by gunicorn: with 2 threads per worker, two open
+dashboards would leave nothing for the API.  ``EventStreamServer`` runs
+one asyncio loop on its own thread and port (EVENT_STREAM_PORT, proxied
+by nginx at /events/); an idle subscriber costs a socket and a small
+buffer, and hundreds share that one thread.
+
+Exactly one process per container runs the server: the gunicorn master
+(started from gunicorn.conf.py's ``when_ready``, so it outlives worker
+restarts), or the dev server's reloader child.  On PostgreSQL,
+``publish`` sends a NOTIFY and the server LISTENs, so events from every
+worker reach it.  On other databases events are handed to the server
+directly, which only works when that same process serves the API — the
+single-process dev server; a multi-worker deployment needs PostgreSQL.
+
+Browsers can't set headers on an EventSource, and a token in the URL
+ends up in proxy access logs, so the dashboard first fetches a stream
+ticket (``issue_stream_ticket``): a JWT valid for STREAM_TICKET_SECONDS
+that is accepted for one connection only and is useless as an API token.
+Other clients may send their normal ``Authorization: Bearer`` token.
+Cross-origin reads are only allowed for EVENT_STREAM_ALLOWED_ORIGINS; in
+production nginx serves /events/ on the site's own origin.
+
+Events carry ids.  A reconnecting EventSource sends Last-Event-ID and is
+replayed what it missed from a short backlog; if that is gone — or a
+subscriber falls too far behind — it gets a ``resync`` event and should
+re-pull the roster.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import secrets
+import select
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import jwt
+from sqlalchemy import func, select as sql_select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.extensions import db
+from app.office_config import to_utc_iso
+
+logger = logging.getLogger("smartattend.event_stream")
+
+EVENT_STREAM_HOST = os.getenv("EVENT_STREAM_HOST", "0.0.0.0")
+EVENT_STREAM_PORT = int(os.getenv("EVENT_STREAM_PORT", "5001"))  # 0 disables
+EVENT_STREAM_MAX_SUBSCRIBERS = int(os.getenv("EVENT_STREAM_MAX_SUBSCRIBERS", "200"))
+# Other origins allowed to open streams (e.g. the dev frontend); comma-separated
+EVENT_STREAM_ALLOWED_ORIGINS = frozenset(
+    o.strip() for o in os.getenv("EVENT_STREAM_ALLOWED_ORIGINS", "").split(",") if o.strip()
+)
+
+STREAM_PATH = "/events/attendance"
+STATS_PATH = "/events/stats"
+STREAM_TICKET_SECONDS = 30          # a ticket must be used this soon, and only once
+CHANNEL = "attendance_events"       # PostgreSQL NOTIFY channel
+HEARTBEAT_SECONDS = 15              # keeps proxies from timing the stream out
+MAX_STREAM_SECONDS = 3600           # then the client reconnects (and re-authenticates)
+RETRY_MS = 3000                     # EventSource reconnect delay
+BACKLOG_SIZE = 256                  # recent events kept for Last-Event-ID replay
+SUBSCRIBER_BUFFER = 64              # unsent events per subscriber before it must resync
+
+# ── Event types ──────────────────────────────────────────────────────
+CHECK_IN = 'check_in'
+CHECK_OUT = 'check_out'
+OVERTIME = 'overtime'
+
+_RESYNC = b"event: resync\ndata: {}\n\n"
+
+
+def attendance_delta(kind: str, user, day, check_in_time, check_out_time, is_overtime: bool) -> dict:
+    """One employee's new state for *day*, as pushed to the dashboard
+    (overtime only applies while checked in).
+    """
+    return {
+        'type': kind,
+        'date': day.isoformat(),
+        'id': user.id,
+        'name': user.name,
+        'today_status': 'checked_out' if check_out_time else 'checked_in',
+        'check_in_time': to_utc_iso(check_in_time),
+        'check_out_time': to_utc_iso(check_out_time),
+        'is_overtime': bool(is_overtime),
+    }
+
+
+def issue_stream_ticket(user_id: int) -> str:
+    """A one-time ticket for opening a stream as *user_id*."""
+    from app.token_auth import SECRET_KEY
+
+    # No 'user_id' claim, so token_auth never accepts it as an API token
+    return jwt.encode({
+        'stream_user_id': user_id,
+        'jti': secrets.token_urlsafe(12),
+        'exp': int(time.time()) + STREAM_TICKET_SECONDS,
+    }, SECRET_KEY, algorithm="HS256")
+
+
+def publish(data: dict) -> None:
+    """Push *data* to every open dashboard.  Call once the change is committed.
+
+    NOTE: Must be called inside an application context.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        try:
+            db.session.execute(sql_select(func.pg_notify(CHANNEL, json.dumps(data))))
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            logger.warning("Could not publish %s event", data.get('type'), exc_info=True)
+    elif _server is not None:
+        _server.publish(data)
+
+
+class _Subscriber:
+    __slots__ = ('frames', 'wakeup')
+
+    def __init__(self):
+        self.frames = deque()
+        self.wakeup = asyncio.Event()
+
+    def push(self, frame: bytes):
+        if len(self.frames) >= SUBSCRIBER_BUFFER:
+            # Too far behind to catch up event by event: start over
+            self.frames.clear()
+            frame = _RESYNC
+        self.frames.append(frame)
+        self.wakeup.set()
+
+
+class EventStreamServer:
+    """Serves ``GET /events/attendance`` to admins from one asyncio thread."""
+
+    def __init__(self, app, host: str = EVENT_STREAM_HOST, port: int = EVENT_STREAM_PORT,
+                 max_subscribers: int = EVENT_STREAM_MAX_SUBSCRIBERS,
+                 heartbeat_seconds: float = HEARTBEAT_SECONDS,
+                 max_stream_seconds: float = MAX_STREAM_SECONDS):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.max_subscribers = max_subscribers
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_stream_seconds = max_stream_seconds
+        # Ids restart with the process; the epoch tells a reconnecting
+        # client's Last-Event-ID from another run's
+        self._epoch = format(int(time.time() * 1000), 'x')
+        self._next_id = 1
+        self._backlog = deque(maxlen=BACKLOG_SIZE)   # (id, frame)
+        self._subscribers: set[_Subscriber] = set()
+        self._used_tickets: dict[str, float] = {}   # jti -> expiry, until it expires
+        self._tickets_lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._server = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="event-stream")
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.sockets[0].getsockname()[:2]
+
+    def start(self) -> bool:
+        """Bind and start serving; False if the port is taken."""
+        self._thread.start()
+        self._ready.wait(10)
+        if self._loop is None:
+            return False
+        logger.info("Attendance event stream on %s:%d%s", *self.address, STREAM_PATH)
+        if self._uses_postgres():
+            threading.Thread(target=self._listen, daemon=True, name="event-stream-listen").start()
+        return True
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        loop, self._loop = self._loop, None
+        if loop is not None:
+            loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            'subscribers': len(self._subscribers),
+            'max_subscribers': self.max_subscribers,
+            'events': self._next_id - 1,
+        }
+
+    def publish(self, data: dict) -> None:
+        """Fan *data* out to every subscriber (thread-safe)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._fan_out, data)
+
+    # ── Event loop thread ─────────────────────────────────────────────
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+        except OSError as e:
+            # Port taken, e.g. by another container on this host
+            logger.info("Event stream not started in this process: %s", e)
+            loop.close()
+            self._ready.set()
+            return
+        self._loop = loop
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            self._server.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+    def _fan_out(self, data: dict):
+        event_id = f"{self._epoch}-{self._next_id}"
+        self._next_id += 1
+        frame = f"id: {event_id}\nevent: attendance\ndata: {json.dumps(data)}\n\n".encode()
+        self._backlog.append((event_id, frame))
+        for subscriber in self._subscribers:
+            subscriber.push(frame)
+
+    def _replay(self, subscriber: _Subscriber, last_event_id: str):
+        """Queue what a reconnecting client missed since *last_event_id*."""
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self._epoch or not seq.isdigit():
+            subscriber.push(_RESYNC)
+            return
+        seq = int(seq)
+        if self._backlog and int(self._backlog[0][0].split('-')[1]) > seq + 1:
+            subscriber.push(_RESYNC)   # the gap has scrolled out of the backlog
+            return
+        for event_id, frame in self._backlog:
+            if int(event_id.split('-')[1]) > seq:
+                subscriber.push(frame)
+
+    def _redeem_ticket(self, ticket: str) -> int | None:
+        """The user id of an unused, unexpired stream ticket; None otherwise."""
+        from app.token_auth import SECRET_KEY
+
+        try:
+            claims = jwt.decode(ticket, SECRET_KEY, algorithms=["HS256"], options={'require': ['exp', 'jti']})
+            user_id = int(claims['stream_user_id'])
+        except Exception:
+            return None
+        now = time.time()
+        with self._tickets_lock:
+            for jti, expires_at in list(self._used_tickets.items()):
+                if expires_at < now:
+                    del self._used_tickets[jti]
+            if claims['jti'] in self._used_tickets:
+                return None
+            self._used_tickets[claims['jti']] = claims['exp']
+        return user_id
+
+    def _is_admin(self, bearer: str | None, ticket: str | None = None) -> bool:
+        from app.token_auth import authenticate, get_identity
+
+        with self.app.app_context():
+            if ticket:
+                user_id = self._redeem_ticket(ticket)
+                user = get_identity(user_id) if user_id is not None else None
+            else:
+                user = authenticate(bearer)
+            return bool(user and user.role == 'admin')
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+            request_line, *header_lines = head.decode('latin-1').split("\r\n")
+            method, target, _ = request_line.split(" ", 2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            writer.close()
+            return
+
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        cors = _cors_headers(headers.get('origin'))
+
+        if url.path not in (STREAM_PATH, STATS_PATH):
+            return await self._reply(writer, "404 Not Found", "Not found", cors)
+        if method != "GET":
+            return await self._reply(writer, "405 Method Not Allowed", "Method not allowed", cors)
+
+        # Browsers bring a one-time ?ticket=; other clients may send a bearer token
+        bearer = headers.get('authorization', '').split()[-1:]
+        bearer = bearer[0] if bearer else None
+        ticket = query.get('ticket', [None])[0] if url.path == STREAM_PATH else None
+        if not await asyncio.get_running_loop().run_in_executor(None, self._is_admin, bearer, ticket):
+            return await self._reply(writer, "401 Unauthorized", "Invalid or expired token", cors)
+        if url.path == STATS_PATH:
+            return await self._reply(writer, "200 OK", json.dumps({'running': True, **self.stats()}),
+                                     cors, content_type="application/json")
+        if len(self._subscribers) >= self.max_subscribers:
+            return await self._reply(writer, "503 Service Unavailable", "Too many subscribers",
+                                     cors + f"Retry-After: {RETRY_MS // 1000}\r\n")
+
+        subscriber = _Subscriber()
+        self._subscribers.add(subscriber)
+        disconnected = None
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n"
+                b"X-Accel-Buffering: no\r\n"       # nginx: pass events straight through
+                + cors.encode()
+                + b"\r\n"
+                + f"retry: {RETRY_MS}\n\n".encode()
+            )
+            last_event_id = headers.get('last-event-id') or query.get('lastEventId', [''])[0]
+            if last_event_id:
+                self._replay(subscriber, last_event_id)
+
+            # Completes when the client goes away, freeing its slot at once
+            disconnected = asyncio.ensure_future(reader.read())
+            deadline = asyncio.get_running_loop().time() + self.max_stream_seconds
+            while asyncio.get_running_loop().time() < deadline:
+                subscriber.wakeup.clear()
+                while subscriber.frames:
+                    writer.write(subscriber.frames.popleft())
+                await writer.drain()
+                if subscriber.frames:
+                    continue
+                woken = asyncio.ensure_future(subscriber.wakeup.wait())
+                done, _ = await asyncio.wait({woken, disconnected}, timeout=self.heartbeat_seconds,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                woken.cancel()
+                if disconnected in done:
+                    break
+                if not done:
+                    writer.write(b": ping\n\n")
+        except ConnectionError:
+            pass
+        finally:
+            self._subscribers.discard(subscriber)
+            if disconnected is not None:
+                disconnected.cancel()
+            writer.close()
+
+    @staticmethod
+    async def _reply(writer: asyncio.StreamWriter, status: str, body: str, extra: str = "",
+                     content_type: str = "text/plain"):
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n{extra}\r\n{body}".encode()
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    # ── PostgreSQL LISTEN thread ──────────────────────────────────────
+    def _uses_postgres(self) -> bool:
+        with self.app.app_context():
+            return db.engine.dialect.name == 'postgresql'
+
+    def _listen(self):
+        """Relay NOTIFYs on CHANNEL to subscribers, reconnecting as needed."""
+        while not self._stop.is_set():
+            conn = None
+            try:
+                with self.app.app_context():
+                    raw = db.engine.raw_connection()
+                raw.detach()   # a dedicated connection, not one borrowed from the pool
+                conn = raw.driver_connection
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {CHANNEL}")
+                # Events sent while we weren't listening are lost
+                self._loop.call_soon_threadsafe(self._resync_all)
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.publish(json.loads(conn.notifies.pop(0).payload))
+            except Exception:
+                logger.exception("Event stream LISTEN connection failed — retrying in 5s")
+                self._stop.wait(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _resync_all(self):
+        for subscriber in self._subscribers:
+            subscriber.push(_RESYNC)
+
+
+def _cors_headers(origin: str | None) -> str:
+    """CORS response headers for a request from *origin* ('' if not allowed)."""
+    if origin and origin in EVENT_STREAM_ALLOWED_ORIGINS:
+        return f"Access-Control-Allow-Origin: {origin}\r\nVary: Origin\r\n"
+    return ""
+
+
+_server: EventStreamServer | None = None
+_start_lock = threading.Lock()
+_started_pid: int | None = None
+
+
+def start_event_stream(app) -> None:
+    """Start this process's event stream server, once (see the module
+    docstring for which process that should be).
+    """
+    global _server, _started_pid
+    if not EVENT_STREAM_PORT or _started_pid == os.getpid():
+        return
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+        server = EventStreamServer(app)
+        if server.start():
+            _server = server
+
+
+def _forget_after_fork() -> None:
+    # A forked worker has the server object but not its thread; it
+    # publishes through NOTIFY (PostgreSQL) instead
+    global _server
+    _server = None
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
@@ -1,3 +1,31 @@
+from contextlib import contextmanager
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
-db = SQLAlchemy()
\ No newline at end of file
+db = SQLAlchemy()
+
+
+class QueryCounter:
+    """Holds the number of SQL statements seen inside count_queries()."""
+
+    def __init__(self):
+        self.count = 0
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements executed on the app's engine inside the block.
+
+    NOTE: Must be called inside an application context.
+    """
+    counter = QueryCounter()
+    engine = db.engine
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.count += 1
+
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
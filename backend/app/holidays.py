@@ -2,9 +2,10 @@
 Holidays utility — seed Indian public holidays and compute working days.
 """
 
-from datetime import date, timedelta
+from datetime import date
 from app.extensions import db
 from app.models.holiday import Holiday
+from app import workdays
 
 # ── Indian Gazetted Holidays ────────────────────────────────────────
 # These are the standard gazetted holidays observed by most Indian
@@ -74,44 +75,18 @@ def seed_holidays(year: int | None = None) -> int:
 
 def get_holidays_set(year: int) -> set[date]:
     """Return a set of holiday dates for the given year (for fast lookup)."""
-    holidays = Holiday.query.filter(
-        db.extract('year', Holiday.date) == year
-    ).all()
-    return {h.date for h in holidays}
+    rows = db.session.query(Holiday.date).filter(
+        Holiday.date >= date(year, 1, 1),
+        Holiday.date < date(year + 1, 1, 1),
+    )
+    return {d for (d,) in rows}
 
 
 def count_working_days(start: date, end: date) -> int:
     """
     Count business days between *start* and *end* (inclusive),
     excluding weekends (as configured) and gazetted holidays.
-    """
-    if start > end:
-        return 0
-
-    # Get weekend configuration
-    from app.models.weekend_config import WeekendConfig
-    weekend_config = WeekendConfig.get_current()
-    weekend_days = weekend_config.get_weekend_set()
-
-    # Collect holiday dates that fall in the range
-    years = set()
-    d = start
-    while d <= end:
-        years.add(d.year)
-        d += timedelta(days=365)
-    years.add(end.year)
-
-    holiday_dates: set[date] = set()
-    for y in years:
-        holiday_dates |= get_holidays_set(y)
-
-    count = 0
-    current = start
-    while current <= end:
-        # weekday() returns: Monday=0, Tuesday=1, ..., Sunday=6
-        if current.weekday() not in weekend_days and current not in holiday_dates:
-            count += 1
-        current += timedelta(days=1)
-
-    return count
 
+    Answered from the cached per-year calendar in app/workdays.py.
+    """
+    return workdays.count_working_days(start, end)
@@ -0,0 +1,145 @@
+"""
+Leader election for the background schedulers.
+
+Every process that starts election when app/app.py is imported runs one
+``LeaderElector``.  Under ``gunicorn --preload`` (Dockerfile.prod) that
+is the master only, once per container; forked workers serve HTTP and
+never run an elector.  Without --preload (or with the dev server) each
+process imports the app and competes.  Electors compete for a lease row
+in ``scheduler_leases``; the holder renews it every LEASE_SECONDS / 3 and
+is the only process running the daily report, the WhatsApp jobs and the
+outbox worker.  If the leader dies its lease lapses after at most
+LEASE_SECONDS and another process takes over; a clean shutdown releases
+it straight away.
+
+A leader that cannot renew (database unreachable) steps down before its
+lease can expire, so two processes never believe they lead at once.
+
+The lease only makes the background jobs run once.  Caches stay per
+process: other processes see a change after app/cache_sync.py's poll or
+the cache's TTL, not at once, and rows a worker queues on the outbox wait
+for the leader's next poll.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable
+
+logger = logging.getLogger("smartattend.leader")
+
+LEASE_NAME = "schedulers"
+LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "60"))
+
+
+class LeaderElector:
+    """One daemon thread that acquires/renews the lease for this process."""
+
+    def __init__(self, app, on_elected: Callable[[], None], on_demoted: Callable[[], None],
+                 name: str = LEASE_NAME, ttl_seconds: int = LEASE_SECONDS):
+        self.app = app
+        self.name = name
+        self.ttl = ttl_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._leading = False
+        self._valid_until = 0.0  # monotonic; step down before the lease can lapse
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="leader-elector")
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leading
+
+    def start(self):
+        self._thread.start()
+        logger.info("Leader election started as %s (lease %ds)", self.holder, self.ttl)
+
+    def stop(self, timeout: float | None = None):
+        """Stop competing, step down and release the lease."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        if self._leading:
+            self._demote()
+            try:
+                from app.models.scheduler_lease import SchedulerLease
+                with self.app.app_context():
+                    SchedulerLease.release(self.name, self.holder)
+            except Exception:
+                logger.exception("Releasing scheduler lease failed")
+
+    def tick(self) -> bool:
+        """Try to acquire or renew the lease once; returns leadership."""
+        from app.models.scheduler_lease import SchedulerLease
+
+        renew_margin = self.ttl / 3
+        try:
+            with self.app.app_context():
+                held = SchedulerLease.acquire(self.name, self.holder, self.ttl)
+            if held:
+                self._valid_until = time.monotonic() + self.ttl - renew_margin
+        except Exception:
+            logger.exception("Scheduler lease renewal failed")
+            # Keep leading only while the last renewal is surely still valid
+            held = self._leading and time.monotonic() < self._valid_until
+
+        if held and not self._leading:
+            self._leading = True
+            logger.info("Elected scheduler leader (%s)", self.holder)
+            try:
+                self._on_elected()
+            except Exception:
+                logger.exception("Starting schedulers after election failed")
+        elif not held and self._leading:
+            self._demote()
+        return held
+
+    def _demote(self):
+        self._leading = False
+        logger.warning("No longer scheduler leader (%s)", self.holder)
+        try:
+            self._on_demoted()
+        except Exception:
+            logger.exception("Stopping schedulers after demotion failed")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(self.ttl / 3)
+
+
+_elector: LeaderElector | None = None
+
+
+def start_leader_election(app, on_elected: Callable[[], None], on_demoted: Callable[[], None]) -> LeaderElector:
+    """Compete for the scheduler lease in this process (idempotent)."""
+    global _elector
+    if _elector is None:
+        _elector = LeaderElector(app, on_elected, on_demoted)
+        _elector.start()
+        atexit.register(_elector.stop, 5)
+    return _elector
+
+
+def _forget_after_fork() -> None:
+    """In a forked child the elector, its thread and its lease belong to
+    the parent; make sure exiting the child never releases that lease.
+    """
+    global _elector
+    if _elector is not None:
+        atexit.unregister(_elector.stop)
+        _elector = None
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
+
+
+def is_leader() -> bool:
+    """Whether this process currently runs the schedulers."""
+    return _elector is not None and _elector.is_leader
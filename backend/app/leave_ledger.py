@@ -0,0 +1,167 @@
+"""
+Paid-leave ledger — ``LeaveBalance.used_days`` / ``pending_days`` kept
+in step with the ``leaves`` table.
+
+Instead of summing ``leaves`` on every balance view, each change to a
+paid leave adjusts the counters of the year(s) it is charged to with an
+atomic ``SET used_days = used_days + n`` in the caller's transaction:
+
+* applied            → pending  += days
+* pending → approved → pending  -= days, used += days
+* pending → rejected → pending  -= days
+* approved → rejected (and back) moves the days out of (into) used
+
+Reading a balance is then one lookup on ``(user_id, year)``.
+``rebuild_ledger`` recomputes the counters from ``leaves`` (see
+scripts/reconcile_leave_ledger.py) should they ever drift.
+"""
+
+import logging
+from collections import defaultdict
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.extensions import db
+from app.models.leave import Leave
+from app.models.leave_balance import LeaveBalance, ANNUAL_PAID_LEAVES
+
+logger = logging.getLogger("smartattend.leave_ledger")
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Which ledger column a paid leave in each status counts towards
+_COLUMN_FOR_STATUS = {
+    'pending': 'pending_days',
+    'approved': 'used_days',
+}
+
+
+def leave_charges(leave: Leave) -> dict[int, int]:
+    """Working days *leave* charges to each year's balance."""
+    if (leave.leave_type or 'paid') != 'paid' or not leave.working_days:
+        return {}
+    if leave.year_breakdown:
+        return {int(y): days for y, days in leave.year_breakdown.items() if days}
+    return {leave.start_date.year: leave.working_days}
+
+
+def get_balances(user_id: int, years) -> dict[int, dict]:
+    """Balance summaries for *user_id* in each of *years*, from one query
+    (no rows are created on read).
+    """
+    years = list(years)
+    rows = {b.year: b for b in LeaveBalance.query.filter(
+        LeaveBalance.user_id == user_id, LeaveBalance.year.in_(years))}
+    return {
+        y: (rows.get(y) or LeaveBalance(user_id=user_id, year=y, total_leaves=ANNUAL_PAID_LEAVES,
+                                        used_days=0, pending_days=0)).to_dict()
+        for y in years
+    }
+
+
+def get_balance(user_id: int, year: int) -> dict:
+    """Balance summary for *user_id* in *year* (no row is created on read)."""
+    return get_balances(user_id, [year])[year]
+
+
+def ensure_balance_rows(user_id: int, years) -> None:
+    """Insert default LeaveBalance rows for any of *years* that lack one."""
+    table = LeaveBalance.__table__
+    rows = [{'user_id': user_id, 'year': y, 'total_leaves': ANNUAL_PAID_LEAVES,
+             'used_days': 0, 'pending_days': 0} for y in years]
+    if not rows:
+        return
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        db.session.execute(
+            insert(table).values(rows).on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.year])
+        )
+        return
+    existing = {y for (y,) in db.session.query(LeaveBalance.year).filter(
+        LeaveBalance.user_id == user_id, LeaveBalance.year.in_([r['year'] for r in rows]))}
+    db.session.add_all(LeaveBalance(**r) for r in rows if r['year'] not in existing)
+    db.session.flush()
+
+
+def _adjust(user_id: int, charges: dict[int, int], column: str, sign: int) -> None:
+    """Add ``sign * days`` to *column* of each charged year, atomically in SQL."""
+    if not charges:
+        return
+    ensure_balance_rows(user_id, charges)
+    counter = getattr(LeaveBalance, column)
+    for year, days in charges.items():
+        # ORM-enabled UPDATE: autoflushes first and syncs loaded instances
+        db.session.execute(
+            db.update(LeaveBalance)
+            .where(LeaveBalance.user_id == user_id, LeaveBalance.year == year)
+            .values({counter: counter + sign * days})
+        )
+
+
+def record_application(leave: Leave) -> None:
+    """Charge a newly applied leave to the ledger (call before commit)."""
+    column = _COLUMN_FOR_STATUS.get(leave.status or 'pending')
+    if column:
+        _adjust(leave.user_id, leave_charges(leave), column, +1)
+
+
+def record_status_change(leave: Leave, old_status: str | None) -> None:
+    """Move *leave*'s days between ledger columns after a status change."""
+    old_column = _COLUMN_FOR_STATUS.get(old_status or 'pending')
+    new_column = _COLUMN_FOR_STATUS.get(leave.status)
+    if old_column == new_column:
+        return
+    charges = leave_charges(leave)
+    if old_column:
+        _adjust(leave.user_id, charges, old_column, -1)
+    if new_column:
+        _adjust(leave.user_id, charges, new_column, +1)
+
+
+def rebuild_ledger(year: int | None = None, dry_run: bool = False) -> list[dict]:
+    """Recompute used/pending from ``leaves`` and fix any drifted rows.
+
+    Returns one entry per corrected balance (``before`` / ``after``
+    counters); with *dry_run* nothing is written.
+    """
+    expected: dict[tuple[int, int], dict[str, int]] = defaultdict(lambda: {'used_days': 0, 'pending_days': 0})
+    leaves = Leave.query.filter(
+        db.func.coalesce(Leave.leave_type, 'paid') == 'paid',
+        db.func.coalesce(Leave.status, 'pending').in_(list(_COLUMN_FOR_STATUS)),
+    )
+    for leave in leaves.yield_per(1000):
+        column = _COLUMN_FOR_STATUS[leave.status or 'pending']
+        for y, days in leave_charges(leave).items():
+            if year is None or y == year:
+                expected[(leave.user_id, y)][column] += days
+
+    balances = LeaveBalance.query
+    if year is not None:
+        balances = balances.filter(LeaveBalance.year == year)
+    current = {(b.user_id, b.year): b for b in balances}
+
+    fixes = []
+    for key in sorted(current.keys() | expected.keys()):
+        bal = current.get(key)
+        have = {'used_days': bal.used_days, 'pending_days': bal.pending_days} if bal else \
+            {'used_days': 0, 'pending_days': 0}
+        want = expected.get(key, {'used_days': 0, 'pending_days': 0})
+        if bal is not None and have == want:
+            continue
+        fixes.append({'user_id': key[0], 'year': key[1], 'before': have, 'after': want})
+        if dry_run:
+            continue
+        if bal is None:
+            db.session.add(LeaveBalance(user_id=key[0], year=key[1], total_leaves=ANNUAL_PAID_LEAVES, **want))
+        else:
+            bal.used_days, bal.pending_days = want['used_days'], want['pending_days']
+
+    if not dry_run:
+        db.session.commit()
+    if fixes:
+        logger.warning("Leave ledger: %d balance(s) %s", len(fixes), "out of step" if dry_run else "corrected")
+    return fixes
@@ -0,0 +1,93 @@
+"""
+Leave planning — what a leave request for a date range would cost.
+
+A range is split into working days per calendar year in one pass over
+the cached calendar (app/workdays.py), so a leave from 29 Dec to 2 Jan
+is charged to both years' balances rather than all to the first.  Paid
+leave is validated against every affected year's balance, read from
+the ledger in one query.
+
+``plan_leave`` backs both ``POST /request/leave/apply`` and the
+``GET /request/leave/preview`` endpoint the date picker calls on every
+change; with warm caches a preview costs a single query.
+"""
+
+from datetime import date
+from typing import NamedTuple
+
+from app.leave_ledger import get_balances
+from app.workdays import working_days_by_year
+
+
+class LeavePlan(NamedTuple):
+    start: date
+    end: date
+    leave_type: str
+    working_days: int
+    breakdown: dict[int, int]          # year -> working days
+    balances: dict[int, dict]          # year -> balance summary (paid leave only)
+
+    @property
+    def shortfall(self) -> dict[int, int]:
+        """Years whose available balance doesn't cover the days charged to them."""
+        return {
+            y: days - self.balances[y]['available']
+            for y, days in self.breakdown.items()
+            if y in self.balances and days > self.balances[y]['available']
+        }
+
+    @property
+    def error(self) -> str | None:
+        if self.working_days == 0:
+            return 'Selected dates contain no working days (only Sundays / holidays)'
+        shortfall = self.shortfall
+        if not shortfall:
+            return None
+        if len(self.breakdown) == 1:
+            year = next(iter(shortfall))
+            return (f'Insufficient paid leave balance. '
+                    f'Requested {self.working_days} day(s), available {self.balances[year]["available"]} day(s).')
+        return 'Insufficient paid leave balance. ' + '; '.join(
+            f'{y}: requested {self.breakdown[y]} day(s), available {self.balances[y]["available"]} day(s)'
+            for y in sorted(shortfall)
+        ) + '.'
+
+    def year_breakdown_json(self) -> dict[str, int]:
+        """The breakdown as stored on ``Leave.year_breakdown``."""
+        return {str(y): days for y, days in sorted(self.breakdown.items())}
+
+    def to_dict(self):
+        return {
+            'start_date': self.start.isoformat(),
+            'end_date': self.end.isoformat(),
+            'leave_type': self.leave_type,
+            'working_days': self.working_days,
+            'breakdown': [
+                {
+                    'year': y,
+                    'working_days': days,
+                    'available': self.balances[y]['available'] if y in self.balances else None,
+                }
+                for y, days in sorted(self.breakdown.items())
+            ],
+            'ok': self.error is None,
+            'error': self.error,
+        }
+
+
+def plan_leave(user_id: int, start: date, end: date, leave_type: str = 'paid') -> LeavePlan:
+    """Split *start*–*end* into working days per year and, for paid
+    leave, look up the balance of each affected year.
+
+    NOTE: Must be called inside an application context.
+    """
+    breakdown = working_days_by_year(start, end)
+    balances = get_balances(user_id, breakdown) if leave_type == 'paid' and breakdown else {}
+    return LeavePlan(
+        start=start,
+        end=end,
+        leave_type=leave_type,
+        working_days=sum(breakdown.values()),
+        breakdown=breakdown,
+        balances=balances,
+    )
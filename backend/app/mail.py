@@ -4,12 +4,12 @@ SMTP settings are read from environment variables.
 """
 
 import os
-import html as html_lib
 import logging
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+from app.email_templates import fragment, render
+
 logger = logging.getLogger("smartattend.mail")
 
 
@@ -46,54 +46,53 @@ def is_mail_configured() -> bool:
     return bool(SMTP_HOST and SMTP_USER and SMTP_PASS and REPORT_RECIPIENTS)
 
 
-def send_html_email(subject: str, html_body: str, recipients: list[str] | None = None):
-    """
-    Send an HTML email to one or more recipients.
-    Falls back to REPORT_RECIPIENTS if none specified.
-    """
-    to_addrs = recipients or REPORT_RECIPIENTS
-    if not to_addrs:
-        logger.warning("No recipients configured – skipping send.")
-        return
-
-    if not is_smtp_configured():
-        logger.warning("SMTP not configured – skipping send.")
-        return
-
+def _build_message(subject: str, html_body: str, to_addrs: list[str]) -> MIMEMultipart:
     msg = MIMEMultipart("alternative")
     msg["Subject"] = subject
     msg["From"] = SMTP_USER
     msg["To"] = ", ".join(to_addrs)
     msg.attach(MIMEText(html_body, "html"))
+    return msg
+
 
-    try:
-        if SMTP_PORT == 465:
-            # SSL
-            with smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) as server:
-                server.login(SMTP_USER, SMTP_PASS)
-                server.sendmail(SMTP_USER, to_addrs, msg.as_string())
-        else:
-            # STARTTLS (default)
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-                if SMTP_USE_TLS:
-                    server.starttls()
-                server.login(SMTP_USER, SMTP_PASS)
-                server.sendmail(SMTP_USER, to_addrs, msg.as_string())
-        logger.info("Email sent to %s", to_addrs)
-        return True
-    except Exception as e:
-        logger.error("Failed to send email: %s", e)
-        return False
+def send_html_emails(emails: list[tuple[str, str, list[str]]]) -> list[bool | None]:
+    """
+    Send several ``(subject, html_body, recipients)`` emails in one batch
+    over a pooled, kept-alive SMTP connection (see app/mail_transport.py).
+    Returns, per email, True if sent, False on failure, None if there
+    was nothing to send (no recipients / SMTP not configured).
+    """
+    if not is_smtp_configured():
+        if emails:
+            logger.warning("SMTP not configured – skipping send.")
+        return [None] * len(emails)
+
+    results: list[bool | None] = [None] * len(emails)
+    batch, indexes = [], []
+    for i, (subject, html_body, to_addrs) in enumerate(emails):
+        if not to_addrs:
+            logger.warning("No recipients configured – skipping send.")
+            continue
+        batch.append(_build_message(subject, html_body, to_addrs))
+        indexes.append(i)
+
+    from app.mail_transport import get_pool
+    for i, sent in zip(indexes, get_pool().send(batch)):
+        results[i] = sent
+        if sent:
+            logger.info("Email sent to %s", emails[i][2])
+    return results
 
 
-# ── Leave notification emails ────────────────────────────────────────
+def send_html_email(subject: str, html_body: str, recipients: list[str] | None = None):
+    """
+    Send an HTML email to one or more recipients.
+    Falls back to REPORT_RECIPIENTS if none specified.
+    """
+    return send_html_emails([(subject, html_body, recipients or REPORT_RECIPIENTS)])[0]
 
-def _format_reason(reason: str) -> str:
-    """Escape HTML and convert newlines to <br> for rich-text display in emails."""
-    if not reason:
-        return "—"
-    return html_lib.escape(reason).replace("\n", "<br>")
 
+# ── Leave notification emails ────────────────────────────────────────
 
 def _leave_type_label(leave_type: str) -> str:
     return "Paid Leave" if leave_type == "paid" else "Unpaid Leave"
@@ -115,7 +114,7 @@ def _status_emoji(status: str) -> str:
     }.get(status, "")
 
 
-def send_leave_application_email(
+def leave_application_email(
     employee_name: str,
     employee_email: str,
     leave_type: str,
@@ -124,78 +123,37 @@ def send_leave_application_email(
     working_days: int,
     reason: str,
 ):
-    """Notify admin recipients that an employee has applied for leave."""
+    """(subject, html, recipients) telling admin recipients that an
+    employee has applied for leave; None if there is nobody to tell.
+    """
     if not is_smtp_configured() or not REPORT_RECIPIENTS:
         logger.warning("SMTP / recipients not configured – skipping leave notification.")
-        return
+        return None
 
     type_label = _leave_type_label(leave_type)
     subject = f"📝 New Leave Application — {employee_name} ({type_label})"
 
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head><meta charset="utf-8"></head>
-    <body style="margin:0;padding:0;font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;background:#f3f4f6;">
-      <div style="max-width:560px;margin:30px auto;background:#fff;border-radius:12px;overflow:hidden;box-shadow:0 1px 3px rgba(0,0,0,0.1);">
-
-        <!-- Header -->
-        <div style="background:linear-gradient(135deg,#d97706,#f59e0b);padding:28px 32px;color:#fff;">
-          <h1 style="margin:0;font-size:20px;">📝 New Leave Application</h1>
-          <p style="margin:6px 0 0;font-size:14px;opacity:0.9;">An employee has applied for leave</p>
-        </div>
-
-        <!-- Details -->
-        <div style="padding:24px 32px;">
-          <table style="width:100%;border-collapse:collapse;font-size:14px;">
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;width:140px;">Employee</td>
-              <td style="padding:10px 0;font-weight:600;">{employee_name}</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">Email</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{employee_email}</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">Leave Type</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">
-                <span style="display:inline-block;padding:2px 10px;border-radius:9999px;font-size:12px;font-weight:600;color:#fff;background:{'#2563eb' if leave_type == 'paid' else '#7c3aed'};">
-                  {type_label}
-                </span>
-              </td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">From</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{start_date.strftime('%B %d, %Y')}</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">To</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{end_date.strftime('%B %d, %Y')}</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">Working Days</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;font-weight:600;">{working_days} day(s)</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">Reason</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{_format_reason(reason)}</td>
-            </tr>
-          </table>
-        </div>
-
-        <!-- Footer -->
-        <div style="background:#fffbeb;padding:16px 32px;text-align:center;font-size:13px;color:#92400e;border-top:1px solid #fde68a;">
-          ⏳ This leave is <strong>pending approval</strong>. Please review it in the SmartAttend admin panel.
-        </div>
-      </div>
-    </body>
-    </html>
-    """
+    html = render(
+        "leave_application.html",
+        employee_name=employee_name,
+        employee_email=employee_email,
+        type_pill=fragment("pill", type_label, "#2563eb" if leave_type == "paid" else "#7c3aed"),
+        start_date=start_date.strftime('%B %d, %Y'),
+        end_date=end_date.strftime('%B %d, %Y'),
+        working_days=working_days,
+        reason=reason,
+    )
+
+    return subject, html, REPORT_RECIPIENTS
 
-    send_html_email(subject, html, REPORT_RECIPIENTS)
+
+def send_leave_application_email(**kwargs):
+    """Notify admin recipients that an employee has applied for leave."""
+    email = leave_application_email(**kwargs)
+    return send_html_email(*email) if email else None
 
 
-def send_leave_status_email(
+def leave_status_email(
     employee_name: str,
     employee_email: str,
     leave_type: str,
@@ -205,90 +163,37 @@ def send_leave_status_email(
     reason: str,
     new_status: str,
 ):
-    """Notify the employee that their leave status has been updated."""
+    """(subject, html, recipients) telling the employee that their leave
+    status has been updated; None if SMTP isn't configured.
+    """
     if not is_smtp_configured():
         logger.warning("SMTP not configured – skipping leave-status notification.")
-        return
+        return None
 
     type_label = _leave_type_label(leave_type)
     emoji = _status_emoji(new_status)
-    color = _status_color(new_status)
     status_text = new_status.capitalize()
 
     subject = f"{emoji} Your Leave Has Been {status_text} — {type_label}"
 
-    if new_status == "approved":
-        header_gradient = "linear-gradient(135deg,#15803d,#22c55e)"
-        banner_bg = "#f0fdf4"
-        banner_border = "#bbf7d0"
-        banner_color = "#166534"
-        banner_msg = "Your leave request has been <strong>approved</strong>. Enjoy your time off!"
-    else:
-        header_gradient = "linear-gradient(135deg,#b91c1c,#ef4444)"
-        banner_bg = "#fef2f2"
-        banner_border = "#fecaca"
-        banner_color = "#991b1b"
-        banner_msg = "Your leave request has been <strong>rejected</strong>. Please contact your admin for details."
-
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head><meta charset="utf-8"></head>
-    <body style="margin:0;padding:0;font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;background:#f3f4f6;">
-      <div style="max-width:560px;margin:30px auto;background:#fff;border-radius:12px;overflow:hidden;box-shadow:0 1px 3px rgba(0,0,0,0.1);">
-
-        <!-- Header -->
-        <div style="background:{header_gradient};padding:28px 32px;color:#fff;">
-          <h1 style="margin:0;font-size:20px;">{emoji} Leave {status_text}</h1>
-          <p style="margin:6px 0 0;font-size:14px;opacity:0.9;">Hi {employee_name}, your leave status has been updated</p>
-        </div>
-
-        <!-- Status banner -->
-        <div style="margin:20px 32px 0;padding:14px 18px;background:{banner_bg};border:1px solid {banner_border};border-radius:8px;font-size:14px;color:{banner_color};">
-          {banner_msg}
-        </div>
-
-        <!-- Details -->
-        <div style="padding:20px 32px 24px;">
-          <table style="width:100%;border-collapse:collapse;font-size:14px;">
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;width:140px;">Status</td>
-              <td style="padding:10px 0;">
-                <span style="display:inline-block;padding:2px 12px;border-radius:9999px;font-size:12px;font-weight:600;color:#fff;background:{color};">
-                  {status_text}
-                </span>
-              </td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">Leave Type</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{type_label}</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">From</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{start_date.strftime('%B %d, %Y')}</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">To</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{end_date.strftime('%B %d, %Y')}</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">Working Days</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{working_days} day(s)</td>
-            </tr>
-            <tr>
-              <td style="padding:10px 0;color:#6b7280;border-top:1px solid #f3f4f6;">Reason</td>
-              <td style="padding:10px 0;border-top:1px solid #f3f4f6;">{_format_reason(reason)}</td>
-            </tr>
-          </table>
-        </div>
-
-        <!-- Footer -->
-        <div style="background:#f8fafc;padding:16px 32px;text-align:center;font-size:12px;color:#94a3b8;border-top:1px solid #e2e8f0;">
-          SmartAttend &middot; Automated notification
-        </div>
-      </div>
-    </body>
-    </html>
-    """
+    html = render(
+        "leave_status.html",
+        employee_name=employee_name,
+        new_status=new_status,
+        emoji=emoji,
+        status_text=status_text,
+        status_pill=fragment("pill", status_text, _status_color(new_status), "2px 12px"),
+        type_label=type_label,
+        start_date=start_date.strftime('%B %d, %Y'),
+        end_date=end_date.strftime('%B %d, %Y'),
+        working_days=working_days,
+        reason=reason,
+    )
+
+    return subject, html, [employee_email]
 
-    send_html_email(subject, html, [employee_email])
+
+def send_leave_status_email(**kwargs):
+    """Notify the employee that their leave status has been updated."""
+    email = leave_status_email(**kwargs)
+    return send_html_email(*email) if email else None
@@ -0,0 +1,183 @@
+"""
+Pooled SMTP transport.
+
+Opening a connection, negotiating TLS and logging in costs several round
+trips — far more than sending one message.  ``SMTPPool`` keeps up to
+SMTP_POOL_SIZE logged-in connections open between sends and pushes whole
+batches of messages through one of them.
+
+A connection left idle longer than SMTP_IDLE_SECONDS is probed with NOOP
+before reuse; one the server has dropped is replaced and the message
+retried once on a fresh connection.  Per-message refusals (bad
+recipient, rejected data) fail only that message.
+
+Settings are read from app.mail at connect time.
+"""
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from email.message import Message
+
+logger = logging.getLogger("smartattend.mail_transport")
+
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+SMTP_IDLE_SECONDS = 60
+SMTP_TIMEOUT = 30
+
+# Errors that concern a single message; the connection stays usable.
+# Anything else (disconnects, auth, socket errors) retires the connection.
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class _Connection:
+    __slots__ = ('smtp', 'last_used')
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    """Keep-alive pool of logged-in SMTP connections (thread-safe)."""
+
+    def __init__(self, size: int = SMTP_POOL_SIZE):
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: list[_Connection] = []
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.sent = 0
+        self.failed = 0
+
+    # ── Connections ──────────────────────────────────────────────────
+
+    def _connect(self) -> _Connection:
+        from app import mail
+
+        if mail.SMTP_PORT == 465:
+            smtp = smtplib.SMTP_SSL(mail.SMTP_HOST, mail.SMTP_PORT, timeout=SMTP_TIMEOUT)
+        else:
+            smtp = smtplib.SMTP(mail.SMTP_HOST, mail.SMTP_PORT, timeout=SMTP_TIMEOUT)
+            if mail.SMTP_USE_TLS:
+                smtp.starttls()
+        try:
+            smtp.login(mail.SMTP_USER, mail.SMTP_PASS)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self.connects += 1
+        return _Connection(smtp)
+
+    def _checkout(self) -> _Connection:
+        """An idle connection that still answers, or a new one."""
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return self._connect()
+            if time.monotonic() - conn.last_used < SMTP_IDLE_SECONDS:
+                return conn
+            try:
+                if conn.smtp.noop()[0] == 250:
+                    return conn
+            except Exception:
+                pass
+            conn.close()
+
+    def _checkin(self, conn: _Connection) -> None:
+        with self._lock:
+            self._idle.append(conn)
+
+    # ── Sending ──────────────────────────────────────────────────────
+
+    def send(self, messages: list[Message]) -> list[bool]:
+        """Send *messages* over one pooled connection; True per delivered message.
+
+        Each message needs From and To headers (To may list several
+        addresses, comma-separated).
+        """
+        results = []
+        with self._slots:
+            conn = None
+            unreachable = False
+            for msg in messages:
+                results.append(False)
+                if unreachable:
+                    continue  # don't wait out another connect timeout per message
+                for attempt in (1, 2):
+                    try:
+                        conn = conn or self._checkout()
+                        conn.smtp.send_message(msg)
+                        conn.last_used = time.monotonic()
+                        results[-1] = True
+                        break
+                    except _MESSAGE_ERRORS as e:
+                        logger.error("SMTP refused message to %s: %s", msg["To"], e)
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        if conn is not None:
+                            conn.close()
+                            conn = None
+                        if attempt == 2:
+                            logger.error("Failed to send email to %s: %s", msg["To"], e)
+                            unreachable = True
+                        else:
+                            logger.warning("SMTP connection lost (%s) — reconnecting", e)
+            if conn is not None:
+                self._checkin(conn)
+
+        with self._lock:
+            self.sent += sum(results)
+            self.failed += len(results) - sum(results)
+        return results
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'connects': self.connects,
+                'sent': self.sent,
+                'failed': self.failed,
+            }
+
+
+_pool: SMTPPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    """The process-wide pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool()
+        return _pool
+
+
+def reset_pool() -> None:
+    """Close every pooled connection and start afresh (e.g. after settings change)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
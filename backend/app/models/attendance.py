@@ -1,5 +1,13 @@
 from app.extensions import db
 from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
 
 class Attendance(db.Model):
     __tablename__ = 'attendance'
@@ -12,3 +20,90 @@ class Attendance(db.Model):
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
 
     user = db.relationship("User", backref="attendance_records")
+
+    __table_args__ = (
+        # Every hot path looks up one user's row for one day; also
+        # guarantees at most one attendance row per user-day.
+        db.Index('ix_attendance_user_date', 'user_id', 'date', unique=True),
+    )
+
+    @staticmethod
+    def record_check_in(user_id: int, day, check_in_time: datetime):
+        """Atomically set *check_in_time* on the user's row for *day*, creating it if needed.
+
+        Runs as a single INSERT ... ON CONFLICT (user_id, date) DO UPDATE
+        ... RETURNING statement, so concurrent taps can never create two
+        rows for the same day.  *check_in_time* must be naive UTC.
+
+        Returns a row with ``id`` and ``check_in_time``, or None if the
+        user had already checked in for *day*.
+        """
+        table = Attendance.__table__
+        insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+
+        if insert is None:
+            # Generic fallback: the unique (user_id, date) index still
+            # guarantees one row per day; a lost race surfaces as an
+            # IntegrityError and is reported as "already checked in".
+            record = Attendance.query.filter_by(user_id=user_id, date=day).first()
+            if record and record.check_in_time:
+                return None
+            if not record:
+                record = Attendance(user_id=user_id, date=day)
+                db.session.add(record)
+            record.check_in_time = check_in_time
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                return None
+            return record
+
+        stmt = insert(table).values(
+            user_id=user_id, date=day, check_in_time=check_in_time, is_overtime=False,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.date],
+            set_={'check_in_time': stmt.excluded.check_in_time},
+            where=table.c.check_in_time.is_(None),
+        ).returning(table.c.id, table.c.check_in_time)
+
+        row = db.session.execute(stmt).first()
+        db.session.commit()
+        return row
+
+    @staticmethod
+    def record_check_out(user_id: int, day, check_out_time: datetime):
+        """Atomically set *check_out_time* on the user's row for *day*.
+
+        Only succeeds if the user has checked in and not yet checked out.
+        Returns a row with ``check_in_time`` and ``check_out_time``, or
+        None if nothing was updated.  *check_out_time* must be naive UTC.
+        """
+        table = Attendance.__table__
+        stmt = (
+            db.update(table)
+            .where(
+                table.c.user_id == user_id,
+                table.c.date == day,
+                table.c.check_in_time.isnot(None),
+                table.c.check_out_time.is_(None),
+            )
+            .values(check_out_time=check_out_time)
+        )
+
+        if db.session.get_bind().dialect.update_returning:
+            row = db.session.execute(
+                stmt.returning(table.c.check_in_time, table.c.check_out_time)
+            ).first()
+            db.session.commit()
+            return row
+
+        result = db.session.execute(stmt)
+        db.session.commit()
+        if result.rowcount != 1:
+            return None
+        return db.session.execute(
+            db.select(table.c.check_in_time, table.c.check_out_time)
+            .where(table.c.user_id == user_id, table.c.date == day)
+        ).first()
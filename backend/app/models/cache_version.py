@@ -0,0 +1,48 @@
+from app.extensions import db
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class CacheVersion(db.Model):
+    """A counter per named set of cached data, bumped by every committed
+    change to it, so every process can tell its copy is out of date
+    (see app/cache_sync.py).  Timestamps are naive UTC.
+    """
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    @staticmethod
+    def bump(connection, name: str) -> None:
+        """Increment *name*'s version on *connection*, inside the caller's
+        transaction.
+        """
+        table = CacheVersion.__table__
+        insert = _UPSERT_INSERTS.get(connection.dialect.name)
+        if insert is not None:
+            connection.execute(
+                insert(table).values(name=name, version=0, updated_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=[table.c.name])
+            )
+        elif connection.execute(db.select(table.c.name).where(table.c.name == name)).first() is None:
+            connection.execute(db.insert(table).values(name=name, version=0, updated_at=datetime.utcnow()))
+        connection.execute(
+            db.update(table).where(table.c.name == name)
+            .values(version=table.c.version + 1, updated_at=datetime.utcnow())
+        )
+
+    @staticmethod
+    def current() -> dict[str, int]:
+        """Every name's version."""
+        return dict(db.session.query(CacheVersion.name, CacheVersion.version))
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name} v{self.version}>"
@@ -0,0 +1,36 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class BulkImportJob(db.Model):
+    """Progress and outcome of one bulk employee import.
+
+    Written by the thread running the import (app/bulk_import.py) and
+    read by the status endpoint, so any worker or container can answer
+    a poll.  All timestamps are naive UTC.
+    """
+    __tablename__ = 'bulk_import_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.JSON, nullable=True)   # summary once done
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'error': self.error,
+        }
+        if self.status == 'done':
+            data['result'] = self.result
+        return data
+
+    def __repr__(self):
+        return f"<BulkImportJob {self.id} {self.status}>"
@@ -0,0 +1,54 @@
+from app.extensions import db
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class ScheduledJobRun(db.Model):
+    """Last run of each daily scheduled job, shared by every process."""
+    __tablename__ = 'scheduled_job_runs'
+
+    job_id = db.Column(db.String(64), primary_key=True)
+    last_run_date = db.Column(db.Date, nullable=True)      # office-local date the run was for
+    last_run_at = db.Column(db.DateTime, nullable=True)    # naive UTC
+
+    @staticmethod
+    def claim(job_id: str, run_date) -> bool:
+        """Atomically mark *job_id* as run for *run_date*.
+
+        Returns True for exactly one caller per job and date, however many
+        processes (or catch-up attempts) race for it; everyone else gets
+        False and must not run the job.
+        """
+        table = ScheduledJobRun.__table__
+        insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+        if insert is not None:
+            db.session.execute(
+                insert(table).values(job_id=job_id).on_conflict_do_nothing(index_elements=[table.c.job_id])
+            )
+        elif db.session.get(ScheduledJobRun, job_id) is None:
+            try:
+                db.session.add(ScheduledJobRun(job_id=job_id))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+
+        result = db.session.execute(
+            db.update(table)
+            .where(
+                table.c.job_id == job_id,
+                db.or_(table.c.last_run_date.is_(None), table.c.last_run_date < run_date),
+            )
+            .values(last_run_date=run_date, last_run_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def __repr__(self):
+        return f"<ScheduledJobRun {self.job_id} {self.last_run_date}>"
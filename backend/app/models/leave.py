@@ -13,6 +13,13 @@ class Leave(db.Model):
     status = db.Column(db.String(32), default='pending')  # pending, approved, rejected
     leave_type = db.Column(db.String(16), default='paid')  # paid, unpaid
     working_days = db.Column(db.Integer, default=0)  # business days (excl. Sundays & holidays)
+    # Working days per calendar year, e.g. {"2025": 2, "2026": 1}; NULL on
+    # leaves applied before the split (all charged to start_date's year)
+    year_breakdown = db.Column(db.JSON, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     user = db.relationship("User", backref="leaves")
+
+    __table_args__ = (
+        db.Index('ix_leaves_user_start', 'user_id', 'start_date'),
+    )
@@ -5,13 +5,20 @@ ANNUAL_PAID_LEAVES = 21
 
 
 class LeaveBalance(db.Model):
-    """Tracks per-employee, per-year paid-leave allocation."""
+    """Tracks per-employee, per-year paid-leave allocation.
+
+    ``used_days`` / ``pending_days`` are a ledger of approved / pending
+    paid leave charged to the year, maintained by app/leave_ledger.py
+    in the same transaction as the leave itself.
+    """
     __tablename__ = 'leave_balances'
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     year = db.Column(db.Integer, nullable=False)
     total_leaves = db.Column(db.Integer, nullable=False, default=ANNUAL_PAID_LEAVES)
+    used_days = db.Column(db.Integer, nullable=False, default=0)
+    pending_days = db.Column(db.Integer, nullable=False, default=0)
 
     user = db.relationship("User", backref="leave_balances")
 
@@ -19,6 +26,20 @@ class LeaveBalance(db.Model):
         db.UniqueConstraint('user_id', 'year', name='uq_user_year'),
     )
 
+    @property
+    def available(self) -> int:
+        return max(self.total_leaves - self.used_days - self.pending_days, 0)
+
+    def to_dict(self):
+        return {
+            'year': self.year,
+            'total': self.total_leaves,
+            'used': self.used_days,
+            'pending': self.pending_days,
+            'available': self.available,
+        }
+
     def __repr__(self):
-        return f"<LeaveBalance user={self.user_id} year={self.year} total={self.total_leaves}>"
+        return (f"<LeaveBalance user={self.user_id} year={self.year} total={self.total_leaves} "
+                f"used={self.used_days} pending={self.pending_days}>")
 
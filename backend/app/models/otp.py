@@ -13,6 +13,10 @@ class OTP(db.Model):
     expires_at = db.Column(db.DateTime, nullable=False)
     used = db.Column(db.Boolean, default=False)
 
+    __table_args__ = (
+        db.Index('ix_otps_user_purpose_used', 'user_id', 'purpose', 'used'),
+    )
+
     # OTP valid for 10 minutes
     OTP_VALIDITY_MINUTES = 10
 
@@ -0,0 +1,31 @@
+from app.extensions import db
+from datetime import datetime
+
+
+class OutboxMessage(db.Model):
+    """A queued outbound notification (WhatsApp message, email …).
+
+    Request handlers only insert rows here; the outbox worker
+    (app/outbox.py) delivers them in batches and records retry state.
+    All timestamps are naive UTC.
+    """
+    __tablename__ = 'outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(32), nullable=False)          # see app.outbox handlers
+    payload = db.Column(db.JSON, nullable=False)
+    dedup_key = db.Column(db.String(191), nullable=True, unique=True)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # The worker's claim query: due pending rows, oldest first
+        db.Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<OutboxMessage {self.id} {self.kind} {self.status}>"
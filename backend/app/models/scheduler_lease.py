@@ -0,0 +1,73 @@
+from app.extensions import db
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+class SchedulerLease(db.Model):
+    """A named lease held by at most one process at a time.
+
+    The holder renews it well before ``expires_at``; once it lapses any
+    other process may take it over.  All timestamps are naive UTC.
+    """
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(64), primary_key=True)
+    holder = db.Column(db.String(128), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    acquired_at = db.Column(db.DateTime, nullable=True)
+
+    @staticmethod
+    def acquire(name: str, holder: str, ttl_seconds: int) -> bool:
+        """Take or renew the lease *name* for *holder*.
+
+        Returns True if *holder* now holds the lease for another
+        *ttl_seconds*, False if someone else holds an unexpired one.
+        """
+        table = SchedulerLease.__table__
+        now = datetime.utcnow()
+        insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+        if insert is not None:
+            db.session.execute(
+                insert(table).values(name=name, expires_at=now)
+                .on_conflict_do_nothing(index_elements=[table.c.name])
+            )
+        elif db.session.get(SchedulerLease, name) is None:
+            try:
+                db.session.add(SchedulerLease(name=name, expires_at=now))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+
+        # Renewal keeps acquired_at; a takeover resets it
+        acquired_at = db.case((table.c.holder == holder, table.c.acquired_at), else_=now)
+        result = db.session.execute(
+            db.update(table)
+            .where(
+                table.c.name == name,
+                db.or_(table.c.holder == holder, table.c.holder.is_(None), table.c.expires_at <= now),
+            )
+            .values(holder=holder, expires_at=now + timedelta(seconds=ttl_seconds), acquired_at=acquired_at)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def release(name: str, holder: str) -> None:
+        """Give the lease up early so another process can take over at once."""
+        table = SchedulerLease.__table__
+        db.session.execute(
+            db.update(table)
+            .where(table.c.name == name, table.c.holder == holder)
+            .values(holder=None, expires_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+    def __repr__(self):
+        return f"<SchedulerLease {self.name} {self.holder} until {self.expires_at}>"
@@ -13,3 +13,7 @@ class Tour(db.Model):
     status = db.Column(db.String(32), default='pending')  # pending, approved, rejected
 
     user = db.relationship("User", backref="tours")
+
+    __table_args__ = (
+        db.Index('ix_tours_user_start', 'user_id', 'start_date'),
+    )
@@ -1,5 +1,12 @@
+from types import SimpleNamespace
+from app.cache import TTLCache
 from app.extensions import db
 
+# Read on every check-in / check-out; changes go through
+# admin_update_whatsapp_schedule, which invalidates it, and other
+# processes drop it via app/cache_sync.py (see app/whatsapp_jobs.py).
+_settings_cache = TTLCache(maxsize=1, ttl=60)
+
 
 class WhatsAppScheduleConfig(db.Model):
     """Single-row config storing WhatsApp notification schedule times (HH:MM format)
@@ -24,6 +31,10 @@ class WhatsAppScheduleConfig(db.Model):
     checkin_alert_enabled = db.Column(db.Boolean, nullable=False, default=True)
     checkout_alert_enabled = db.Column(db.Boolean, nullable=False, default=True)
 
+    # Check-in/out alerts within this many minutes are coalesced into one
+    # digest per admin (0 = send each alert immediately)
+    alert_digest_window_minutes = db.Column(db.Integer, nullable=False, default=0)
+
     @classmethod
     def get_current(cls):
         """Return the current schedule config, creating defaults if none exists."""
@@ -34,6 +45,21 @@ class WhatsAppScheduleConfig(db.Model):
             db.session.commit()
         return config
 
+    @classmethod
+    def get_settings(cls) -> SimpleNamespace:
+        """Return a cached, read-only snapshot of the current config.
+
+        Cheap enough for hot request paths; use ``get_current()`` when the
+        row itself needs to be modified.
+        """
+        return _settings_cache.get_or_set(
+            'current', lambda: SimpleNamespace(**cls.get_current().to_dict())
+        )
+
+    @staticmethod
+    def invalidate_settings():
+        _settings_cache.clear()
+
     def to_dict(self):
         return {
             'reminder_time': self.reminder_time,
@@ -48,6 +74,7 @@ class WhatsAppScheduleConfig(db.Model):
             'midnight_alert_enabled': self.midnight_alert_enabled,
             'checkin_alert_enabled': self.checkin_alert_enabled,
             'checkout_alert_enabled': self.checkout_alert_enabled,
+            'alert_digest_window_minutes': self.alert_digest_window_minutes or 0,
         }
 
     def __repr__(self):
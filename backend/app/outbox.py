@@ -0,0 +1,404 @@
+"""
+Durable outbound notification queue.
+
+Request handlers call ``enqueue`` (one INSERT into the ``outbox`` table,
+committed with the rest of their transaction) instead of spawning a
+thread per notification.  A single background worker, run by the
+scheduler leader (app/leader.py), claims due rows in batches, hands
+them to the handler registered for their ``kind`` and records the
+outcome (rows committed by other processes wait for its next poll, at
+most POLL_SECONDS):
+
+* delivered  → ``status='sent'``;
+* failed     → retried after RETRY_DELAYS, up to MAX_ATTEMPTS, then
+  ``status='failed'`` with ``last_error`` kept for inspection.
+
+Delivered rows are purged after RETENTION_DAYS, failed ones after
+FAILED_RETENTION_DAYS.
+
+Claimed rows are leased (``next_attempt_at`` pushed LEASE_SECONDS into
+the future) rather than locked for the whole send, so a row claimed by a
+process that dies mid-send is simply picked up again later.  On
+PostgreSQL the claim uses ``FOR UPDATE SKIP LOCKED``, so several
+processes can drain the same table safely.  An optional ``dedup_key``
+(unique) makes enqueueing idempotent.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.outbox import OutboxMessage
+
+logger = logging.getLogger("smartattend.outbox")
+
+BATCH_SIZE = 50
+POLL_SECONDS = 5
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 6
+RETRY_DELAYS = (30, 120, 600, 1800, 3600)  # seconds, after attempt 1, 2, …
+RETENTION_DAYS = 7  # delivered rows are purged after this long
+FAILED_RETENTION_DAYS = 30  # failed rows are kept longer, for inspection
+PURGE_EVERY_SECONDS = 3600
+
+# Max WhatsApp messages per second handed to the Graph API
+WHATSAPP_RATE = float(os.getenv("OUTBOX_WHATSAPP_RATE", "10"))
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.utcnow()
+
+
+# ── Enqueueing ───────────────────────────────────────────────────────
+
+def enqueue(kind: str, payload: dict, dedup_key: str | None = None, delay_seconds: float = 0) -> None:
+    """Queue one message; see ``enqueue_many``."""
+    enqueue_many([{'kind': kind, 'payload': payload, 'dedup_key': dedup_key}], delay_seconds)
+
+
+def enqueue_many(messages: list[dict], delay_seconds: float = 0) -> None:
+    """Queue messages (dicts with kind, payload, optional dedup_key) in one INSERT.
+
+    The insert joins the current session's transaction; nothing is
+    delivered until the caller commits.  Messages whose dedup_key is
+    already queued are silently dropped.
+
+    NOTE: Must be called inside an application context.
+    """
+    if not messages:
+        return
+    due = _utcnow() + timedelta(seconds=delay_seconds)
+    rows = [{
+        'kind': m['kind'],
+        'payload': m['payload'],
+        'dedup_key': m.get('dedup_key'),
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt_at': due,
+        'created_at': _utcnow(),
+    } for m in messages]
+
+    table = OutboxMessage.__table__
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(table).on_conflict_do_nothing(index_elements=[table.c.dedup_key])
+    else:
+        # Generic fallback: drop keys that are already queued
+        keys = [r['dedup_key'] for r in rows if r['dedup_key']]
+        taken = {k for (k,) in db.session.query(OutboxMessage.dedup_key).filter(
+            OutboxMessage.dedup_key.in_(keys))} if keys else set()
+        rows = [r for r in rows if r['dedup_key'] not in taken]
+        stmt = db.insert(table)
+    if rows:
+        db.session.execute(stmt, rows)
+        db.session.info['outbox_enqueued'] = True
+
+
+# ── Handlers ─────────────────────────────────────────────────────────
+
+class RateLimiter:
+    """Token bucket: allows *rate* operations per second (bursts up to *rate*)."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: int = 1) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+# kind -> (fn(payloads) -> list[error or None], RateLimiter or None)
+_handlers: dict = {}
+# Kinds whose due rows are always delivered together (see ``handler``)
+_coalesced: set[str] = set()
+
+
+def handler(kind: str, rate: float | None = None, coalesce: bool = False):
+    """Register the delivery function for *kind*.
+
+    The function receives a list of payloads and returns a list of the
+    same length: None for each delivered message, or an error string.
+    With *rate*, batches are split and paced to *rate* messages/second.
+    With *coalesce*, every due row of the kind is handed over in a single
+    call, regardless of BATCH_SIZE, so the handler can merge them.
+    """
+    def register(fn):
+        _handlers[kind] = (fn, RateLimiter(rate) if rate else None)
+        if coalesce:
+            _coalesced.add(kind)
+        return fn
+    return register
+
+
+@handler('whatsapp', rate=WHATSAPP_RATE)
+def _deliver_whatsapp(payloads: list[dict]) -> list[str | None]:
+    from app.whatsapp import fan_out_results, SENT
+
+    results = fan_out_results([(p['to'], p['template'], p['params']) for p in payloads])
+    return [None if r == SENT else f"WhatsApp send {r}" for r in results]
+
+
+@handler('whatsapp_digest', coalesce=True)
+def _deliver_whatsapp_digest(payloads: list[dict]) -> list[str | None]:
+    from app.whatsapp import fan_out_results, digest_message, SENT
+
+    by_recipient: dict[str, list[int]] = {}
+    for i, p in enumerate(payloads):
+        by_recipient.setdefault(p['to'], []).append(i)
+
+    results = fan_out_results(
+        digest_message([payloads[i] for i in indexes]) for indexes in by_recipient.values()
+    )
+    errors: list[str | None] = [None] * len(payloads)
+    for indexes, result in zip(by_recipient.values(), results):
+        if result != SENT:
+            for i in indexes:
+                errors[i] = f"WhatsApp digest {result}"
+    return errors
+
+
+def _send_emails(emails: list) -> list[str | None]:
+    """Send (subject, html, recipients) tuples — or None for "nothing to
+    send" — as one batch over a pooled SMTP connection.
+    """
+    from app.mail import send_html_emails
+
+    to_send = [i for i, e in enumerate(emails) if e]
+    results = send_html_emails([emails[i] for i in to_send])
+    errors: list[str | None] = [None] * len(emails)
+    for i, sent in zip(to_send, results):
+        # False = SMTP failure (None = nothing to send)
+        if sent is False:
+            errors[i] = "SMTP send failed"
+    return errors
+
+
+def _email_handler(build_fn_name: str):
+    def deliver(payloads: list[dict]) -> list[str | None]:
+        from app import mail
+
+        build = getattr(mail, build_fn_name)
+        emails = []
+        for p in payloads:
+            kwargs = dict(p)
+            for key in ('start_date', 'end_date'):
+                if kwargs.get(key):
+                    kwargs[key] = date.fromisoformat(kwargs[key])
+            emails.append(build(**kwargs))
+        return _send_emails(emails)
+    return deliver
+
+
+handler('leave_application_email')(_email_handler('leave_application_email'))
+handler('leave_status_email')(_email_handler('leave_status_email'))
+
+
+# ── Delivery ─────────────────────────────────────────────────────────
+
+def _claim_batch(limit: int | None, kind: str | None = None) -> list[tuple]:
+    """Lease up to *limit* due rows (of *kind*, if given).
+
+    Returns (id, kind, payload, attempts) tuples.
+    """
+    now = _utcnow()
+    query = db.session.query(OutboxMessage).filter(
+        OutboxMessage.status == 'pending',
+        OutboxMessage.next_attempt_at <= now,
+    )
+    if kind is not None:
+        query = query.filter(OutboxMessage.kind == kind)
+    query = query.order_by(OutboxMessage.next_attempt_at, OutboxMessage.id).limit(limit)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+
+    claimed = []
+    for msg in query.all():
+        msg.attempts += 1
+        msg.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+        claimed.append((msg.id, msg.kind, msg.payload, msg.attempts))
+    db.session.commit()
+    return claimed
+
+
+def _record_results(items: list[tuple], errors: list[str | None]) -> None:
+    now = _utcnow()
+    sent_ids = [item[0] for item, err in zip(items, errors) if err is None]
+    if sent_ids:
+        db.session.execute(
+            db.update(OutboxMessage).where(OutboxMessage.id.in_(sent_ids))
+            .values(status='sent', sent_at=now, last_error=None)
+        )
+    for (msg_id, kind, _payload, attempts), err in zip(items, errors):
+        if err is None:
+            continue
+        if attempts >= MAX_ATTEMPTS:
+            values = {'status': 'failed', 'last_error': err}
+            logger.error("Outbox message %s (%s) failed permanently: %s", msg_id, kind, err)
+        else:
+            delay = RETRY_DELAYS[min(attempts, len(RETRY_DELAYS)) - 1]
+            values = {'next_attempt_at': now + timedelta(seconds=delay), 'last_error': err}
+        db.session.execute(db.update(OutboxMessage).where(OutboxMessage.id == msg_id).values(**values))
+    db.session.commit()
+
+
+def process_batch(limit: int = BATCH_SIZE) -> int:
+    """Deliver up to *limit* due messages; returns how many were claimed.
+
+    NOTE: Must be called inside an application context.
+    """
+    claimed = _claim_batch(limit)
+    for kind in _coalesced & {item[1] for item in claimed}:
+        claimed += _claim_batch(None, kind=kind)  # the rest of this kind's due rows
+
+    by_kind: dict[str, list[tuple]] = {}
+    for item in claimed:
+        by_kind.setdefault(item[1], []).append(item)
+
+    for kind, items in by_kind.items():
+        fn, limiter = _handlers.get(kind, (None, None))
+        if fn is None:
+            _record_results(items, [f"No handler for kind '{kind}'"] * len(items))
+            continue
+        step = max(int(limiter.rate), 1) if limiter else len(items)
+        for start in range(0, len(items), step):
+            chunk = items[start:start + step]
+            if limiter:
+                limiter.acquire(len(chunk))
+            try:
+                errors = fn([item[2] for item in chunk])
+            except Exception as e:
+                logger.exception("Outbox handler for %s crashed", kind)
+                errors = [str(e)] * len(chunk)
+            _record_results(chunk, errors)
+    return len(claimed)
+
+
+def purge_outbox(sent_days: int = RETENTION_DAYS, failed_days: int = FAILED_RETENTION_DAYS) -> int:
+    """Delete rows delivered more than *sent_days* ago and rows that failed
+    permanently and were queued more than *failed_days* ago; returns the count.
+    """
+    now = _utcnow()
+    deleted = db.session.query(OutboxMessage).filter(db.or_(
+        db.and_(OutboxMessage.status == 'sent',
+                OutboxMessage.sent_at < now - timedelta(days=sent_days)),
+        db.and_(OutboxMessage.status == 'failed',
+                OutboxMessage.created_at < now - timedelta(days=failed_days)),
+    )).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def outbox_stats() -> dict:
+    """Row counts per status, for monitoring."""
+    counts = dict(db.session.query(OutboxMessage.status, db.func.count()).group_by(OutboxMessage.status))
+    return {status: counts.get(status, 0) for status in ('pending', 'sent', 'failed')}
+
+
+# ── Worker ───────────────────────────────────────────────────────────
+
+class OutboxWorker:
+    """One daemon thread that drains the outbox for this process."""
+
+    def __init__(self, app):
+        self.app = app
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="outbox-worker")
+        self._last_purge = 0.0
+
+    def start(self):
+        self._thread.start()
+        logger.info("Outbox worker started (batch=%d, poll=%ds)", BATCH_SIZE, POLL_SECONDS)
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                with self.app.app_context():
+                    claimed = process_batch()
+                    if time.monotonic() - self._last_purge > PURGE_EVERY_SECONDS:
+                        self._last_purge = time.monotonic()
+                        purge_outbox()
+            except Exception:
+                logger.exception("Outbox worker iteration failed")
+            if claimed >= BATCH_SIZE:
+                continue  # more is probably waiting
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+
+
+_worker: OutboxWorker | None = None
+_worker_lock = threading.Lock()
+
+
+def start_worker(app) -> OutboxWorker:
+    """Start this process's outbox worker (idempotent)."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = OutboxWorker(app)
+            _worker.start()
+    return _worker
+
+
+def stop_worker(timeout: float | None = None) -> None:
+    """Stop this process's outbox worker, if it has one."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.stop(timeout)
+        logger.info("Outbox worker stopped")
+
+
+def notify_worker() -> None:
+    """Wake the worker if it runs in this process.
+
+    Only the scheduler leader (app/leader.py) runs a worker; other
+    processes leave their rows to its next poll.
+    """
+    if _worker is not None:
+        _worker.notify()
+
+
+# ── Wake the worker when queued messages are committed ───────────────
+
+@event.listens_for(Session, "after_commit")
+def _wake_on_commit(session):
+    if session.info.pop('outbox_enqueued', False):
+        notify_worker()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_enqueued(session):
+    session.info.pop('outbox_enqueued', None)
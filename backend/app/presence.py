@@ -0,0 +1,257 @@
+"""
+Presence index — "who is in right now", answered from memory.
+
+The admin roster asks for every employee's status on each refresh, and
+during the morning rush every check-in drops the cached attendance
+board, so each refresh re-ran the users ⋈ attendance join.  The presence
+index is updated in place instead: check-ins and check-outs apply their
+change directly, committed ORM changes to today's attendance (overtime
+toggles, corrections) are applied from the flushed rows, and only a new,
+deleted, renamed or re-roled user forces a rebuild.
+
+One ``__slots__`` record per employee, a dense slot number per user id,
+a ``bytearray`` of status codes indexed by slot and a count per status:
+lookups, updates and counts are O(1), and listing one status scans the
+byte array in C (``bytearray.find``).
+
+Built with one query at start-up and when the office day changes.  A
+user change committed by another process forces a rebuild within
+CACHE_SYNC_SECONDS (app/cache_sync.py); like the board, the index is
+also rebuilt after BOARD_TTL_SECONDS to pick up check-ins committed by
+other processes.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from datetime import date, datetime
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.attendance_board import (
+    ABSENT, ONLINE, OVERTIME, CHECKED_OUT, BOARD_TTL_SECONDS, AttendanceBoard, build_board,
+)
+from app.cache_sync import subscribe
+from app.models.attendance import Attendance
+from app.models.user import User
+from app.office_config import office_today
+
+logger = logging.getLogger("smartattend.presence")
+
+STATUSES = (ABSENT, ONLINE, OVERTIME, CHECKED_OUT)
+_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+def _status_code(check_in_time, check_out_time, is_overtime) -> int:
+    """Index into STATUSES — same rules as ``BoardEntry.status``."""
+    if not check_in_time:
+        return 0
+    if check_out_time:
+        return 3
+    return 2 if is_overtime else 1
+
+
+class PresenceRecord:
+    """One employee's attendance for the index's day."""
+    __slots__ = ('user_id', 'name', 'slot', 'check_in_time', 'check_out_time', 'is_overtime')
+
+    def __init__(self, user_id: int, name: str, slot: int, check_in_time: datetime | None,
+                 check_out_time: datetime | None, is_overtime: bool):
+        self.user_id = user_id
+        self.name = name
+        self.slot = slot
+        self.check_in_time = check_in_time
+        self.check_out_time = check_out_time
+        self.is_overtime = is_overtime
+
+    @property
+    def status(self) -> str:
+        return STATUSES[_status_code(self.check_in_time, self.check_out_time, self.is_overtime)]
+
+
+class PresenceIndex:
+    """Status of every non-admin employee for one day, ordered by name."""
+
+    def __init__(self, day: date, board: AttendanceBoard):
+        self.day = day
+        self.built_at = time.monotonic()
+        self._records: list[PresenceRecord] = []
+        self._slots: dict[int, int] = {}
+        self._codes = bytearray(len(board))
+        self._counts = [0] * len(STATUSES)
+        self._lock = threading.Lock()
+        for slot, e in enumerate(board.entries):
+            code = _status_code(e.check_in_time, e.check_out_time, e.is_overtime)
+            self._records.append(PresenceRecord(e.user_id, e.name, slot, e.check_in_time,
+                                                e.check_out_time, e.is_overtime))
+            self._slots[e.user_id] = slot
+            self._codes[slot] = code
+            self._counts[code] += 1
+
+    def get(self, user_id: int) -> PresenceRecord | None:
+        slot = self._slots.get(user_id)
+        return None if slot is None else self._records[slot]
+
+    def status(self, user_id: int) -> str | None:
+        slot = self._slots.get(user_id)
+        return None if slot is None else STATUSES[self._codes[slot]]
+
+    def count(self, *statuses: str) -> int:
+        return sum(self._counts[_CODES[s]] for s in statuses)
+
+    def counts(self) -> dict[str, int]:
+        return dict(zip(STATUSES, self._counts))
+
+    def records(self, *statuses: str) -> list[PresenceRecord]:
+        """Employees with any of *statuses*, in name order."""
+        found = []
+        for status in statuses:
+            code, find = _CODES[status], self._codes.find
+            slot = find(code)
+            while slot != -1:
+                found.append(slot)
+                slot = find(code, slot + 1)
+        return [self._records[slot] for slot in sorted(found)]
+
+    def apply(self, user_id: int, check_in_time, check_out_time, is_overtime=None) -> bool:
+        """Set *user_id*'s attendance (``is_overtime=None`` keeps the flag);
+        False if they aren't in the index.
+        """
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                return False
+            record = self._records[slot]
+            record.check_in_time = check_in_time
+            record.check_out_time = check_out_time
+            if is_overtime is not None:
+                record.is_overtime = bool(is_overtime)
+            old = self._codes[slot]
+            new = _status_code(check_in_time, check_out_time, record.is_overtime)
+            if old != new:
+                self._codes[slot] = new
+                self._counts[old] -= 1
+                self._counts[new] += 1
+        return True
+
+    def __len__(self):
+        return len(self._records)
+
+
+_index: PresenceIndex | None = None
+_stale = False
+_build_lock = threading.Lock()
+# Bumped by every change, so a change that lands mid-rebuild isn't lost
+_generation = 0
+_generation_counter = itertools.count(1)
+
+
+def warm_presence(day: date | None = None) -> PresenceIndex:
+    """(Re)build the index for *day* (default: office today) — one query.
+
+    NOTE: Must be called inside an application context.
+    """
+    global _index, _stale
+    day = day or office_today()
+    _stale = False
+    generation = _generation
+    index = PresenceIndex(day, build_board(day))
+    _index = index
+    if _generation != generation:
+        _stale = True
+    logger.debug("Presence index built for %s: %s", day, index.counts())
+    return index
+
+
+def _needs_rebuild(index: PresenceIndex | None) -> bool:
+    return (index is None or _stale or index.day != office_today()
+            or time.monotonic() - index.built_at > BOARD_TTL_SECONDS)
+
+
+def get_presence() -> PresenceIndex:
+    """Today's presence index, rebuilt only if stale or from another day.
+
+    NOTE: Must be called inside an application context.
+    """
+    index = _index
+    if _needs_rebuild(index):
+        with _build_lock:
+            index = _index
+            if _needs_rebuild(index):
+                index = warm_presence()
+    return index
+
+
+def record_presence(user_id: int, day: date, check_in_time, check_out_time, is_overtime=None) -> None:
+    """Apply one employee's committed attendance for *day* to the index."""
+    global _generation
+    _generation = next(_generation_counter)
+    index = _index
+    if index is not None and index.day == day and not index.apply(
+            user_id, check_in_time, check_out_time, is_overtime):
+        invalidate_presence()  # not indexed yet (e.g. a brand-new employee)
+
+
+def invalidate_presence() -> None:
+    """Rebuild the index on its next use."""
+    global _stale, _generation
+    _generation = next(_generation_counter)
+    _stale = True
+
+
+def presence_counts() -> dict[str, int]:
+    """Employees per status right now, plus present / total."""
+    index = get_presence()
+    counts = index.counts()
+    counts['present'] = len(index) - counts[ABSENT]
+    counts['total'] = len(index)
+    return counts
+
+
+# ── Keeping up with committed changes ────────────────────────────────
+# Check-ins / check-outs are Core statements and call record_presence
+# themselves; ORM changes are picked up here.
+
+_REBUILD = None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_presence_changes(session, flush_context):
+    changes = session.info.setdefault('presence_changes', [])
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Attendance):
+            changes.append((obj.user_id, obj.date, obj.check_in_time, obj.check_out_time, obj.is_overtime))
+        elif isinstance(obj, User) and (obj in session.new or _roster_fields_changed(obj)):
+            changes.append(_REBUILD)
+    for obj in session.deleted:
+        if isinstance(obj, Attendance):
+            changes.append((obj.user_id, obj.date, None, None, False))
+        elif isinstance(obj, User):
+            changes.append(_REBUILD)
+
+
+def _roster_fields_changed(user: User) -> bool:
+    attrs = inspect(user).attrs
+    return attrs.name.history.has_changes() or attrs.role.history.has_changes()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_presence_changes(session):
+    changes = session.info.pop('presence_changes', None)
+    if not changes:
+        return
+    if _REBUILD in changes:
+        invalidate_presence()
+        return
+    for change in changes:
+        record_presence(*change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_presence_changes(session):
+    session.info.pop('presence_changes', None)
+
+
+subscribe('users', invalidate_presence)
@@ -0,0 +1,166 @@
+"""
+Report engine — the attendance report for any office day, ISO week
+(Monday start) or calendar month, past or current.
+
+* daily   — every employee's entry / exit for one day, plus present,
+            absent, late and average-hours totals, from the attendance
+            board (one query, cached per day);
+* weekly / monthly — per-employee present / absent days, late arrivals
+            and hours from ``employee_analytics`` (one grouped query over
+            the whole window) and present-per-day counts from
+            ``presence_by_day`` (one more).
+
+The cost of a report is therefore independent of headcount and of the
+window length, so any past report can be regenerated on demand.
+
+Rendered reports are cached per (period, first day) by ``get_report``,
+stamped with the board versions of every day they cover (and the
+working-day calendar's version for ranges).  A check-in, check-out or
+employee change invalidates the board for its day, which makes only the
+reports covering that day stale; everything else — repeated previews,
+the scheduled send — is a dictionary lookup.  Each entry carries an
+ETag so the preview tab gets 304s.  The TTL picks up changes committed
+by other worker processes.
+"""
+
+import hashlib
+import html as html_lib
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from app.attendance_board import BOARD_TTL_SECONDS, board_versions
+from app.attendance_stats import bucket_start, employee_analytics, presence_by_day
+from app.cache import TTLCache
+from app.daily_report import generate_report_html
+from app.email_templates import render_rows, row_parts
+from app.office_config import office_today, OFFICE_TZ, OFFICE_TIMEZONE_NAME
+from app.workdays import calendar_version, is_working_day
+
+PERIODS = ('daily', 'weekly', 'monthly')
+
+
+class RenderedReport(NamedTuple):
+    subject: str
+    html: str
+    etag: str
+    versions: tuple   # data versions the report was rendered from
+
+
+_report_cache = TTLCache(maxsize=64, ttl=BOARD_TTL_SECONDS)
+
+
+def report_window(day: date, period: str) -> tuple[date, date]:
+    """First and last day of the *period* containing *day*."""
+    if period == 'daily':
+        return day, day
+    if period == 'weekly':
+        start = bucket_start(day, 'week')
+        return start, start + timedelta(days=6)
+    if period == 'monthly':
+        return day.replace(day=1), day.replace(day=monthrange(day.year, day.month)[1])
+    raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+
+def _fmt_hours(value) -> str:
+    return "—" if value is None else f"{value:.1f}"
+
+
+def render_range_report(period: str, start: date, end: date) -> tuple[str, str]:
+    """
+    Render the weekly / monthly report for *start* … *end*.
+    Returns (subject, html_body).
+    """
+    today = office_today()
+    analytics = employee_analytics(start, end)
+    present = presence_by_day(start, end)
+
+    through = min(end, today)
+    days = []
+    day = start
+    while day <= end:
+        days.append({
+            'label': f"{day:%a} {day.day}" if period == 'weekly' else str(day.day),
+            'working': day <= through and is_working_day(day),
+            'present': present.get(day, 0),
+        })
+        day += timedelta(days=1)
+
+    p = row_parts("range_row", 7)  # bg, name, present, absent, late, avg, total
+    rows = [
+        f"{p[0]}{'#f9fafb' if i % 2 == 0 else '#ffffff'}{p[1]}{html_lib.escape(e['name'])}"
+        f"{p[2]}{e['days_present']}{p[3]}{e['absent_days']}{p[4]}{e['late_arrivals']}"
+        f"{p[5]}{_fmt_hours(e['avg_hours'])}{p[6]}{_fmt_hours(e['total_hours'])}{p[7]}"
+        for i, e in enumerate(analytics['employees'])
+    ]
+
+    if period == 'weekly':
+        title = "Weekly Attendance Report"
+        range_str = f"{start:%b %d} – {end:%b %d, %Y}"
+    else:
+        title = "Monthly Attendance Report"
+        range_str = f"{start:%B %Y}"
+
+    html = render_rows(
+        "range_report.html",
+        rows,
+        title=title,
+        range_str=range_str,
+        partial=end > today >= start,
+        through_str=f"{through:%b %d}",
+        timezone=OFFICE_TIMEZONE_NAME,
+        org=analytics['organisation'],
+        days=days,
+        generated_at=datetime.now(OFFICE_TZ).strftime("%-I:%M %p %Z"),
+    )
+    return f"📊 {title} — {range_str}", html
+
+
+def generate_report(day: date | None = None, period: str = 'daily') -> tuple[str, str]:
+    """
+    The *period* report containing *day* (default: the current office day).
+    Returns (subject, html_body).
+
+    NOTE: Must be called inside an application context.
+    """
+    day = day or office_today()
+    if period == 'daily':
+        return generate_report_html(day)
+    start, end = report_window(day, period)
+    return render_range_report(period, start, end)
+
+
+def _data_versions(period: str, start: date, end: date) -> tuple:
+    if period == 'daily':
+        return board_versions(start)
+    return (calendar_version(), *board_versions(start, end))
+
+
+def get_report(day: date | None = None, period: str = 'daily') -> RenderedReport:
+    """Like ``generate_report``, from cache unless the data behind it changed.
+
+    NOTE: Must be called inside an application context.
+    """
+    day = day or office_today()
+    start, end = report_window(day, period)
+    key = (period, start)
+    # Read versions before rendering: a change made meanwhile leaves the
+    # entry stamped as stale rather than hiding the change
+    versions = _data_versions(period, start, end)
+    cached = _report_cache.get(key)
+    if cached is not None and cached.versions == versions:
+        return cached
+
+    subject, html = generate_report(day, period)
+    report = RenderedReport(subject, html, hashlib.sha1(html.encode()).hexdigest(), versions)
+    _report_cache.set(key, report)
+    return report
+
+
+def invalidate_reports() -> None:
+    """Drop every cached report."""
+    _report_cache.clear()
+
+
+def report_cache_stats() -> dict:
+    return _report_cache.stats()
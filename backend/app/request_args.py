@@ -0,0 +1,18 @@
+"""
+Query-string parsing shared by the route blueprints.
+"""
+
+from datetime import date, datetime
+
+from flask import request
+
+
+def parse_date_arg(name: str) -> date | None:
+    """Parse an optional YYYY-MM-DD query parameter."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' date: must be YYYY-MM-DD")
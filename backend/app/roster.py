@@ -0,0 +1,25 @@
+"""
+Roster snapshot — every employee paired with their attendance row for
+one office day, fetched in a single LEFT OUTER JOIN.
+
+Used by the admin dashboard so the cost of GET /admin/employees stays
+at one round trip regardless of headcount.
+"""
+
+from app.extensions import db
+from app.models.user import User
+from app.models.attendance import Attendance
+
+
+def roster_query(user_query, day):
+    """Extend a ``User`` query with a LEFT OUTER JOIN on *day*'s attendance.
+
+    Filters, ordering and pagination applied to the returned query (e.g.
+    by ``apply_filters``) still operate on users.  Each result row is a
+    ``(User, Attendance | None)`` tuple.
+    """
+    return user_query.outerjoin(
+        Attendance,
+        db.and_(Attendance.user_id == User.id, Attendance.date == day),
+    ).add_entity(Attendance)
+
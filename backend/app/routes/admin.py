@@ -1,5 +1,4 @@
-from flask import Blueprint, request, jsonify, Response
-from werkzeug.security import generate_password_hash
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
 from app.models.user import User
 from app.models.leave import Leave
 from app.models.tour import Tour
@@ -10,15 +9,23 @@ from app.models.weekend_config import WeekendConfig
 from app.models.whatsapp_config import WhatsAppConfig
 from app.models.whatsapp_schedule import WhatsAppScheduleConfig
 from app.app import db
-from app.routes.auth import token_required
-from app.office_config import office_today, to_utc_iso
+from app.token_auth import token_required, authenticate, auth_cache_stats
+from app.request_args import parse_date_arg
+from app.office_config import office_today, to_utc_iso, OFFICE_TZ, OFFICE_START_HOUR, OFFICE_START_MINUTE
 from app.holidays import seed_holidays
-from datetime import date, datetime
-import jwt, os, csv, io
+from app.presence import get_presence, presence_counts
+from app.attendance_stats import employee_analytics
+from app.export import EXPORT_FORMATS, stream_export
+from app.bulk_import import start_import, job_status
+from app.outbox import outbox_stats
+from app.event_stream import issue_stream_ticket, STREAM_TICKET_SECONDS
+from app.leave_ledger import get_balance
+from app.whatsapp_jobs import replan as replan_whatsapp_jobs
+from datetime import date, datetime, timezone
+import csv, io
 from functools import wraps
 
 admin_bp = Blueprint('admin', __name__)
-SECRET_KEY = os.getenv("SECRET_KEY", "secret-dev")
 
 def admin_required(f):
     @wraps(f)
@@ -69,10 +76,11 @@ def get_employees():
     query = apply_filters(query, User)
     employees = query.all()
 
-    today = office_today()
+    # Today's statuses come from the in-memory presence index (no query)
+    presence = get_presence()
     result = []
     for emp in employees:
-        record = Attendance.query.filter_by(user_id=emp.id, date=today).first()
+        record = presence.get(emp.id)
         if record and record.check_in_time:
             today_status = "checked_out" if record.check_out_time else "checked_in"
         else:
@@ -92,6 +100,44 @@ def get_employees():
     return jsonify(result), 200
 
 
+@admin_bp.route("/admin/presence", methods=["GET"])
+@admin_required
+def admin_presence():
+    """How many employees are absent / online / on overtime / checked out right now."""
+    return jsonify(presence_counts()), 200
+
+
+@admin_bp.route("/admin/analytics", methods=["GET"])
+@admin_required
+def admin_attendance_analytics():
+    """Per-employee and organisation-wide attendance analytics.
+
+    Query params: from / to (YYYY-MM-DD, default: this month so far),
+    grace_minutes (late-arrival tolerance after office start, default 0).
+    """
+    today = office_today()
+    try:
+        start = parse_date_arg('from') or today.replace(day=1)
+        end = parse_date_arg('to') or today
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start > end:
+        return jsonify({'error': "'from' must be on or before 'to'"}), 400
+
+    grace_minutes = request.args.get('grace_minutes', default=0, type=int)
+    if grace_minutes < 0:
+        return jsonify({'error': 'grace_minutes must not be negative'}), 400
+
+    analytics = employee_analytics(start, end, grace_minutes)
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'office_start': f"{OFFICE_START_HOUR:02d}:{OFFICE_START_MINUTE:02d}",
+        'grace_minutes': grace_minutes,
+        **analytics,
+    }), 200
+
+
 @admin_bp.route("/admin/employees/<int:emp_id>/phone", methods=["PATCH"])
 @admin_required
 def update_employee_phone(emp_id):
@@ -174,6 +220,111 @@ def get_tours():
     } for tour in tours]), 200
 
 
+# ── Streaming exports ─────────────────────────────────────────────────
+EXPORT_BATCH_SIZE = 1000
+
+
+def _local_time(dt):
+    """Naive-UTC datetime → office-local, for human-facing exports."""
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc).astimezone(OFFICE_TZ).replace(tzinfo=None)
+
+
+def _export_attendance_query():
+    query = db.session.query(
+        Attendance.id, User.name, User.email, Attendance.date,
+        Attendance.check_in_time, Attendance.check_out_time, Attendance.is_overtime,
+    ).join(User, Attendance.user_id == User.id)
+
+    def rows(result):
+        for att_id, name, email, day, check_in, check_out, overtime in result:
+            hours = None
+            if check_in and check_out:
+                hours = round((check_out - check_in).total_seconds() / 3600, 2)
+            yield (att_id, name, email, day, _local_time(check_in), _local_time(check_out),
+                   hours, bool(overtime))
+
+    header = ['id', 'employee', 'email', 'date', 'check_in', 'check_out', 'hours', 'overtime']
+    return Attendance, Attendance.date, query, header, rows
+
+
+def _export_leaves_query():
+    query = db.session.query(
+        Leave.id, User.name, User.email, Leave.leave_type, Leave.start_date, Leave.end_date,
+        Leave.working_days, Leave.status, Leave.reason, Leave.created_at,
+    ).join(User, Leave.user_id == User.id)
+
+    def rows(result):
+        for (leave_id, name, email, leave_type, start, end,
+             working_days, status, reason, created_at) in result:
+            yield (leave_id, name, email, leave_type or 'paid', start, end,
+                   working_days or 0, status, reason, _local_time(created_at))
+
+    header = ['id', 'employee', 'email', 'leave_type', 'start_date', 'end_date',
+              'working_days', 'status', 'reason', 'requested_at']
+    return Leave, Leave.start_date, query, header, rows
+
+
+def _export_tours_query():
+    query = db.session.query(
+        Tour.id, User.name, User.email, Tour.start_date, Tour.end_date,
+        Tour.location, Tour.status, Tour.reason,
+    ).join(User, Tour.user_id == User.id)
+
+    header = ['id', 'employee', 'email', 'start_date', 'end_date', 'location', 'status', 'reason']
+    return Tour, Tour.start_date, query, header, lambda result: result
+
+
+EXPORTS = {
+    'attendance': _export_attendance_query,
+    'leaves': _export_leaves_query,
+    'tours': _export_tours_query,
+}
+
+
+@admin_bp.route("/admin/export/<kind>", methods=["GET"])
+@admin_required
+def export_records(kind):
+    """Stream attendance / leaves / tours as CSV or XLSX.
+
+    Query params: format=csv|xlsx (default csv), from / to (YYYY-MM-DD,
+    inclusive, on the record's date) plus the usual apply_filters params.
+    Rows are fetched in batches with ``yield_per`` and written out as
+    they arrive, so memory use doesn't grow with the size of the export.
+    """
+    if kind not in EXPORTS:
+        return jsonify({'error': f"Unknown export '{kind}'"}), 404
+
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': "format must be 'csv' or 'xlsx'"}), 400
+
+    try:
+        start = parse_date_arg('from')
+        end = parse_date_arg('to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start and end and start > end:
+        return jsonify({'error': "'from' must not be after 'to'"}), 400
+
+    model, date_col, query, header, to_rows = EXPORTS[kind]()
+    if start:
+        query = query.filter(date_col >= start)
+    if end:
+        query = query.filter(date_col <= end)
+    query = apply_filters(query, model).yield_per(EXPORT_BATCH_SIZE)
+
+    suffix = '_'.join(d.isoformat() for d in (start, end) if d)
+    filename = f"{kind}{'_' + suffix if suffix else ''}.{fmt}"
+    body = stream_export(fmt, header, to_rows(query), sheet_name=kind.title())
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+
 # ── CSV Bulk Upload ───────────────────────────────────────────────────
 REQUIRED_CSV_COLUMNS = {'name', 'email', 'password'}
 OPTIONAL_CSV_COLUMNS = {'role'}
@@ -201,8 +352,10 @@ def csv_template():
 def bulk_upload_employees():
     """
     Accept a CSV file with columns: name, email, password, role (optional).
-    Creates employee accounts in bulk.
-    Returns a summary of created, skipped (duplicate), and errored rows.
+    Creates employee accounts in bulk, as a background job.
+    Returns 202 with a job id; poll /admin/employees/bulk-upload/<job_id>
+    for progress and the summary of created, skipped (duplicate) and
+    errored rows.
     """
     if 'file' not in request.files:
         return jsonify({'error': 'No file uploaded'}), 400
@@ -229,13 +382,12 @@ def bulk_upload_employees():
                      f'Required: name, email, password. Optional: role.'
         }), 400
 
-    created = []
-    skipped = []
+    rows = []
     errors = []
 
     for row_num, raw_row in enumerate(reader, start=2):  # row 1 = header
         # Normalise keys
-        row = {k.strip().lower(): (v.strip() if v else '') for k, v in raw_row.items()}
+        row = {k.strip().lower(): (v.strip() if v else '') for k, v in raw_row.items() if k}
 
         name = row.get('name', '')
         email = row.get('email', '')
@@ -250,68 +402,78 @@ def bulk_upload_employees():
         if role not in ('employee', 'admin'):
             role = 'employee'
 
-        # Check for duplicate
-        if User.query.filter_by(email=email).first():
-            skipped.append({'row': row_num, 'email': email, 'reason': 'Email already exists'})
-            continue
+        rows.append({'row': row_num, 'name': name, 'email': email, 'password': password, 'role': role})
 
-        try:
-            new_user = User(
-                name=name,
-                email=email,
-                password_hash=generate_password_hash(password),
-                role=role,
-            )
-            db.session.add(new_user)
-            created.append({'row': row_num, 'email': email, 'name': name})
-        except Exception as e:
-            errors.append({'row': row_num, 'email': email, 'reason': str(e)})
-
-    # Commit all at once
-    if created:
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': f'Database error: {str(e)}'}), 500
+    # Duplicate checks, hashing and inserts run in the background
+    job = start_import(current_app._get_current_object(), rows, errors)
+    return jsonify(job.to_dict()), 202
 
-    return jsonify({
-        'message': f'{len(created)} employee(s) created successfully',
-        'created': created,
-        'skipped': skipped,
-        'errors': errors,
-        'summary': {
-            'total_rows': len(created) + len(skipped) + len(errors),
-            'created': len(created),
-            'skipped': len(skipped),
-            'errors': len(errors),
-        }
-    }), 201 if created else 200
+
+@admin_bp.route("/admin/employees/bulk-upload/<job_id>", methods=["GET"])
+@admin_required
+def bulk_upload_status(job_id):
+    """Progress of a bulk upload job; includes the summary once it's done."""
+    status = job_status(job_id)
+    if status is None:
+        return jsonify({'error': 'Unknown or expired upload job'}), 404
+    return jsonify(status), 200
 
 
 # ── Manual daily report trigger ───────────────────────────────────────
 
+def _report_params(values) -> tuple[date, str]:
+    """(day, period) of a report request: ``date`` (YYYY-MM-DD, default
+    today, not in the future) and ``period`` (daily | weekly | monthly).
+    """
+    from app.reports import PERIODS
+
+    today = office_today()
+    try:
+        day = datetime.strptime(values['date'], '%Y-%m-%d').date() if values.get('date') else today
+    except (TypeError, ValueError):
+        raise ValueError("Invalid 'date': must be YYYY-MM-DD")
+    if day > today:
+        raise ValueError("'date' must not be in the future")
+    period = values.get('period') or 'daily'
+    if period not in PERIODS:
+        raise ValueError(f"'period' must be one of {', '.join(PERIODS)}")
+    return day, period
+
+
 @admin_bp.route("/admin/send-daily-report", methods=["POST"])
 @admin_required
 def trigger_daily_report():
-    """Let an admin manually trigger the daily attendance report email."""
-    from app.daily_report import generate_report_html
+    """Let an admin manually trigger the attendance report email.
+
+    Optional ``date`` (YYYY-MM-DD) and ``period`` (daily | weekly |
+    monthly), in the JSON body or query string, regenerate a past report.
+    """
+    from app.reports import get_report
     from app.mail import send_html_email, is_mail_configured
 
     if not is_mail_configured():
         return jsonify({'error': 'SMTP not configured. Set SMTP_HOST, SMTP_USER, SMTP_PASS, REPORT_RECIPIENTS in .env'}), 400
 
-    subject, html = generate_report_html()
-    send_html_email(subject, html)
-    return jsonify({'message': 'Daily report sent successfully'}), 200
+    try:
+        day, period = _report_params(request.get_json(silent=True) or request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    report = get_report(day, period)
+    if send_html_email(report.subject, report.html) is False:
+        return jsonify({'error': 'Report generated but email delivery failed'}), 502
+    return jsonify({'message': f'{period.capitalize()} report for {day.isoformat()} sent successfully'}), 200
 
 
 @admin_bp.route("/admin/preview-daily-report", methods=["GET"])
 def preview_daily_report():
-    """Return the daily report as HTML for preview (no email sent).
-    Accepts token via Authorization header OR ?token= query param (for browser tab).
+    """Return the attendance report as HTML for preview (no email sent).
+    Accepts token via Authorization header OR ?token= query param (for browser tab),
+    and optional ?date=YYYY-MM-DD&period=daily|weekly|monthly.
+    Served from the report cache with an ETag, so refreshes get 304s
+    until the attendance behind the report changes.
     """
-    from app.daily_report import generate_report_html
+    from app.reports import get_report
 
     # Support both header and query-param auth (for opening in a new tab)
     token = request.headers.get('Authorization')
@@ -323,16 +485,46 @@ def preview_daily_report():
     if not token:
         return jsonify({'error': 'Missing token'}), 401
 
-    try:
-        data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        user = User.query.get(data['user_id'])
-        if not user or user.role != 'admin':
-            raise Exception("Not authorized")
-    except Exception:
+    user = authenticate(token)
+    if not user or user.role != 'admin':
         return jsonify({'error': 'Invalid or expired token'}), 401
 
-    _subject, html = generate_report_html()
-    return Response(html, mimetype='text/html')
+    try:
+        day, period = _report_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    report = get_report(day, period)
+    response = Response(report.html, mimetype='text/html')
+    response.set_etag(report.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'  # always revalidate
+    return response.make_conditional(request)
+
+
+@admin_bp.route("/admin/auth-cache/stats", methods=["GET"])
+@admin_required
+def admin_auth_cache_stats():
+    """Hit-rate metrics for this worker's token / identity caches."""
+    return jsonify(auth_cache_stats()), 200
+
+
+@admin_bp.route("/admin/outbox/stats", methods=["GET"])
+@admin_required
+def admin_outbox_stats():
+    """Queued / delivered / failed notification counts."""
+    return jsonify(outbox_stats()), 200
+
+
+@admin_bp.route("/admin/event-stream/ticket", methods=["POST"])
+@token_required
+def admin_event_stream_ticket(user):
+    """One-time ticket for opening the live attendance stream (the long-lived
+    token must not travel in the stream URL).  Stream stats are served by the
+    stream server itself at /events/stats.
+    """
+    if user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    return jsonify({'ticket': issue_stream_ticket(user.id), 'expires_in': STREAM_TICKET_SECONDS}), 200
 
 
 # ── Holiday management (admin) ────────────────────────────────────────
@@ -393,45 +585,45 @@ def admin_seed_holidays():
 
 # ── Leave balance management (admin) ──────────────────────────────────
 
-@admin_bp.route("/admin/leave-balance/<int:user_id>", methods=["GET"])
+@admin_bp.route("/admin/leave-balances", methods=["GET"])
 @admin_required
-def admin_get_leave_balance(user_id):
-    """View an employee's leave balance."""
-    year = request.args.get('year', default=office_today().year, type=int)
-    bal = LeaveBalance.query.filter_by(user_id=user_id, year=year).first()
+def admin_get_leave_balances():
+    """Every employee's leave balance for a year, from one LEFT JOIN.
 
-    if not bal:
-        bal = LeaveBalance(user_id=user_id, year=year, total_leaves=ANNUAL_PAID_LEAVES)
-        db.session.add(bal)
-        db.session.commit()
-
-    # Compute used + pending
-    used = db.session.query(
-        db.func.coalesce(db.func.sum(Leave.working_days), 0)
-    ).filter(
-        Leave.user_id == user_id,
-        Leave.leave_type == 'paid',
-        Leave.status == 'approved',
-        db.extract('year', Leave.start_date) == year,
-    ).scalar()
-
-    pending = db.session.query(
-        db.func.coalesce(db.func.sum(Leave.working_days), 0)
-    ).filter(
-        Leave.user_id == user_id,
-        Leave.leave_type == 'paid',
-        Leave.status == 'pending',
-        db.extract('year', Leave.start_date) == year,
-    ).scalar()
+    Employees without a LeaveBalance row for the year get the default
+    allocation via COALESCE; nothing is inserted.  Supports the usual
+    search / orderBy / top / skip parameters on employees.
+    """
+    year = request.args.get('year', default=office_today().year, type=int)
+    query = User.query.filter(User.role == "employee").outerjoin(
+        LeaveBalance,
+        db.and_(LeaveBalance.user_id == User.id, LeaveBalance.year == year),
+    )
+    query = apply_filters(query, User).with_entities(
+        User.id, User.name, User.email,
+        db.func.coalesce(LeaveBalance.total_leaves, ANNUAL_PAID_LEAVES),
+        db.func.coalesce(LeaveBalance.used_days, 0),
+        db.func.coalesce(LeaveBalance.pending_days, 0),
+    )
 
-    return jsonify({
+    return jsonify([{
         'user_id': user_id,
+        'name': name,
+        'email': email,
         'year': year,
-        'total': bal.total_leaves,
-        'used': int(used),
-        'pending': int(pending),
-        'available': max(bal.total_leaves - int(used) - int(pending), 0),
-    }), 200
+        'total': total,
+        'used': used,
+        'pending': pending,
+        'available': max(total - used - pending, 0),
+    } for user_id, name, email, total, used, pending in query]), 200
+
+
+@admin_bp.route("/admin/leave-balance/<int:user_id>", methods=["GET"])
+@admin_required
+def admin_get_leave_balance(user_id):
+    """View an employee's leave balance."""
+    year = request.args.get('year', default=office_today().year, type=int)
+    return jsonify({'user_id': user_id, **get_balance(user_id, year)}), 200
 
 
 @admin_bp.route("/admin/leave-balance/<int:user_id>", methods=["PATCH"])
@@ -551,6 +743,7 @@ def admin_delete_whatsapp_number(entry_id):
 
 
 # ── WhatsApp schedule config (admin) ──────────────────────────────────
+MAX_DIGEST_WINDOW_MINUTES = 120
 
 @admin_bp.route("/admin/whatsapp/schedule", methods=["GET"])
 @admin_required
@@ -586,5 +779,16 @@ def admin_update_whatsapp_schedule():
         if value is not None:
             setattr(config, field, bool(value))
 
+    window = data.get('alert_digest_window_minutes')
+    if window is not None:
+        if not isinstance(window, int) or isinstance(window, bool) or not 0 <= window <= MAX_DIGEST_WINDOW_MINUTES:
+            return jsonify({'error': f'alert_digest_window_minutes must be a whole number '
+                                     f'between 0 and {MAX_DIGEST_WINDOW_MINUTES}'}), 400
+        config.alert_digest_window_minutes = window
+
     db.session.commit()
+    WhatsAppScheduleConfig.invalidate_settings()
+    # Move the cron jobs now if they run in this process; otherwise the
+    # leader picks the change up from cache_versions (app/cache_sync.py)
+    replan_whatsapp_jobs()
     return jsonify({'message': 'Schedule updated', **config.to_dict()}), 200
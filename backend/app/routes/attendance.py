@@ -2,17 +2,20 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime, date, timedelta, timezone, time as dt_time
 from app.app import db
 from app.models.attendance import Attendance
-from app.models.user import User
 from app.office_config import office_today, utc_now, to_utc_iso, OFFICE_TZ
-from app.whatsapp import send_whatsapp_async
+from app.whatsapp import send_whatsapp_async, queue_admin_alert, CHECK_IN, CHECK_OUT
+from app.attendance_board import invalidate_board
+from app.presence import record_presence
+from app import event_stream as events
 from app.models.whatsapp_schedule import WhatsAppScheduleConfig
-import jwt
-import os
+from app.token_auth import token_required
+from app.request_args import parse_date_arg
+from app.attendance_stats import BUCKETS, hours_by_bucket, total_seconds
 from datetime import timezone as tz
-from functools import wraps
 
 attendance_bp = Blueprint('attendance', __name__)
-SECRET_KEY = os.getenv("SECRET_KEY", "secret-dev")
+
+HISTORY_MAX_PAGE_SIZE = 366
 
 
 def _parse_custom_time(time_str: str, for_date: date) -> datetime:
@@ -36,58 +39,48 @@ def _parse_custom_time(time_str: str, for_date: date) -> datetime:
             parsed = parsed.replace(tzinfo=OFFICE_TZ)
         return parsed.astimezone(timezone.utc).replace(tzinfo=None)
 
-def token_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({'error': 'Missing token'}), 401
-        try:
-            data = jwt.decode(token.split()[1], SECRET_KEY, algorithms=["HS256"])
-            user = User.query.get(data['user_id'])
-            if not user:
-                raise Exception("User not found")
-        except Exception as e:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        return f(user, *args, **kwargs)
-    return decorated
-
 @attendance_bp.route('/check-in', methods=['POST'])
 @token_required
 def check_in(user):
     today = office_today()
-    record = Attendance.query.filter_by(user_id=user.id, date=today).first()
-    if record and record.check_in_time:
-        return jsonify({'message': 'Already checked in today'}), 400
-
-    if not record:
-        record = Attendance(user_id=user.id, date=today)
 
     # Accept optional custom time from frontend
     data = request.get_json(silent=True) or {}
     custom_time = data.get('time')  # e.g. "14:30" or ISO string
     if custom_time:
-        record.check_in_time = _parse_custom_time(custom_time, today)
+        check_in_time = _parse_custom_time(custom_time, today)
     else:
-        record.check_in_time = utc_now()
+        check_in_time = utc_now().replace(tzinfo=None)  # naive UTC for DB storage
 
-    db.session.add(record)
-    db.session.commit()
+    # Single atomic upsert — concurrent taps can't create duplicate rows
+    record = Attendance.record_check_in(user.id, today, check_in_time)
+    if record is None:
+        return jsonify({'message': 'Already checked in today'}), 400
+    invalidate_board(today)
+    record_presence(user.id, today, record.check_in_time, None, False)
+    events.publish(events.attendance_delta(events.CHECK_IN, user, today, record.check_in_time, None, False))
 
     # WhatsApp notification: attendence_daily
-    wa_config = WhatsAppScheduleConfig.get_current()
+    wa_config = WhatsAppScheduleConfig.get_settings()
     if wa_config.checkin_alert_enabled:
         check_in_local = record.check_in_time.replace(tzinfo=tz.utc).astimezone(OFFICE_TZ)
         ci_time_str = check_in_local.strftime("%-I:%M %p")
-        send_whatsapp_async(
-            template_name="attendence_daily",
-            params_fn=lambda label, _n=user.name, _t=ci_time_str: [
-                label,           # {{1}} Admin's own name
-                _n,              # {{2}} Employee name
-                _t,              # {{3}} Check-in time
-                "Office",        # {{4}} Location
-            ],
-        )
+        dedup_key = f"checkin:{user.id}:{today.isoformat()}"
+        if wa_config.alert_digest_window_minutes:
+            # Coalesced with other check-ins/outs into one digest per admin
+            queue_admin_alert(CHECK_IN, f"{user.name} ({ci_time_str})",
+                              wa_config.alert_digest_window_minutes, dedup_key)
+        else:
+            send_whatsapp_async(
+                template_name="attendence_daily",
+                dedup_key=dedup_key,
+                params_fn=lambda label, _n=user.name, _t=ci_time_str: [
+                    label,           # {{1}} Admin's own name
+                    _n,              # {{2}} Employee name
+                    _t,              # {{3}} Check-in time
+                    "Office",        # {{4}} Location
+                ],
+            )
 
     return jsonify({
         'message': 'Check-in successful',
@@ -98,41 +91,52 @@ def check_in(user):
 @token_required
 def check_out(user):
     today = office_today()
-    record = Attendance.query.filter_by(user_id=user.id, date=today).first()
-    if not record or not record.check_in_time:
-        return jsonify({'message': 'You must check-in before check-out'}), 400
-    if record.check_out_time:
-        return jsonify({'message': 'Already checked out today'}), 400
 
     # Accept optional custom time from frontend
     data = request.get_json(silent=True) or {}
     custom_time = data.get('time')  # e.g. "18:30" or ISO string
     if custom_time:
-        record.check_out_time = _parse_custom_time(custom_time, today)
+        check_out_time = _parse_custom_time(custom_time, today)
     else:
-        record.check_out_time = utc_now()
-
-    db.session.commit()
+        check_out_time = utc_now().replace(tzinfo=None)  # naive UTC for DB storage
+
+    # Conditional update — only succeeds if checked in and not yet out
+    record = Attendance.record_check_out(user.id, today, check_out_time)
+    if record is None:
+        existing = Attendance.query.filter_by(user_id=user.id, date=today).first()
+        if existing and existing.check_out_time:
+            return jsonify({'message': 'Already checked out today'}), 400
+        return jsonify({'message': 'You must check-in before check-out'}), 400
+    invalidate_board(today)
+    record_presence(user.id, today, record.check_in_time, record.check_out_time)
+    events.publish(events.attendance_delta(events.CHECK_OUT, user, today,
+                                           record.check_in_time, record.check_out_time, False))
 
     # Compute total hours
     delta = record.check_out_time - record.check_in_time
     total_hours = round(delta.total_seconds() / 3600, 1)
 
     # WhatsApp notification: attendence_daily_v2
-    wa_config = WhatsAppScheduleConfig.get_current()
+    wa_config = WhatsAppScheduleConfig.get_settings()
     if wa_config.checkout_alert_enabled:
         check_out_local = record.check_out_time.replace(tzinfo=tz.utc).astimezone(OFFICE_TZ)
         co_time_str = check_out_local.strftime("%-I:%M %p")
         hours_str = f"{total_hours}h"
-        send_whatsapp_async(
-            template_name="attendence_daily_v2",
-            params_fn=lambda label, _n=user.name, _t=co_time_str, _h=hours_str: [
-                label,           # {{1}} Admin's own name
-                _n,              # {{2}} Employee name
-                _t,              # {{3}} Check-out time
-                _h,              # {{4}} Total hours
-            ],
-        )
+        dedup_key = f"checkout:{user.id}:{today.isoformat()}"
+        if wa_config.alert_digest_window_minutes:
+            queue_admin_alert(CHECK_OUT, f"{user.name} ({co_time_str}, {hours_str})",
+                              wa_config.alert_digest_window_minutes, dedup_key)
+        else:
+            send_whatsapp_async(
+                template_name="attendence_daily_v2",
+                dedup_key=dedup_key,
+                params_fn=lambda label, _n=user.name, _t=co_time_str, _h=hours_str: [
+                    label,           # {{1}} Admin's own name
+                    _n,              # {{2}} Employee name
+                    _t,              # {{3}} Check-out time
+                    _h,              # {{4}} Total hours
+                ],
+            )
 
     return jsonify({
         'message': 'Check-out successful',
@@ -153,6 +157,7 @@ def toggle_overtime(user):
 
     record.is_overtime = not record.is_overtime
     db.session.commit()
+    events.publish(events.attendance_delta(events.OVERTIME, user, today, record.check_in_time, None, record.is_overtime))
 
     return jsonify({
         'message': f"Overtime {'enabled' if record.is_overtime else 'disabled'}",
@@ -162,17 +167,60 @@ def toggle_overtime(user):
 @attendance_bp.route('/history', methods=['GET'])
 @token_required
 def attendance_history(user):
-    records = Attendance.query.filter_by(user_id=user.id).order_by(Attendance.date.desc()).all()
-    history = []
-
-    for record in records:
-        history.append({
-            'date': record.date.isoformat(),
-            'check_in_time': to_utc_iso(record.check_in_time),
-            'check_out_time': to_utc_iso(record.check_out_time)
-        })
-
-    return jsonify({'history': history}), 200
+    """Attendance history, newest first.
+
+    Optional query params:
+      - from / to: YYYY-MM-DD bounds (inclusive)
+      - limit: page size (max HISTORY_MAX_PAGE_SIZE); enables keyset pagination
+      - cursor: the ``next_cursor`` returned with the previous page
+    Without ``limit`` every record in the range is returned, as before.
+    Responses carry an ETag, so an unchanged history answers 304.
+    """
+    try:
+        start = parse_date_arg('from')
+        end = parse_date_arg('to')
+        cursor = parse_date_arg('cursor')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    limit = request.args.get('limit', type=int)
+    if limit is not None and not 1 <= limit <= HISTORY_MAX_PAGE_SIZE:
+        return jsonify({'error': f'limit must be between 1 and {HISTORY_MAX_PAGE_SIZE}'}), 400
+
+    # Column-only query — no ORM objects are built for the rows
+    query = db.session.query(
+        Attendance.date, Attendance.check_in_time, Attendance.check_out_time,
+    ).filter(Attendance.user_id == user.id)
+    if start:
+        query = query.filter(Attendance.date >= start)
+    if end:
+        query = query.filter(Attendance.date <= end)
+    if cursor:
+        query = query.filter(Attendance.date < cursor)
+    query = query.order_by(Attendance.date.desc())
+
+    if limit:
+        rows = query.limit(limit + 1).all()  # one extra row tells us if there's a next page
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = query.all()
+        has_more = False
+
+    history = [{
+        'date': day.isoformat(),
+        'check_in_time': to_utc_iso(check_in_time),
+        'check_out_time': to_utc_iso(check_out_time),
+    } for day, check_in_time, check_out_time in rows]
+
+    response = jsonify({
+        'history': history,
+        'next_cursor': rows[-1][0].isoformat() if has_more else None,
+    })
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # always revalidate via ETag
+    response.add_etag()
+    return response.make_conditional(request)
 
 @attendance_bp.route('/weekly-hours', methods=['GET'])
 @token_required
@@ -182,29 +230,8 @@ def weekly_hours(user):
     week_start = today - timedelta(days=today.weekday())  # Monday
     week_end = week_start + timedelta(days=6)             # Sunday
 
-    records = Attendance.query.filter(
-        Attendance.user_id == user.id,
-        Attendance.date >= week_start,
-        Attendance.date <= week_end,
-    ).all()
-
-    total_seconds = 0
-    now_utc = datetime.now(timezone.utc)
-
-    for r in records:
-        if not r.check_in_time:
-            continue
-        check_in = r.check_in_time
-        if r.check_out_time:
-            check_out = r.check_out_time
-        elif r.date == today:
-            # Still checked in today — count hours up to "now"
-            check_out = now_utc.replace(tzinfo=None)  # match naive UTC stored in DB
-        else:
-            continue  # past day without check-out — skip
-        total_seconds += (check_out - check_in).total_seconds()
-
-    total_hours = round(total_seconds / 3600, 1)
+    # Summed in SQL; an open check-in today counts up to "now"
+    total_hours = round(total_seconds(user.id, week_start, week_end) / 3600, 1)
 
     return jsonify({
         'weekly_hours': total_hours,
@@ -212,6 +239,43 @@ def weekly_hours(user):
         'week_end': week_end.isoformat(),
     }), 200
 
+
+@attendance_bp.route('/hours', methods=['GET'])
+@token_required
+def range_hours(user):
+    """Worked hours over a date range, bucketed per day, week or month.
+
+    Query params: from / to (YYYY-MM-DD, default: this month so far),
+    bucket = day | week | month (default: day).
+    """
+    today = office_today()
+    try:
+        start = parse_date_arg('from') or today.replace(day=1)
+        end = parse_date_arg('to') or today
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start > end:
+        return jsonify({'error': "'from' must be on or before 'to'"}), 400
+
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return jsonify({'error': f"bucket must be one of: {', '.join(BUCKETS)}"}), 400
+
+    buckets = hours_by_bucket(start, end, bucket, [user.id]).get(user.id, {})
+    total = sum(secs for secs, _days in buckets.values())
+
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'bucket': bucket,
+        'total_hours': round(total / 3600, 1),
+        'buckets': [{
+            'start': bucket_day.isoformat(),
+            'hours': round(secs / 3600, 1),
+            'days_present': days,
+        } for bucket_day, (secs, days) in sorted(buckets.items())],
+    }), 200
+
 @attendance_bp.route('/status', methods=['GET'])
 @token_required
 def attendance_status(user):
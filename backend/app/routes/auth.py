@@ -1,18 +1,17 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
-from app.routes.attendance import token_required
+from app.token_auth import token_required, SECRET_KEY
 from app.app import db
 from app.models.user import User
 from app.models.otp import OTP as OTPModel
 from app.mail import send_html_email, is_smtp_configured
+from app.email_templates import render
+from markupsafe import Markup
 import jwt
 import datetime
-import os
 
 auth_bp = Blueprint('auth', __name__)
 
-SECRET_KEY = os.getenv("SECRET_KEY", "secret-dev")
-
 
 # ── Registration / Login ──────────────────────────────────────────────
 
@@ -112,33 +111,7 @@ def get_profile(user):
 
 def _otp_email_html(code: str, name: str, purpose_title: str, purpose_desc: str) -> str:
     """Build a styled HTML email body for any OTP purpose."""
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head><meta charset="utf-8"></head>
-    <body style="margin:0;padding:0;font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Roboto,sans-serif;background:#f3f4f6;">
-      <div style="max-width:480px;margin:40px auto;background:#fff;border-radius:12px;overflow:hidden;box-shadow:0 1px 3px rgba(0,0,0,0.1);">
-        <div style="background:linear-gradient(135deg,#4f46e5,#6366f1);padding:24px 28px;color:#fff;">
-          <h1 style="margin:0;font-size:20px;">{purpose_title}</h1>
-        </div>
-        <div style="padding:24px 28px;">
-          <p style="margin:0 0 16px;color:#374151;">Hi <strong>{name}</strong>,</p>
-          <p style="margin:0 0 20px;color:#374151;">{purpose_desc} It expires in <strong>10 minutes</strong>.</p>
-          <div style="text-align:center;margin:24px 0;">
-            <span style="display:inline-block;font-size:32px;letter-spacing:8px;font-weight:700;color:#4f46e5;
-                         background:#eef2ff;border:2px dashed #a5b4fc;border-radius:8px;padding:12px 28px;">
-              {code}
-            </span>
-          </div>
-          <p style="margin:0;color:#6b7280;font-size:13px;">If you didn't request this, you can safely ignore this email.</p>
-        </div>
-        <div style="background:#f8fafc;padding:14px 28px;text-align:center;font-size:12px;color:#94a3b8;border-top:1px solid #e2e8f0;">
-          SmartAttend &middot; Do not share this code with anyone
-        </div>
-      </div>
-    </body>
-    </html>
-    """
+    return render("otp.html", code=code, name=name, purpose_title=purpose_title, purpose_desc=purpose_desc)
 
 
 # ── Forgot / reset password (unauthenticated, OTP to email) ──────────
@@ -166,11 +139,7 @@ def forgot_password():
         "🔑 Password Reset OTP",
         "Use the code below to reset your SmartAttend password.",
     )
-    send_html_email(
-        subject="Your SmartAttend password reset OTP",
-        html_body=html,
-        recipients=[user.email],
-    )
+    send_html_email("Your SmartAttend password reset OTP", html, [user.email])
 
     return jsonify({'message': f'If an account with that email exists, an OTP has been sent.'}), 200
 
@@ -218,11 +187,7 @@ def request_otp(user):
         "🔐 Password Change OTP",
         "Use the code below to change your password.",
     )
-    send_html_email(
-        subject="Your SmartAttend password change OTP",
-        html_body=html,
-        recipients=[user.email],
-    )
+    send_html_email("Your SmartAttend password change OTP", html, [user.email])
 
     return jsonify({'message': f'OTP sent to {user.email}'}), 200
 
@@ -276,14 +241,10 @@ def request_email_otp(user):
     html = _otp_email_html(
         otp.code, user.name,
         "📧 Email Change Verification",
-        f"Use the code below to verify your new email address <strong>{new_email}</strong>.",
+        Markup("Use the code below to verify your new email address <strong>%s</strong>.") % new_email,
     )
     # Send to the NEW email so the user proves they own it
-    send_html_email(
-        subject="Verify your new SmartAttend email",
-        html_body=html,
-        recipients=[new_email],
-    )
+    send_html_email("Verify your new SmartAttend email", html, [new_email])
 
     return jsonify({'message': f'OTP sent to {new_email}'}), 200
 
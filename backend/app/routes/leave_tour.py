@@ -4,18 +4,16 @@ from app.models.leave import Leave
 from app.models.tour import Tour
 from app.models.user import User
 from app.models.holiday import Holiday
-from app.models.leave_balance import LeaveBalance, ANNUAL_PAID_LEAVES
-from app.holidays import count_working_days
+from app.leave_ledger import get_balance, record_application, record_status_change
+from app.leave_planner import plan_leave
 from app.office_config import office_today
-from app.mail import send_leave_application_email, send_leave_status_email
+from app.mail import is_smtp_configured, REPORT_RECIPIENTS
+from app.outbox import enqueue
+from app.token_auth import token_required
 from datetime import datetime, date
 from functools import wraps
-import threading
-import jwt
-import os
 
 leave_tour_bp = Blueprint('leave_tour', __name__)
-SECRET_KEY = os.getenv("SECRET_KEY", "secret-dev")
 
 def admin_required(f):
     @wraps(f)
@@ -25,67 +23,6 @@ def admin_required(f):
         return f(user, *args, **kwargs)
     return wrapper
 
-def token_required(f):
-    @wraps(f)
-    def wrapper(*args, **kwargs):
-        token = request.headers.get("Authorization")
-        if not token:
-            return jsonify({"error": "Missing token"}), 401
-        try:
-            data = jwt.decode(token.split()[1], SECRET_KEY, algorithms=["HS256"])
-            user = User.query.get(data["user_id"])
-        except:
-            return jsonify({"error": "Invalid token"}), 401
-        return f(user, *args, **kwargs)
-    return wrapper
-
-
-# ── Helpers ────────────────────────────────────────────────────────────
-
-def _get_or_create_balance(user_id: int, year: int) -> LeaveBalance:
-    """Return (or auto-create) the LeaveBalance row for this user+year."""
-    bal = LeaveBalance.query.filter_by(user_id=user_id, year=year).first()
-    if not bal:
-        bal = LeaveBalance(user_id=user_id, year=year, total_leaves=ANNUAL_PAID_LEAVES)
-        db.session.add(bal)
-        db.session.flush()
-    return bal
-
-
-def _compute_balance(user_id: int, year: int):
-    """Compute leave balance summary for *user_id* in *year*."""
-    bal = _get_or_create_balance(user_id, year)
-
-    # Sum working_days from approved paid leaves in this year
-    used = db.session.query(
-        db.func.coalesce(db.func.sum(Leave.working_days), 0)
-    ).filter(
-        Leave.user_id == user_id,
-        Leave.leave_type == 'paid',
-        Leave.status == 'approved',
-        db.extract('year', Leave.start_date) == year,
-    ).scalar()
-
-    # Sum working_days from pending paid leaves in this year
-    pending = db.session.query(
-        db.func.coalesce(db.func.sum(Leave.working_days), 0)
-    ).filter(
-        Leave.user_id == user_id,
-        Leave.leave_type == 'paid',
-        Leave.status == 'pending',
-        db.extract('year', Leave.start_date) == year,
-    ).scalar()
-
-    available = bal.total_leaves - used - pending
-
-    return {
-        'year': year,
-        'total': bal.total_leaves,
-        'used': int(used),
-        'pending': int(pending),
-        'available': max(int(available), 0),
-    }
-
 
 # ── Leave endpoints ───────────────────────────────────────────────────
 
@@ -94,8 +31,7 @@ def _compute_balance(user_id: int, year: int):
 def leave_balance(user):
     """Return the employee's paid-leave balance for the requested year."""
     year = request.args.get('year', default=office_today().year, type=int)
-    balance = _compute_balance(user.id, year)
-    return jsonify(balance), 200
+    return jsonify(get_balance(user.id, year)), 200
 
 
 @leave_tour_bp.route('/leave/apply', methods=['POST'])
@@ -110,24 +46,16 @@ def apply_leave(user):
     if start > end:
         return jsonify({'error': 'Start date must be before end date'}), 400
 
-    # Calculate working days (exclude Sundays + holidays)
-    working_days = count_working_days(start, end)
-
-    if working_days == 0:
-        return jsonify({'error': 'Selected dates contain no working days (only Sundays / holidays)'}), 400
-
-    # Validate balance for paid leaves
-    if leave_type == 'paid':
-        year = start.year
-        balance = _compute_balance(user.id, year)
-        if working_days > balance['available']:
-            return jsonify({
-                'error': (
-                    f'Insufficient paid leave balance. '
-                    f'Requested {working_days} day(s), available {balance["available"]} day(s).'
-                ),
-                'balance': balance,
-            }), 400
+    # Working days per year (excl. weekends + holidays), checked against
+    # each affected year's balance for paid leave
+    plan = plan_leave(user.id, start, end, leave_type)
+    if plan.error:
+        shortfall = plan.shortfall
+        body = {'error': plan.error, 'plan': plan.to_dict()}
+        if shortfall:
+            body['balance'] = plan.balances[min(shortfall)]
+        return jsonify(body), 400
+    working_days = plan.working_days
 
     leave = Leave(
         user_id=user.id,
@@ -136,31 +64,51 @@ def apply_leave(user):
         reason=reason,
         leave_type=leave_type,
         working_days=working_days,
+        year_breakdown=plan.year_breakdown_json(),
     )
     db.session.add(leave)
+    db.session.flush()  # assigns leave.id for the dedup key
+    record_application(leave)
+
+    # Notify admin recipients about the new leave application (queued)
+    if is_smtp_configured() and REPORT_RECIPIENTS:
+        enqueue('leave_application_email', {
+            'employee_name': user.name,
+            'employee_email': user.email,
+            'leave_type': leave_type,
+            'start_date': start.isoformat(),
+            'end_date': end.isoformat(),
+            'working_days': working_days,
+            'reason': reason,
+        }, dedup_key=f"leave_applied:{leave.id}")
     db.session.commit()
 
-    # Notify admin recipients about the new leave application (async)
-    threading.Thread(
-        target=send_leave_application_email,
-        kwargs=dict(
-            employee_name=user.name,
-            employee_email=user.email,
-            leave_type=leave_type,
-            start_date=start,
-            end_date=end,
-            working_days=working_days,
-            reason=reason,
-        ),
-        daemon=True,
-    ).start()
-
     return jsonify({
         'message': f'Leave applied ({working_days} working day(s))',
         'working_days': working_days,
+        'breakdown': plan.to_dict()['breakdown'],
     }), 201
 
 
+@leave_tour_bp.route('/leave/preview', methods=['GET'])
+@token_required
+def preview_leave(user):
+    """What applying for leave from start_date to end_date would cost:
+    working days per year and, for paid leave, whether each year's
+    balance covers them.  Cheap enough to call on every date-picker change.
+    """
+    try:
+        start = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'start_date and end_date are required (YYYY-MM-DD)'}), 400
+    if start > end:
+        return jsonify({'error': 'Start date must be before end date'}), 400
+    leave_type = request.args.get('leave_type', 'paid')
+
+    return jsonify(plan_leave(user.id, start, end, leave_type).to_dict()), 200
+
+
 @leave_tour_bp.route('/leave', methods=['GET'])
 @token_required
 def view_leaves(user):
@@ -173,6 +121,7 @@ def view_leaves(user):
         'status': l.status,
         'leave_type': l.leave_type or 'paid',
         'working_days': l.working_days or 0,
+        'year_breakdown': l.year_breakdown,
         'created_at': l.created_at.isoformat() if l.created_at else None,
     } for l in leaves]), 200
 
@@ -186,28 +135,27 @@ def update_leave_status(admin_user, leave_id):
     if status not in ['approved', 'rejected']:
         return jsonify({'error': 'Invalid status'}), 400
 
-    leave = Leave.query.get_or_404(leave_id)
+    # Row lock: concurrent reviews must not both move the ledger
+    leave = Leave.query.filter_by(id=leave_id).with_for_update().first_or_404()
+    old_status = leave.status
     leave.status = status
+    record_status_change(leave, old_status)
+
+    # Notify the employee about the status change (queued with the update)
+    employee = db.session.get(User, leave.user_id)
+    if employee and is_smtp_configured():
+        enqueue('leave_status_email', {
+            'employee_name': employee.name,
+            'employee_email': employee.email,
+            'leave_type': leave.leave_type or 'paid',
+            'start_date': leave.start_date.isoformat(),
+            'end_date': leave.end_date.isoformat(),
+            'working_days': leave.working_days or 0,
+            'reason': leave.reason or '',
+            'new_status': status,
+        })
     db.session.commit()
 
-    # Notify the employee about the status change (async)
-    employee = User.query.get(leave.user_id)
-    if employee:
-        threading.Thread(
-            target=send_leave_status_email,
-            kwargs=dict(
-                employee_name=employee.name,
-                employee_email=employee.email,
-                leave_type=leave.leave_type or 'paid',
-                start_date=leave.start_date,
-                end_date=leave.end_date,
-                working_days=leave.working_days or 0,
-                reason=leave.reason or '',
-                new_status=status,
-            ),
-            daemon=True,
-        ).start()
-
     return jsonify({'message': f'Leave marked as {status}'}), 200
 
 
@@ -0,0 +1,198 @@
+"""
+Token authentication shared by every blueprint.
+
+Decoded JWTs and the identity they resolve to (id, role, name, email)
+are kept in small in-process TTL/LRU caches, so an authenticated request
+normally costs no database round trip at all.  The full ``User`` row is
+only loaded if a handler touches a field outside the cached identity, or
+modifies the user.
+
+Cached identities are dropped whenever a ``User`` row is changed or
+deleted (profile, role, email, password …): at once in the process that
+committed the change, via a session commit hook, and within
+CACHE_SYNC_SECONDS in every other process (app/cache_sync.py).  If that
+sync can't reach the database, AUTH_CACHE_TTL_SECONDS bounds how long a
+deleted or demoted user stays authorised elsewhere.
+"""
+
+import os
+import time
+from functools import wraps
+from typing import NamedTuple
+
+import jwt
+from flask import request, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.cache_sync import bump, subscribe
+from app.extensions import db
+from app.models.user import User
+
+SECRET_KEY = os.getenv("SECRET_KEY", "secret-dev")
+
+TOKEN_CACHE_SIZE = 4096
+IDENTITY_CACHE_SIZE = 2048
+# Backstop for identities changed by another worker if cache sync fails
+AUTH_CACHE_TTL_SECONDS = 120
+
+
+class UserIdentity(NamedTuple):
+    id: int
+    role: str
+    name: str
+    email: str
+
+
+class AuthenticatedUser:
+    """The current user as seen by route handlers.
+
+    Reads of ``id``, ``role``, ``name`` and ``email`` are served from the
+    cached identity.  Any other attribute, and every assignment, goes to
+    the ``User`` row, which is loaded from the session on first use.
+    """
+    __slots__ = ('_identity', '_row')
+
+    def __init__(self, identity: UserIdentity):
+        object.__setattr__(self, '_identity', identity)
+        object.__setattr__(self, '_row', None)
+
+    @property
+    def row(self) -> User:
+        if self._row is None:
+            row = db.session.get(User, self._identity.id)
+            if row is None:
+                raise LookupError(f"User {self._identity.id} no longer exists")
+            object.__setattr__(self, '_row', row)
+        return self._row
+
+    def __getattr__(self, name):
+        if self._row is None and name in UserIdentity._fields:
+            return getattr(self._identity, name)
+        return getattr(self.row, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.row, name, value)
+
+    def __repr__(self):
+        return f"<AuthenticatedUser {self._identity.email}>"
+
+
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+_identity_cache = TTLCache(maxsize=IDENTITY_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+def decode_user_id(token: str) -> int | None:
+    """Return the user id encoded in *token*, or None if invalid/expired."""
+    cached = _token_cache.get(token)
+    if cached is not None:
+        user_id, expires_at = cached
+        if expires_at is None or expires_at > time.time():
+            return user_id
+        _token_cache.invalidate(token)
+        return None
+
+    try:
+        data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        user_id = int(data['user_id'])
+    except Exception:
+        return None
+
+    expires_at = data.get('exp')
+    ttl = None
+    if expires_at is not None:
+        # Never keep a token cached past its own expiry
+        ttl = min(AUTH_CACHE_TTL_SECONDS, max(expires_at - time.time(), 0))
+    _token_cache.set(token, (user_id, expires_at), ttl=ttl)
+    return user_id
+
+
+def get_identity(user_id: int) -> UserIdentity | None:
+    """Return the cached identity for *user_id*, loading it on a miss."""
+    identity = _identity_cache.get(user_id)
+    if identity is not None:
+        return identity
+
+    row = db.session.query(User.id, User.role, User.name, User.email).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    identity = UserIdentity(*row)
+    _identity_cache.set(user_id, identity)
+    return identity
+
+
+def authenticate(token: str | None) -> AuthenticatedUser | None:
+    """Resolve a raw JWT to the current user, or None if it isn't valid."""
+    if not token:
+        return None
+    user_id = decode_user_id(token)
+    if user_id is None:
+        return None
+    identity = get_identity(user_id)
+    if identity is None:
+        return None
+    return AuthenticatedUser(identity)
+
+
+def token_required(f):
+    """Require ``Authorization: Bearer <token>``; passes the user as first argument."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token:
+            return jsonify({'error': 'Missing token'}), 401
+        parts = token.split()
+        user = authenticate(parts[1] if len(parts) > 1 else None)
+        if user is None:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+        return f(user, *args, **kwargs)
+    return decorated
+
+
+def invalidate_user(user_id: int | None = None) -> None:
+    """Drop the cached identity for *user_id*, or every identity if None."""
+    if user_id is None:
+        _identity_cache.clear()
+    else:
+        _identity_cache.invalidate(user_id)
+
+
+def clear_auth_cache() -> None:
+    _token_cache.clear()
+    _identity_cache.clear()
+
+
+def auth_cache_stats() -> dict:
+    """Hit-rate metrics for the token and identity caches."""
+    return {
+        'tokens': _token_cache.stats(),
+        'identities': _identity_cache.stats(),
+    }
+
+
+# ── Automatic invalidation on commit ─────────────────────────────────
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    touched = session.info.setdefault('auth_dirty', set())
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            touched.add(obj.id)
+    if touched:
+        bump(session, 'users')  # tell the other processes
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_user_changes(session):
+    for user_id in session.info.pop('auth_dirty', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop('auth_dirty', None)
+
+
+# A user changed in another process: identities are cheap to reload
+subscribe('users', lambda: invalidate_user())
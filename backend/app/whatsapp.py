@@ -1,13 +1,27 @@
 """
 WhatsApp notification helper using the Meta WhatsApp Cloud API.
 Reads WHATSAPP_PHONE_NUMBER_ID and WHATSAPP_ACCESS_TOKEN from environment.
+
+Broadcasts go through ``fan_out``: a bounded thread pool sharing one
+pooled HTTP session (keep-alive, so TLS is negotiated once per
+connection rather than per message).  Retries are parked on a timer
+heap instead of sleeping, so one slow or failing recipient never holds
+up the rest of the batch.
 """
 
 import os
+import heapq
+import itertools
 import logging
 import threading
 import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from app.office_config import OFFICE_TZ
 
 logger = logging.getLogger("smartattend.whatsapp")
 
@@ -16,9 +30,13 @@ WHATSAPP_PHONE_NUMBER_ID = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
 WHATSAPP_ACCESS_TOKEN = os.getenv("WHATSAPP_ACCESS_TOKEN", "")
 WHATSAPP_API_VERSION = os.getenv("WHATSAPP_API_VERSION", "v21.0")
 WHATSAPP_WEBHOOK_VERIFY_TOKEN = os.getenv("WHATSAPP_WEBHOOK_VERIFY_TOKEN", "smartattend_verify_token")
+# Template used for coalesced check-in/out alerts (see queue_admin_alert)
+WHATSAPP_DIGEST_TEMPLATE = os.getenv("WHATSAPP_DIGEST_TEMPLATE", "attendance_digest")
+# Override to point at a local mock (scripts/mock_graph_api.py) for benchmarks
+WHATSAPP_API_BASE_URL = os.getenv("WHATSAPP_API_BASE_URL", "https://graph.facebook.com").rstrip("/")
 
 API_URL = (
-    f"https://graph.facebook.com/{WHATSAPP_API_VERSION}"
+    f"{WHATSAPP_API_BASE_URL}/{WHATSAPP_API_VERSION}"
     f"/{WHATSAPP_PHONE_NUMBER_ID}/messages"
 )
 
@@ -31,6 +49,14 @@ HEADERS = {
 MAX_RETRIES = 3
 RETRY_BACKOFF_BASE = 2  # seconds: 2, 4, 8
 
+# ── Fan-out configuration ────────────────────────────────────────────
+# Max requests in flight at once (also the HTTP connection pool size)
+WHATSAPP_CONCURRENCY = int(os.getenv("WHATSAPP_CONCURRENCY", "8"))
+REQUEST_TIMEOUT = 15  # seconds
+
+# Outcome of a single attempt
+SENT, FAILED, RETRY = "sent", "failed", "retry"
+
 
 def is_whatsapp_configured() -> bool:
     """Return True if the required Meta API credentials are present."""
@@ -66,54 +92,147 @@ def _build_template_payload(to: str, template_name: str, params: list[str]) -> d
     }
 
 
-def _send_single(to: str, template_name: str, params: list[str]) -> bool:
-    """Send a single template message with retry & exponential backoff.
-    Returns True on success."""
-    if not is_whatsapp_configured():
-        logger.warning("WhatsApp not configured – skipping send.")
-        return False
-
-    payload = _build_template_payload(to, template_name, params)
-
-    for attempt in range(1, MAX_RETRIES + 1):
-        try:
-            resp = requests.post(API_URL, headers=HEADERS, json=payload, timeout=15)
-            if resp.ok:
-                logger.info("WhatsApp sent to %s (template=%s)", to, template_name)
-                return True
-
-            # Don't retry on 4xx client errors (bad request, auth failure, etc.)
-            if 400 <= resp.status_code < 500:
-                logger.error(
-                    "WhatsApp API client error %s for %s (no retry): %s",
-                    resp.status_code, to, resp.text,
+_session: requests.Session | None = None
+_executor: ThreadPoolExecutor | None = None
+_init_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """Shared keep-alive session, sized to the fan-out concurrency."""
+    global _session
+    if _session is None:
+        with _init_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=WHATSAPP_CONCURRENCY)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(HEADERS)
+                _session = session
+    return _session
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Process-wide send pool; every broadcast shares the same bound."""
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=WHATSAPP_CONCURRENCY, thread_name_prefix="whatsapp",
                 )
-                return False
+    return _executor
 
-            # 5xx server errors — retry
-            logger.warning(
-                "WhatsApp API error %s for %s (attempt %d/%d): %s",
-                resp.status_code, to, attempt, MAX_RETRIES, resp.text,
-            )
-        except requests.exceptions.Timeout:
-            logger.warning(
-                "WhatsApp send timeout for %s (attempt %d/%d)",
-                to, attempt, MAX_RETRIES,
-            )
-        except Exception as e:
+
+def _attempt(to: str, template_name: str, params: list[str], attempt: int) -> str:
+    """POST one template message; returns SENT, FAILED (don't retry) or RETRY."""
+    payload = _build_template_payload(to, template_name, params)
+    try:
+        resp = _get_session().post(API_URL, json=payload, timeout=REQUEST_TIMEOUT)
+        if resp.ok:
+            logger.info("WhatsApp sent to %s (template=%s)", to, template_name)
+            return SENT
+
+        # Don't retry on 4xx client errors (bad request, auth failure, etc.)
+        if 400 <= resp.status_code < 500:
             logger.error(
-                "WhatsApp send failed for %s (attempt %d/%d): %s",
-                to, attempt, MAX_RETRIES, e,
+                "WhatsApp API client error %s for %s (no retry): %s",
+                resp.status_code, to, resp.text,
             )
+            return FAILED
+
+        # 5xx server errors — retry
+        logger.warning(
+            "WhatsApp API error %s for %s (attempt %d/%d): %s",
+            resp.status_code, to, attempt, MAX_RETRIES, resp.text,
+        )
+    except requests.exceptions.Timeout:
+        logger.warning(
+            "WhatsApp send timeout for %s (attempt %d/%d)",
+            to, attempt, MAX_RETRIES,
+        )
+    except Exception as e:
+        logger.error(
+            "WhatsApp send failed for %s (attempt %d/%d): %s",
+            to, attempt, MAX_RETRIES, e,
+        )
+    return RETRY
+
+
+def fan_out_results(messages) -> list[str]:
+    """Send many template messages concurrently; blocks until all are settled.
+
+    messages: iterable of ``(to, template_name, params)`` tuples.
+    Failed attempts (timeouts, 5xx) are retried with exponential backoff
+    (2s, 4s …) up to MAX_RETRIES.  While a message waits for its retry
+    the pool keeps working through the others.
+
+    Returns the final outcome (SENT or FAILED) of each message, in order.
+    """
+    messages = list(messages)
+    if not messages:
+        return []
+    if not is_whatsapp_configured():
+        logger.warning("WhatsApp not configured – skipping send.")
+        return [FAILED] * len(messages)
+
+    results = [FAILED] * len(messages)
+    executor = _get_executor()
+    seq = itertools.count()
+    # (ready_at, seq, index, attempt) — everything is ready immediately
+    pending = [(0.0, next(seq), i, 1) for i in range(len(messages))]
+    in_flight = {}
+
+    while pending or in_flight:
+        now = time.monotonic()
+        # Keep at most WHATSAPP_CONCURRENCY of *our* sends queued at a time
+        while pending and pending[0][0] <= now and len(in_flight) < WHATSAPP_CONCURRENCY:
+            _ready, _n, i, attempt = heapq.heappop(pending)
+            future = executor.submit(_attempt, *messages[i], attempt)
+            in_flight[future] = (i, attempt)
+
+        if in_flight:
+            # Wake on the next completion, or when the next retry falls due
+            timeout = None
+            if pending and len(in_flight) < WHATSAPP_CONCURRENCY:
+                timeout = max(pending[0][0] - now, 0)
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        else:
+            # Only retries left, none due yet — wait for the earliest one
+            time.sleep(max(pending[0][0] - now, 0))
+            continue
+
+        for future in done:
+            i, attempt = in_flight.pop(future)
+            to = messages[i][0]
+            try:
+                result = future.result()
+            except Exception as e:  # _attempt catches request errors; this is a bug guard
+                logger.error("WhatsApp send to %s crashed: %s", to, e)
+                result = FAILED
+
+            if result == RETRY and attempt < MAX_RETRIES:
+                delay = RETRY_BACKOFF_BASE ** attempt  # 2s, 4s
+                logger.info("Retrying %s in %ds…", to, delay)
+                heapq.heappush(pending, (time.monotonic() + delay, next(seq), i, attempt + 1))
+                continue
+            if result == RETRY:
+                logger.error("WhatsApp send to %s FAILED after %d attempts.", to, MAX_RETRIES)
+            results[i] = SENT if result == SENT else FAILED
+
+    return results
+
+
+def fan_out(messages) -> dict:
+    """Like ``fan_out_results``, but returns ``{'sent': n, 'failed': n}``."""
+    results = fan_out_results(messages)
+    return {SENT: results.count(SENT), FAILED: results.count(FAILED)}
 
-        # Exponential backoff before retry
-        if attempt < MAX_RETRIES:
-            wait = RETRY_BACKOFF_BASE ** attempt  # 2s, 4s
-            logger.info("Retrying in %ds…", wait)
-            time.sleep(wait)
 
-    logger.error("WhatsApp send to %s FAILED after %d attempts.", to, MAX_RETRIES)
-    return False
+def _send_single(to: str, template_name: str, params: list[str]) -> bool:
+    """Send a single template message with retry & exponential backoff.
+    Returns True on success."""
+    return fan_out([(to, template_name, params)])[SENT] == 1
 
 
 def truncate_name_list(names: list[str], max_chars: int = 900) -> str:
@@ -140,8 +259,7 @@ def send_whatsapp_to_numbers(
     params: list[str],
 ) -> None:
     """Send a template message to every number in the list (blocking)."""
-    for num in phone_numbers:
-        _send_single(num, template_name, params)
+    fan_out((num, template_name, params) for num in phone_numbers)
 
 
 def send_whatsapp_to_all(template_name: str, params: list[str]) -> None:
@@ -174,42 +292,138 @@ def send_whatsapp_to_all_personalized(template_name: str, params_fn) -> None:
     if not entries:
         logger.info("No WhatsApp numbers configured – nothing to send.")
         return
-    for entry in entries:
-        label = entry.label or "Team"
-        _send_single(entry.phone_number, template_name, params_fn(label))
+    fan_out(
+        (entry.phone_number, template_name, params_fn(entry.label or "Team"))
+        for entry in entries
+    )
+
 
+def _admin_recipients() -> list[tuple[str, str]]:
+    """(phone_number, label) for every admin number saved in the DB."""
+    from app.models.whatsapp_config import WhatsAppConfig
 
-def send_whatsapp_async(template_name: str, params: list[str] = None, params_fn=None, app=None) -> None:
-    """Fire-and-forget: send template to all saved numbers in a background thread.
+    return [(w.phone_number, w.label or "Team") for w in WhatsAppConfig.query.all()]
 
-    If params_fn is provided, uses send_whatsapp_to_all_personalized for per-admin names.
-    Otherwise uses send_whatsapp_to_all with static params.
-    """
-    from flask import current_app
-    _app = app or current_app._get_current_object()
 
-    def _worker():
-        with _app.app_context():
-            if params_fn:
-                send_whatsapp_to_all_personalized(template_name, params_fn)
-            else:
-                send_whatsapp_to_all(template_name, params or [])
+def send_whatsapp_async(
+    template_name: str,
+    params: list[str] = None,
+    params_fn=None,
+    dedup_key: str | None = None,
+) -> None:
+    """Queue a template message to every saved admin number.
+
+    If params_fn is provided it is called with each admin's label/name to
+    build that recipient's parameters; otherwise *params* go to everyone.
+    Messages are written to the outbox (one INSERT, committed here) and
+    delivered by the outbox worker.  *dedup_key* makes the call
+    idempotent: a second call with the same key queues nothing.
 
-    threading.Thread(target=_worker, daemon=True).start()
+    NOTE: Must be called inside an application context.
+    """
+    if not is_whatsapp_configured():
+        return  # nothing to send — don't queue what can never be delivered
+
+    from app.extensions import db
+    from app.outbox import enqueue_many
+
+    enqueue_many([
+        {
+            'kind': 'whatsapp',
+            'payload': {
+                'to': number,
+                'template': template_name,
+                'params': params_fn(label) if params_fn else (params or []),
+            },
+            'dedup_key': f"{dedup_key}:{number}" if dedup_key else None,
+        }
+        for number, label in _admin_recipients()
+    ])
+    db.session.commit()
 
 
 def send_whatsapp_to_number_async(
     phone_number: str,
     template_name: str,
     params: list[str],
-    app=None,
+    dedup_key: str | None = None,
 ) -> None:
-    """Fire-and-forget: send template to a single number in a background thread."""
-    from flask import current_app
-    _app = app or current_app._get_current_object()
+    """Queue a template message to a single number (see ``send_whatsapp_async``)."""
+    if not is_whatsapp_configured():
+        return
+
+    from app.extensions import db
+    from app.outbox import enqueue
+
+    enqueue(
+        'whatsapp',
+        {'to': phone_number, 'template': template_name, 'params': params},
+        dedup_key=dedup_key,
+    )
+    db.session.commit()
+
+
+# ── Coalesced admin alerts ───────────────────────────────────────────
+
+CHECK_IN, CHECK_OUT = "check_in", "check_out"
+
+
+def queue_admin_alert(event: str, detail: str, window_minutes: int, dedup_key: str | None = None) -> None:
+    """Queue a check-in/out alert for every admin's next digest.
 
-    def _worker():
-        with _app.app_context():
-            _send_single(phone_number, template_name, params)
+    *event* is CHECK_IN or CHECK_OUT; *detail* is the line shown for it,
+    e.g. "Asha (10:02 AM)".  Alerts are held until the end of the current
+    *window_minutes* window (aligned to the office-local clock, counted
+    from midnight — a 60-minute window ends on the hour), then every alert from
+    that window goes out as a single WHATSAPP_DIGEST_TEMPLATE message per
+    admin — see ``digest_message``.
 
-    threading.Thread(target=_worker, daemon=True).start()
+    NOTE: Must be called inside an application context.
+    """
+    if not is_whatsapp_configured():
+        return
+
+    from app.extensions import db
+    from app.outbox import enqueue_many
+
+    enqueue_many([
+        {
+            'kind': 'whatsapp_digest',
+            'payload': {'to': number, 'label': label, 'event': event, 'detail': detail},
+            'dedup_key': f"{dedup_key}:{number}" if dedup_key else None,
+        }
+        for number, label in _admin_recipients()
+    ], delay_seconds=seconds_to_window_end(window_minutes))
+    db.session.commit()
+
+
+def seconds_to_window_end(window_minutes: int, now: datetime | None = None) -> float:
+    """Seconds from *now* (default: office-local now) to the end of its
+    *window_minutes* window, windows starting at office-local midnight.
+    """
+    now = now or datetime.now(OFFICE_TZ)
+    elapsed = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+    window = window_minutes * 60
+    return window - elapsed % window
+
+
+def digest_message(alerts: list[dict]) -> tuple[str, str, list[str]]:
+    """Build one recipient's digest from their queued alert payloads.
+
+    Template parameters:
+        {{1}} admin's name, {{2}} number of check-ins, {{3}} who checked in,
+        {{4}} number of check-outs, {{5}} who checked out.
+    """
+    check_ins = [a['detail'] for a in alerts if a['event'] == CHECK_IN]
+    check_outs = [a['detail'] for a in alerts if a['event'] == CHECK_OUT]
+    return (
+        alerts[0]['to'],
+        WHATSAPP_DIGEST_TEMPLATE,
+        [
+            alerts[0]['label'],
+            str(len(check_ins)),
+            truncate_name_list(check_ins),
+            str(len(check_outs)),
+            truncate_name_list(check_outs),
+        ],
+    )
@@ -0,0 +1,327 @@
+"""
+Scheduled WhatsApp notifications.
+
+Each notification in ``WhatsAppScheduleConfig`` gets a real cron job at
+its configured office-local time, in the scheduler leader only.  Jobs
+are re-planned whenever the config changes: a committed change bumps
+the ``whatsapp_schedule`` cache version, which the leader notices within
+CACHE_SYNC_SECONDS wherever the change was made (app/cache_sync.py), and
+every REPLAN_SECONDS as a backstop.
+
+Every run is claimed in ``scheduled_job_runs`` first, so a job runs at
+most once per day no matter how many processes schedule it.  A job that
+is (re)planned — on start-up, or because its time changed — and whose
+time passed less than CATCHUP_GRACE_MINUTES ago is run straight away,
+exactly once, so neither a restart nor moving a send time to "just now"
+skips that day's run.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache_sync import bump, subscribe
+from app.models.whatsapp_schedule import WhatsAppScheduleConfig
+from app.office_config import OFFICE_TIMEZONE_NAME, OFFICE_TZ
+
+logger = logging.getLogger("smartattend.whatsapp_jobs")
+
+CATCHUP_GRACE_MINUTES = 30
+REPLAN_SECONDS = 300
+
+
+# ── The jobs ─────────────────────────────────────────────────────────
+
+def _minutes_between(start_hm: str, end_hm: str) -> int:
+    start_h, start_m = map(int, start_hm.split(':'))
+    end_h, end_m = map(int, end_hm.split(':'))
+    return (end_h * 60 + end_m) - (start_h * 60 + start_m)
+
+
+def send_attendance_reminders(settings, board) -> None:
+    """Attendance reminder → each absent EMPLOYEE's phone."""
+    from app.whatsapp import fan_out
+
+    # Calculate minutes until morning report
+    try:
+        diff = _minutes_between(settings.reminder_time, settings.morning_report_time)
+        time_str = f"{diff} minutes" if diff > 0 else "soon"
+    except Exception:
+        time_str = "30 minutes"
+    fan_out(
+        (emp.phone_number, "daily_attendence_v2", [emp.name, time_str])
+        for emp in board.absent
+        # skip opted-out employees and those without a phone number
+        if emp.notify_reminder and emp.phone_number
+    )
+    logger.info("Attendance reminders sent to employees.")
+
+
+def send_morning_report(settings, board) -> None:
+    """Morning report → admins."""
+    from app.whatsapp import send_whatsapp_to_all_personalized, truncate_name_list
+
+    logged_in = [e.name for e in board.present]
+    absent = [e.name for e in board.absent]
+    send_whatsapp_to_all_personalized(
+        template_name="daily_attendence_v3",
+        params_fn=lambda label: [
+            label,
+            truncate_name_list(logged_in),
+            truncate_name_list(absent),
+        ],
+    )
+    logger.info("Morning WhatsApp report sent.")
+
+
+def send_logoff_reminders(settings, board) -> None:
+    """Logoff reminder (v5) → nudge employees still checked in."""
+    from app.whatsapp import fan_out
+
+    # Compute minutes until evening report
+    try:
+        diff = _minutes_between(settings.logoff_reminder_time, settings.evening_report_time)
+        if diff <= 0:
+            diff = 15  # fallback
+        minutes_label = f"{diff} minutes" if diff != 1 else "1 minute"
+    except Exception:
+        minutes_label = "15 minutes"
+
+    # still_online excludes overtime workers — they already know
+    fan_out(
+        (emp.phone_number, "daily_attendence_v5", [emp.name, minutes_label])
+        for emp in board.still_online
+        if emp.notify_checkout and emp.phone_number
+    )
+    logger.info("Logoff reminders (v5) sent to employees.")
+
+
+def send_evening_report(settings, board) -> None:
+    """Evening wrap-up → admins."""
+    from app.whatsapp import send_whatsapp_to_all_personalized, truncate_name_list
+
+    total = len(board)
+    logged_out = [e.name for e in board.checked_out]
+    ghosted = [e.name for e in board.absent]
+    still_online = [e.name for e in board.still_online]
+    overtime_workers = [e.name for e in board.overtime]
+
+    # Merge overtime into still_online display for the template
+    all_still_online = still_online + [f"{n} (OT)" for n in overtime_workers]
+    send_whatsapp_to_all_personalized(
+        template_name="daily_attendence",
+        params_fn=lambda label: [
+            label,
+            str(total),
+            truncate_name_list(logged_out),
+            truncate_name_list(ghosted),
+            truncate_name_list(all_still_online),
+        ],
+    )
+    logger.info("EOD WhatsApp wrap-up sent.")
+
+
+def send_midnight_alerts(settings, board) -> None:
+    """Midnight oil alert → only non-overtime employees still checked in."""
+    from app.whatsapp import fan_out
+
+    # still_online skips employees knowingly working overtime
+    fan_out(
+        (emp.phone_number, "attendence_daily_v3", [emp.name])
+        for emp in board.still_online
+        if emp.notify_midnight and emp.phone_number
+    )
+    logger.info("Midnight oil alerts sent to non-overtime employees.")
+
+
+class ScheduledJob(NamedTuple):
+    time_field: str
+    enabled_field: str
+    run: Callable
+
+
+JOBS = {
+    'reminder': ScheduledJob('reminder_time', 'reminder_enabled', send_attendance_reminders),
+    'morning_report': ScheduledJob('morning_report_time', 'morning_report_enabled', send_morning_report),
+    'logoff_reminder': ScheduledJob('logoff_reminder_time', 'logoff_reminder_enabled', send_logoff_reminders),
+    'evening_report': ScheduledJob('evening_report_time', 'evening_report_enabled', send_evening_report),
+    'midnight_alert': ScheduledJob('midnight_alert_time', 'midnight_alert_enabled', send_midnight_alerts),
+}
+
+
+# ── Running a job ────────────────────────────────────────────────────
+
+def _current_settings():
+    """The schedule config straight from the DB (not the 60s settings cache)."""
+    from types import SimpleNamespace
+
+    return SimpleNamespace(**WhatsAppScheduleConfig.get_current().to_dict())
+
+
+def last_occurrence(hm: str, now: datetime) -> datetime:
+    """Most recent office-local HH:MM at or before *now* (today or yesterday)."""
+    hour, minute = map(int, hm.split(':'))
+    occurrence = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if occurrence > now:
+        occurrence -= timedelta(days=1)
+    return occurrence
+
+
+def run_job(job_id: str, now: datetime | None = None) -> bool:
+    """Run *job_id* for its most recent scheduled time, if nobody has yet.
+
+    Skips the run if the job is disabled, if that time is more than
+    CATCHUP_GRACE_MINUTES ago, or if another process (or an earlier
+    call) already claimed it.  Returns True if the job ran.
+
+    NOTE: Must be called inside an application context.
+    """
+    from app.attendance_board import build_board
+    from app.models.job_run import ScheduledJobRun
+
+    job = JOBS[job_id]
+    now = now or datetime.now(OFFICE_TZ)
+    settings = _current_settings()
+    if not getattr(settings, job.enabled_field):
+        return False
+
+    occurrence = last_occurrence(getattr(settings, job.time_field), now)
+    if now - occurrence > timedelta(minutes=CATCHUP_GRACE_MINUTES):
+        return False  # not due — or too late to be useful
+
+    if not ScheduledJobRun.claim(job_id, occurrence.date()):
+        return False
+
+    if now - occurrence > timedelta(minutes=1):
+        logger.warning("Catching up WhatsApp job %s scheduled for %s", job_id, occurrence.strftime("%Y-%m-%d %H:%M"))
+    # Built fresh rather than read from the presence index: this runs in
+    # the scheduler leader, which serves no check-ins, so its index is only
+    # as current as the last BOARD_TTL_SECONDS rebuild — a check-in made
+    # seconds before a reminder must count.  The run may also be a catch-up
+    # for yesterday (e.g. 23:00 alert).  One query per run, a few per day.
+    job.run(settings, build_board(occurrence.date()))
+    return True
+
+
+# ── Scheduler ────────────────────────────────────────────────────────
+
+_scheduler = None
+_app = None
+_plan: dict[str, str] = {}  # job_id -> HH:MM currently scheduled
+_plan_lock = threading.Lock()
+
+
+def _run_scheduled(job_id: str) -> None:
+    with _app.app_context():
+        try:
+            run_job(job_id)
+        except Exception:
+            logger.exception("WhatsApp job %s failed", job_id)
+
+
+def replan(settings=None) -> None:
+    """(Re)schedule cron jobs to match the current config, and catch up
+    any re-planned job whose time has just passed; no-op if the scheduler
+    isn't running in this process.
+
+    NOTE: Must be called inside an application context.
+    """
+    from apscheduler.triggers.cron import CronTrigger
+
+    if _scheduler is None:
+        return
+    settings = settings or _current_settings()
+    now = datetime.now(OFFICE_TZ)
+
+    with _plan_lock:
+        for job_id, job in JOBS.items():
+            scheduler_id = f"whatsapp_{job_id}"
+            hm = getattr(settings, job.time_field) if getattr(settings, job.enabled_field) else None
+            if _plan.get(job_id) == hm:
+                continue
+            if hm is None:
+                if _scheduler.get_job(scheduler_id):
+                    _scheduler.remove_job(scheduler_id)
+                _plan.pop(job_id, None)
+                logger.info("WhatsApp job %s disabled", job_id)
+                continue
+            hour, minute = map(int, hm.split(':'))
+            _scheduler.add_job(
+                _run_scheduled,
+                trigger=CronTrigger(hour=hour, minute=minute, timezone=OFFICE_TIMEZONE_NAME),
+                args=[job_id],
+                id=scheduler_id,
+                replace_existing=True,
+                coalesce=True,
+                misfire_grace_time=CATCHUP_GRACE_MINUTES * 60,
+            )
+            _plan[job_id] = hm
+            logger.info("WhatsApp job %s scheduled at %s %s", job_id, hm, OFFICE_TIMEZONE_NAME)
+
+            if now - last_occurrence(hm, now) <= timedelta(minutes=CATCHUP_GRACE_MINUTES):
+                # Its time has just passed: the cron trigger won't fire
+                # until tomorrow.  The run is claimed, so at most once.
+                _scheduler.add_job(_run_scheduled, args=[job_id], id=f"{scheduler_id}_catch_up",
+                                   replace_existing=True)
+
+
+def _replan_from_db() -> None:
+    with _app.app_context():
+        try:
+            replan()
+        except Exception:
+            logger.exception("Re-planning WhatsApp jobs failed")
+
+
+def start_whatsapp_scheduler(app) -> None:
+    """Start the WhatsApp cron jobs for this process (idempotent)."""
+    global _scheduler, _app
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    if _scheduler is not None:
+        return
+    _app = app
+    _scheduler = BackgroundScheduler(daemon=True, timezone=OFFICE_TIMEZONE_NAME)
+    _scheduler.add_job(
+        _replan_from_db,
+        trigger=IntervalTrigger(seconds=REPLAN_SECONDS),
+        id="whatsapp_replan",
+        replace_existing=True,
+    )
+    _scheduler.start()
+    _replan_from_db()
+    logger.info("WhatsApp scheduler started (timezone=%s)", OFFICE_TIMEZONE_NAME)
+
+
+def stop_whatsapp_scheduler() -> None:
+    """Stop this process's WhatsApp cron jobs (e.g. on losing leadership)."""
+    global _scheduler
+    if _scheduler is None:
+        return
+    _scheduler.shutdown(wait=False)
+    _scheduler = None
+    with _plan_lock:
+        _plan.clear()
+    logger.info("WhatsApp scheduler stopped")
+
+
+# ── Following config changes made in any process ─────────────────────
+
+@event.listens_for(Session, "after_flush")
+def _collect_schedule_changes(session, flush_context):
+    if any(isinstance(obj, WhatsAppScheduleConfig) for obj in (*session.new, *session.dirty)):
+        bump(session, 'whatsapp_schedule')
+
+
+def _schedule_changed() -> None:
+    if _scheduler is not None:
+        _replan_from_db()
+
+
+subscribe('whatsapp_schedule', WhatsAppScheduleConfig.invalidate_settings)
+subscribe('whatsapp_schedule', _schedule_changed)
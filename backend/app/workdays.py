@@ -0,0 +1,192 @@
+"""
+Working-day calendar — which days are business days, and how many fall
+in a date range.
+
+Each calendar year is materialised once as a bitmap (one byte per day:
+1 = working day) plus a prefix-sum array over it, so counting the
+working days between any two dates of a year is two array lookups, and a
+multi-year range costs one lookup per year.  Years are cached; the
+weekend setting and the holidays of all missing years are loaded with
+one query each.
+
+Any committed change to a ``Holiday`` drops its year from the cache; a
+change to ``WeekendConfig`` drops every year.  Other processes drop every
+year within CACHE_SYNC_SECONDS (app/cache_sync.py), with a TTL as the
+backstop.
+"""
+
+from array import array
+from datetime import date
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import TTLCache
+from app.cache_sync import bump, subscribe
+from app.extensions import db
+from app.models.holiday import Holiday
+from app.models.weekend_config import WeekendConfig
+
+# Safety net for changes committed by another worker process
+CALENDAR_TTL_SECONDS = 300
+
+
+class YearCalendar:
+    """Business-day bitmap and prefix sums for one calendar year."""
+
+    __slots__ = ('year', 'first', 'bitmap', 'prefix')
+
+    def __init__(self, year: int, weekend_days: set[int], holidays: set[date]):
+        self.year = year
+        self.first = date(year, 1, 1)
+        n_days = (date(year + 1, 1, 1) - self.first).days
+
+        # weekday() of Jan 1, then walk the week cyclically
+        first_weekday = self.first.weekday()
+        self.bitmap = bytearray(
+            0 if (first_weekday + i) % 7 in weekend_days else 1 for i in range(n_days)
+        )
+        for h in holidays:
+            self.bitmap[(h - self.first).days] = 0
+
+        # prefix[i] = working days among the first i days of the year
+        self.prefix = array('H', [0]) * (n_days + 1)
+        running = 0
+        for i, bit in enumerate(self.bitmap):
+            running += bit
+            self.prefix[i + 1] = running
+
+    @property
+    def total(self) -> int:
+        return self.prefix[-1]
+
+    def is_working_day(self, d: date) -> bool:
+        return bool(self.bitmap[(d - self.first).days])
+
+    def count(self, start: date, end: date) -> int:
+        """Working days in [start, end]; both must fall in this year."""
+        return self.prefix[(end - self.first).days + 1] - self.prefix[(start - self.first).days]
+
+
+# ~1 KB per year; room for leave ranges well into the past and future
+_calendar_cache = TTLCache(maxsize=128, ttl=CALENDAR_TTL_SECONDS)
+_calendar_version = 0  # bumped by invalidate_calendar
+
+
+def _load_calendars(years: list[int]) -> dict[int, YearCalendar]:
+    """Build calendars for *years* with one weekend and one holiday query."""
+    weekend_days = WeekendConfig.get_current().get_weekend_set()
+    holidays: dict[int, set[date]] = {y: set() for y in years}
+    rows = db.session.query(Holiday.date).filter(
+        Holiday.date >= date(min(years), 1, 1),
+        Holiday.date < date(max(years) + 1, 1, 1),
+    )
+    for (d,) in rows:
+        if d.year in holidays:
+            holidays[d.year].add(d)
+    return {y: YearCalendar(y, weekend_days, holidays[y]) for y in years}
+
+
+def get_calendars(first_year: int, last_year: int) -> list[YearCalendar]:
+    """Return the (cached) calendars for every year in [first_year, last_year].
+
+    NOTE: Must be called inside an application context.
+    """
+    calendars = {y: _calendar_cache.get(y) for y in range(first_year, last_year + 1)}
+    missing = [y for y, cal in calendars.items() if cal is None]
+    if missing:
+        for y, cal in _load_calendars(missing).items():
+            _calendar_cache.set(y, cal)
+            calendars[y] = cal
+    return [calendars[y] for y in range(first_year, last_year + 1)]
+
+
+def get_calendar(year: int) -> YearCalendar:
+    """Return the (cached) calendar for *year*."""
+    return get_calendars(year, year)[0]
+
+
+def is_working_day(d: date) -> bool:
+    return get_calendar(d.year).is_working_day(d)
+
+
+def count_working_days(start: date, end: date) -> int:
+    """Count business days between *start* and *end* (inclusive),
+    excluding weekends (as configured) and holidays.
+    """
+    return sum(working_days_by_year(start, end).values())
+
+
+def working_days_by_year(start: date, end: date) -> dict[int, int]:
+    """Working days between *start* and *end* (inclusive) per calendar
+    year; years without any are left out.
+    """
+    if start > end:
+        return {}
+    by_year = {}
+    for cal in get_calendars(start.year, end.year):
+        days = cal.count(max(start, cal.first), min(end, date(cal.year, 12, 31)))
+        if days:
+            by_year[cal.year] = days
+    return by_year
+
+
+def invalidate_calendar(year: int | None = None) -> None:
+    """Drop the cached calendar for *year*, or every cached year if None."""
+    global _calendar_version
+    _calendar_version += 1
+    if year is None:
+        _calendar_cache.clear()
+    else:
+        _calendar_cache.invalidate(year)
+
+
+def calendar_version() -> int:
+    """Changes whenever any calendar is invalidated (holiday / weekend edits)."""
+    return _calendar_version
+
+
+def calendar_cache_stats() -> dict:
+    return _calendar_cache.stats()
+
+
+# ── Automatic invalidation on commit ─────────────────────────────────
+# Holidays only affect their own year; the weekend setting affects all.
+
+_ALL_YEARS = 'all'
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_calendar_changes(session, flush_context):
+    touched = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Holiday):
+            # A moved holiday also leaves its old year
+            moved_from = db.inspect(obj).attrs.date.history.deleted or ()
+            touched.update(d.year for d in (obj.date, *moved_from) if d)
+        elif isinstance(obj, WeekendConfig):
+            touched.add(_ALL_YEARS)
+    if touched:
+        session.info.setdefault('calendar_dirty', set()).update(touched)
+        bump(session, 'calendar')
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_calendar_changes(session):
+    touched = session.info.pop('calendar_dirty', None)
+    if not touched:
+        return
+    if _ALL_YEARS in touched:
+        invalidate_calendar()
+    else:
+        for year in touched:
+            invalidate_calendar(year)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_calendar_changes(session):
+    session.info.pop('calendar_dirty', None)
+
+
+# Holidays / weekend changed in another process
+subscribe('calendar', lambda: invalidate_calendar())
@@ -0,0 +1,12 @@
+"""
+gunicorn server hooks (settings stay on the command line in Dockerfile.prod).
+"""
+
+
+def when_ready(server):
+    # Live dashboard events: one server per container, in the master, so
+    # it outlives worker restarts.  Workers publish via PostgreSQL NOTIFY.
+    from app.app import app
+    from app.event_stream import start_event_stream
+
+    start_event_stream(app)
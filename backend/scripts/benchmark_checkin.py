@@ -0,0 +1,116 @@
+"""
+Benchmark: check-in latency as the attendance table grows.
+
+Fills a scratch SQLite database with synthetic attendance history in
+steps (default up to 2,000,000 rows) and, after each step, times the
+check-in path — the (user_id, date) lookup followed by the insert — for a
+batch of users on a fresh day.  Run it with and without the composite
+index to compare:
+
+    python scripts/benchmark_checkin.py
+    python scripts/benchmark_checkin.py --no-index
+    python scripts/benchmark_checkin.py --steps 10000 100000 1000000 5000000
+
+With the index the median latency stays flat; without it every lookup
+scans the whole table and grows linearly with the row count.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+EMPLOYEES = 500
+SAMPLES = 200
+INSERT_CHUNK = 50_000
+
+
+def _create_schema(conn, with_index: bool):
+    conn.execute(text("""
+        CREATE TABLE attendance (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            check_in_time DATETIME,
+            check_out_time DATETIME,
+            is_overtime BOOLEAN NOT NULL DEFAULT 0,
+            date DATE NOT NULL
+        )
+    """))
+    if with_index:
+        conn.execute(text("CREATE UNIQUE INDEX ix_attendance_user_date ON attendance (user_id, date)"))
+
+
+def _fill(conn, start_row: int, end_row: int):
+    """Insert synthetic rows [start_row, end_row): one row per user-day, going back in time."""
+    base = date(2020, 1, 1)
+    stamp = datetime(2020, 1, 1, 4, 30)
+    for chunk_start in range(start_row, end_row, INSERT_CHUNK):
+        chunk_end = min(chunk_start + INSERT_CHUNK, end_row)
+        conn.execute(
+            text("INSERT INTO attendance (user_id, date, check_in_time, check_out_time) "
+                 "VALUES (:user_id, :date, :check_in, :check_out)"),
+            [
+                {
+                    'user_id': n % EMPLOYEES + 1,
+                    'date': base - timedelta(days=n // EMPLOYEES),
+                    'check_in': stamp,
+                    'check_out': stamp + timedelta(hours=9),
+                }
+                for n in range(chunk_start, chunk_end)
+            ],
+        )
+
+
+def _time_check_ins(conn, day: date) -> list[float]:
+    """Run the check-in lookup + insert for SAMPLES users; return per-call latency in ms."""
+    timings = []
+    for user_id in range(1, SAMPLES + 1):
+        t0 = time.perf_counter()
+        existing = conn.execute(
+            text("SELECT id FROM attendance WHERE user_id = :u AND date = :d"),
+            {'u': user_id, 'd': day},
+        ).first()
+        if existing is None:
+            conn.execute(
+                text("INSERT INTO attendance (user_id, date, check_in_time) VALUES (:u, :d, :t)"),
+                {'u': user_id, 'd': day, 't': datetime.utcnow()},
+            )
+        timings.append((time.perf_counter() - t0) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, nargs='+', default=[10_000, 100_000, 500_000, 1_000_000, 2_000_000],
+                        help='table sizes (rows) to measure at')
+    parser.add_argument('--no-index', action='store_true', help='benchmark without the (user_id, date) index')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        with engine.begin() as conn:
+            _create_schema(conn, with_index=not args.no_index)
+
+        print(f"index: {'no' if args.no_index else 'yes'}  employees: {EMPLOYEES}  samples/step: {SAMPLES}")
+        print(f"{'rows':>12} {'median ms':>10} {'p95 ms':>10}")
+
+        filled = 0
+        day = date(2030, 1, 1)
+        for target in sorted(args.steps):
+            with engine.begin() as conn:
+                _fill(conn, filled, target)
+            filled = target
+
+            with engine.begin() as conn:
+                timings = _time_check_ins(conn, day)
+            day += timedelta(days=1)
+
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(f"{filled:>12,} {statistics.median(timings):>10.3f} {p95:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
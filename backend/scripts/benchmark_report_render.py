@@ -0,0 +1,99 @@
+"""
+Benchmark: rendering the daily report for a large headcount.
+
+Builds a synthetic attendance board (no database) and renders it two ways:
+
+  * concat   — the previous renderer: per-row f-strings appended with
+               ``+=`` onto one string, then one big f-string layout;
+  * template — ``app.daily_report.render_report`` (compiled Jinja2
+               layout, cached status pills, rows stitched from
+               pre-split row pieces and joined once).
+
+CPython can often grow a string in place on ``+=``, which keeps the
+concat loop roughly linear here; it degrades to quadratic copying
+whenever that optimisation doesn't apply (another reference to the
+string, a profiler or tracer, other interpreters).
+
+    python -m scripts.benchmark_report_render
+    python -m scripts.benchmark_report_render --employees 1000 10000 50000 --runs 5
+"""
+import argparse
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+from app.attendance_board import AttendanceBoard, BoardEntry
+from app.daily_report import _format_local, render_report
+
+
+def _board(employees: int) -> AttendanceBoard:
+    day = date(2026, 2, 10)
+    start = datetime(2026, 2, 10, 3, 30)
+    entries = []
+    for n in range(employees):
+        present = n % 5 != 0
+        check_in = start + timedelta(minutes=n % 90) if present else None
+        check_out = check_in + timedelta(hours=9) if present and n % 3 else None
+        entries.append(BoardEntry(n, f"Employee {n:05d}", f"emp{n}@example.com", None,
+                                  True, True, True, check_in, check_out, False))
+    return AttendanceBoard(day, entries)
+
+
+def _concat(board: AttendanceBoard) -> str:
+    """The daily report body as it used to be built (rows only — the rest is constant)."""
+    employee_rows = ""
+    for i, emp in enumerate(board.entries):
+        bg = "#f9fafb" if i % 2 == 0 else "#ffffff"
+        if emp.is_present:
+            status, color = "Present", "#16a34a"
+            entry = _format_local(emp.check_in_time)
+            exit_time = _format_local(emp.check_out_time) if emp.check_out_time else "Still Checked In"
+        else:
+            status, color, entry, exit_time = "Absent", "#dc2626", "—", "—"
+        employee_rows += f"""
+        <tr style="background-color:{bg};">
+          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">{emp.name}</td>
+          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">
+            <span style="display:inline-block;padding:2px 10px;border-radius:9999px;
+                         font-size:12px;font-weight:600;color:#fff;background:{color};">
+              {status}
+            </span>
+          </td>
+          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">{entry}</td>
+          <td style="padding:10px 14px;border-bottom:1px solid #e5e7eb;">{exit_time}</td>
+        </tr>"""
+    return f"""
+    <html><body><table><tbody>
+      {employee_rows}
+    </tbody></table></body></html>
+    """
+
+
+def _time(fn, board, runs: int) -> tuple[float, int]:
+    samples, size = [], 0
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        size = len(fn(board))
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employees', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--runs', type=int, default=5, help='renders per size (median reported)')
+    args = parser.parse_args()
+
+    from app import email_templates
+    email_templates.precompile()
+
+    print(f"{'employees':>10} {'concat ms':>11} {'template ms':>12} {'speed-up':>9} {'html KB':>9}")
+    for n in args.employees:
+        board = _board(n)
+        concat_ms, _ = _time(_concat, board, args.runs)
+        template_ms, size = _time(lambda b: render_report(b)[1], board, args.runs)
+        print(f"{n:>10} {concat_ms:>11.1f} {template_ms:>12.1f} {concat_ms / template_ms:>8.1f}x {size / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
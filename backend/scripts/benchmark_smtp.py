@@ -0,0 +1,119 @@
+"""
+Benchmark: email throughput and OTP request latency against a local
+SMTP sink.
+
+Starts scripts/smtp_sink.py in-process, then:
+
+  * sends the same batch of emails twice —
+      per-message — connect + login + send + quit for each email (how
+                    mail used to be sent);
+      pooled      — ``app.mail.send_html_emails`` (one kept-alive
+                    connection for the whole batch);
+  * times ``POST /auth/forgot-password`` end to end; the OTP email is
+    sent on the request thread (it is never queued, so the code isn't
+    stored), over a fresh connection vs. the warm pool.
+
+    python -m scripts.benchmark_smtp
+    python -m scripts.benchmark_smtp --emails 500 --latency-ms 40
+"""
+import argparse
+import smtplib
+import statistics
+import time
+
+from scripts.smtp_sink import serve_in_background
+
+
+def _per_message(emails) -> int:
+    from app import mail
+
+    sent = 0
+    for subject, html, to_addrs in emails:
+        msg = mail._build_message(subject, html, to_addrs)
+        with smtplib.SMTP(mail.SMTP_HOST, mail.SMTP_PORT) as server:
+            server.login(mail.SMTP_USER, mail.SMTP_PASS)
+            server.sendmail(mail.SMTP_USER, to_addrs, msg.as_string())
+        sent += 1
+    return sent
+
+
+def _otp_latency(requests: int) -> dict[str, float]:
+    """Median forgot-password latency (ms), new SMTP connection vs. pooled."""
+    from app.app import create_app
+    from app.extensions import db
+    from app.mail_transport import reset_pool
+
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "SECRET_KEY": "benchmark",
+    })
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        client.post('/auth/register', json={'name': 'Bench', 'email': 'bench@test.com',
+                                            'password': 'pass', 'role': 'employee'})
+
+        def timed(cold: bool):
+            samples = []
+            for _ in range(requests):
+                if cold:
+                    reset_pool()
+                t0 = time.perf_counter()
+                client.post('/auth/forgot-password', json={'email': 'bench@test.com'})
+                samples.append((time.perf_counter() - t0) * 1000)
+            return statistics.median(samples)
+
+        fresh = timed(cold=True)
+        pooled = timed(cold=False)
+        db.drop_all()
+    return {'fresh': fresh, 'pooled': pooled}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--emails', type=int, default=100, help='emails per run')
+    parser.add_argument('--latency-ms', type=float, default=20, help='sink delay before every reply')
+    parser.add_argument('--requests', type=int, default=20, help='forgot-password requests per mode')
+    args = parser.parse_args()
+
+    server = serve_in_background(latency_ms=args.latency_ms)
+    host, port = server.address
+
+    # Point app.mail at the sink only after the app module is imported,
+    # so importing it doesn't start leader election against the real DB
+    import app.app  # noqa: F401
+    from app import mail
+
+    mail.SMTP_HOST, mail.SMTP_PORT = host, port
+    mail.SMTP_USER, mail.SMTP_PASS = 'benchmark@example.com', 'benchmark'
+    mail.SMTP_USE_TLS = False
+
+    emails = [(f"Report {n}", f"<p>Report {n}</p>", [f"user{n}@example.com"]) for n in range(args.emails)]
+    print(f"emails: {args.emails}  latency: {args.latency_ms:.0f} ms per reply")
+    print(f"{'mode':<12} {'sent':>6} {'seconds':>9} {'mail/s':>9} {'connections':>12}")
+
+    def report(mode, sent, elapsed, before):
+        conns = server.stats()['connections'] - before
+        print(f"{mode:<12} {sent:>6} {elapsed:>9.2f} {sent / elapsed:>9.1f} {conns:>12}")
+
+    before = server.stats()['connections']
+    t0 = time.perf_counter()
+    sent = _per_message(emails)
+    report('per-message', sent, time.perf_counter() - t0, before)
+
+    before = server.stats()['connections']
+    t0 = time.perf_counter()
+    sent = sum(bool(r) for r in mail.send_html_emails(emails))
+    report('pooled', sent, time.perf_counter() - t0, before)
+
+    latency = _otp_latency(args.requests)
+    print(f"\nPOST /auth/forgot-password (median of {args.requests}):")
+    print(f"  new connection     {latency['fresh']:>8.1f} ms")
+    print(f"  pooled connection  {latency['pooled']:>8.1f} ms")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: WhatsApp broadcast throughput against a local mock Graph API.
+
+Starts scripts/mock_graph_api.py in-process, then sends the same batch
+of template messages twice:
+
+  * sequential — one ``requests.post`` per message, fresh connection each
+    time (how broadcasts used to be sent);
+  * fan-out    — ``app.whatsapp.fan_out`` (pooled session, bounded pool).
+
+    python -m scripts.benchmark_whatsapp_fanout
+    python -m scripts.benchmark_whatsapp_fanout --messages 500 --latency-ms 250 --concurrency 16
+    python -m scripts.benchmark_whatsapp_fanout --fail-rate 0.05   # exercise retries
+
+With --fail-rate the fan-out run includes the retry backoff (2s, 4s) of
+failed messages; other messages keep flowing meanwhile.
+"""
+import argparse
+import os
+import time
+
+from scripts.mock_graph_api import serve_in_background
+
+
+def _sequential(api_url: str, headers: dict, messages, build_payload) -> int:
+    import requests
+
+    sent = 0
+    for to, template_name, params in messages:
+        resp = requests.post(api_url, headers=headers, json=build_payload(to, template_name, params), timeout=15)
+        sent += resp.ok
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200, help='messages per run')
+    parser.add_argument('--latency-ms', type=float, default=150, help='mock API response latency')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of sends the mock fails with 500')
+    parser.add_argument('--concurrency', type=int, default=8, help='WHATSAPP_CONCURRENCY for the fan-out run')
+    parser.add_argument('--skip-sequential', action='store_true', help='only run the fan-out engine')
+    args = parser.parse_args()
+
+    server = serve_in_background(latency_ms=args.latency_ms, fail_rate=args.fail_rate)
+
+    # app.whatsapp reads its configuration at import time
+    os.environ.update({
+        'WHATSAPP_API_BASE_URL': server.base_url,
+        'WHATSAPP_PHONE_NUMBER_ID': 'benchmark',
+        'WHATSAPP_ACCESS_TOKEN': 'benchmark',
+        'WHATSAPP_CONCURRENCY': str(args.concurrency),
+    })
+    from app import whatsapp
+
+    messages = [
+        (f"9199{n:08d}", "daily_attendence_v2", [f"Employee {n}", "30 minutes"])
+        for n in range(args.messages)
+    ]
+    print(f"messages: {args.messages}  latency: {args.latency_ms:.0f} ms  "
+          f"fail rate: {args.fail_rate:.0%}  concurrency: {args.concurrency}")
+    print(f"{'mode':<12} {'sent':>6} {'seconds':>9} {'msg/s':>9} {'connections':>12}")
+
+    def report(mode, sent, elapsed, before):
+        conns = server.stats()['connections'] - before
+        print(f"{mode:<12} {sent:>6} {elapsed:>9.2f} {sent / elapsed:>9.1f} {conns:>12}")
+
+    if not args.skip_sequential:
+        before = server.stats()['connections']
+        t0 = time.perf_counter()
+        sent = _sequential(whatsapp.API_URL, whatsapp.HEADERS, messages, whatsapp._build_template_payload)
+        report('sequential', sent, time.perf_counter() - t0, before)
+
+    before = server.stats()['connections']
+    t0 = time.perf_counter()
+    outcome = whatsapp.fan_out(messages)
+    report('fan-out', outcome[whatsapp.SENT], time.perf_counter() - t0, before)
+    if outcome[whatsapp.FAILED]:
+        print(f"  ({outcome[whatsapp.FAILED]} failed after {whatsapp.MAX_RETRIES} attempts)")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
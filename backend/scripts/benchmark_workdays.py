@@ -0,0 +1,108 @@
+"""
+Benchmark: counting working days over ranges spanning many years.
+
+Compares the previous day-by-day loop (one weekend query and one holiday
+query per year on every call) with the cached per-year calendar in
+app/workdays.py (bitmap + prefix sums), on an in-memory SQLite database
+seeded with HOLIDAYS_PER_YEAR holidays for every year in range:
+
+    python scripts/benchmark_workdays.py
+    python scripts/benchmark_workdays.py --spans 1 5 25 100 --calls 200
+
+The loop grows linearly with the number of days in the range; the
+calendar answers from cache with one lookup per year.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from app.app import create_app
+from app.extensions import db
+from app.models.holiday import Holiday
+from app.models.weekend_config import WeekendConfig
+from app.workdays import count_working_days, invalidate_calendar
+
+HOLIDAYS_PER_YEAR = 16
+FIRST_YEAR = 1990
+
+
+def _seed(last_year: int):
+    rng = random.Random(42)
+    db.session.add(WeekendConfig(weekend_days='5,6'))
+    for year in range(FIRST_YEAR, last_year + 1):
+        days = rng.sample(range(365), HOLIDAYS_PER_YEAR)
+        db.session.add_all(
+            Holiday(date=date(year, 1, 1) + timedelta(days=d), name=f"Holiday {year}-{d}")
+            for d in days
+        )
+    db.session.commit()
+
+
+def _legacy_count(start: date, end: date) -> int:
+    """The day-by-day implementation this replaced."""
+    if start > end:
+        return 0
+    weekend_days = WeekendConfig.get_current().get_weekend_set()
+    years = set()
+    d = start
+    while d <= end:
+        years.add(d.year)
+        d += timedelta(days=365)
+    years.add(end.year)
+    holiday_dates = set()
+    for y in years:
+        holiday_dates |= {h.date for h in Holiday.query.filter(db.extract('year', Holiday.date) == y).all()}
+    count = 0
+    current = start
+    while current <= end:
+        if current.weekday() not in weekend_days and current not in holiday_dates:
+            count += 1
+        current += timedelta(days=1)
+    return count
+
+
+def _time(fn, ranges) -> list[float]:
+    timings = []
+    for start, end in ranges:
+        t0 = time.perf_counter()
+        fn(start, end)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spans', type=int, nargs='+', default=[1, 5, 20, 50], help='range lengths in years')
+    parser.add_argument('--calls', type=int, default=100, help='random ranges timed per span')
+    args = parser.parse_args()
+
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "SECRET_KEY": "benchmark",
+    })
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        _seed(FIRST_YEAR + max(args.spans) + 1)
+        invalidate_calendar()
+
+        print(f"{'span':>6} {'legacy median':>15} {'calendar median':>17} {'speed-up':>10}")
+        for span in args.spans:
+            ranges = []
+            for _ in range(args.calls):
+                start = date(FIRST_YEAR, 1, 1) + timedelta(days=rng.randrange(365))
+                ranges.append((start, start + timedelta(days=365 * span - rng.randrange(30))))
+
+            for start, end in ranges[:5]:
+                assert _legacy_count(start, end) == count_working_days(start, end)
+            legacy = statistics.median(_time(_legacy_count, ranges))
+            calendar = statistics.median(_time(count_working_days, ranges))
+            print(f"{span:>5}y {legacy:>12.3f} ms {calendar:>14.4f} ms {legacy / calendar:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""
+Migration: add alert_digest_window_minutes to whatsapp_schedule_config
+(coalesced check-in/out alerts; 0 keeps alerts instant).
+
+Run:  python scripts/migrate_alert_digest.py
+"""
+from app.app import create_app
+from app.extensions import db
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        conn = db.engine.raw_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("ALTER TABLE whatsapp_schedule_config "
+                           "ADD COLUMN alert_digest_window_minutes INTEGER NOT NULL DEFAULT 0")
+            print("✅ Added alert_digest_window_minutes to whatsapp_schedule_config table.")
+        except Exception:
+            print("ℹ️  whatsapp_schedule_config.alert_digest_window_minutes already exists.")
+
+        conn.commit()
+        conn.close()
+        print("✅ Migration complete.")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,97 @@
+"""
+Migration: add lookup indexes for the hot attendance / leave / tour / OTP
+queries, and a unique (user_id, date) index on attendance.
+
+Existing duplicate attendance rows for the same user-day are merged into
+the oldest row first (earliest check-in, latest check-out, overtime if
+any duplicate had it) so the unique index can be created.
+
+Run:  python scripts/migrate_attendance_indexes.py
+"""
+from app.app import create_app
+from app.extensions import db
+from sqlalchemy import text
+
+INDEXES = [
+    # (table, index name, columns, unique)
+    ('attendance', 'ix_attendance_user_date', ('user_id', 'date'), True),
+    ('leaves', 'ix_leaves_user_start', ('user_id', 'start_date'), False),
+    ('tours', 'ix_tours_user_start', ('user_id', 'start_date'), False),
+    ('otps', 'ix_otps_user_purpose_used', ('user_id', 'purpose', 'used'), False),
+]
+
+
+def _merge_duplicate_attendance():
+    """Collapse duplicate (user_id, date) attendance rows into one."""
+    dupes = db.session.execute(text("""
+        SELECT user_id, date FROM attendance
+        GROUP BY user_id, date
+        HAVING COUNT(*) > 1
+    """)).fetchall()
+
+    if not dupes:
+        print("  ✅ No duplicate attendance rows")
+        return
+
+    print(f"  ⚠️  Found {len(dupes)} user-day(s) with duplicate attendance rows, merging...")
+    for user_id, day in dupes:
+        rows = db.session.execute(text("""
+            SELECT id, check_in_time, check_out_time, is_overtime FROM attendance
+            WHERE user_id = :user_id AND date = :day
+            ORDER BY id
+        """), {'user_id': user_id, 'day': day}).fetchall()
+
+        keep_id = rows[0][0]
+        check_ins = [r[1] for r in rows if r[1] is not None]
+        check_outs = [r[2] for r in rows if r[2] is not None]
+        db.session.execute(text("""
+            UPDATE attendance
+            SET check_in_time = :check_in, check_out_time = :check_out, is_overtime = :overtime
+            WHERE id = :id
+        """), {
+            'id': keep_id,
+            'check_in': min(check_ins) if check_ins else None,
+            'check_out': max(check_outs) if check_outs else None,
+            'overtime': any(bool(r[3]) for r in rows),
+        })
+        db.session.execute(text("""
+            DELETE FROM attendance
+            WHERE user_id = :user_id AND date = :day AND id <> :id
+        """), {'user_id': user_id, 'day': day, 'id': keep_id})
+
+    db.session.commit()
+    print(f"  ✅ Merged duplicates for {len(dupes)} user-day(s)")
+
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting index migration...")
+
+        inspector = db.inspect(db.engine)
+        tables = inspector.get_table_names()
+
+        for table, name, columns, unique in INDEXES:
+            if table not in tables:
+                print(f"  ℹ️  Table '{table}' does not exist yet — skipping {name}")
+                continue
+
+            existing = {ix['name'] for ix in inspector.get_indexes(table)}
+            if name in existing:
+                print(f"  ℹ️  {name} already exists")
+                continue
+
+            if table == 'attendance' and unique:
+                _merge_duplicate_attendance()
+
+            print(f"  ➕ Creating {'unique ' if unique else ''}index {name} on {table}({', '.join(columns)})...")
+            db.session.execute(text(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})"
+            ))
+            db.session.commit()
+            print(f"  ✅ Created {name}")
+
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,26 @@
+"""
+Migration: create the ``bulk_import_jobs`` table that holds the progress
+and outcome of bulk employee imports (see app/bulk_import.py).
+
+Run:  python scripts/migrate_bulk_import_jobs.py
+"""
+from app.app import create_app
+from app.extensions import db
+from app.models.import_job import BulkImportJob
+
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting bulk import jobs migration...")
+
+        if BulkImportJob.__tablename__ in db.inspect(db.engine).get_table_names():
+            print("  ℹ️  bulk_import_jobs table already exists")
+        else:
+            BulkImportJob.__table__.create(bind=db.engine)
+            print("  ✅ Created bulk_import_jobs table")
+
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
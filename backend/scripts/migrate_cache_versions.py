@@ -0,0 +1,26 @@
+"""
+Migration: create the ``cache_versions`` table whose counters tell every
+process when its cached copy of some data is stale (see app/cache_sync.py).
+
+Run:  python scripts/migrate_cache_versions.py
+"""
+from app.app import create_app
+from app.extensions import db
+from app.models.cache_version import CacheVersion
+
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting cache versions migration...")
+
+        if CacheVersion.__tablename__ in db.inspect(db.engine).get_table_names():
+            print("  ℹ️  cache_versions table already exists")
+        else:
+            CacheVersion.__table__.create(bind=db.engine)
+            print("  ✅ Created cache_versions table")
+
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
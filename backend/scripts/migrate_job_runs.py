@@ -0,0 +1,26 @@
+"""
+Migration: create the ``scheduled_job_runs`` table that records the last
+run of each scheduled WhatsApp job (see app/whatsapp_jobs.py).
+
+Run:  python scripts/migrate_job_runs.py
+"""
+from app.app import create_app
+from app.extensions import db
+from app.models.job_run import ScheduledJobRun
+
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting scheduled job runs migration...")
+
+        if ScheduledJobRun.__tablename__ in db.inspect(db.engine).get_table_names():
+            print("  ℹ️  scheduled_job_runs table already exists")
+        else:
+            ScheduledJobRun.__table__.create(bind=db.engine)
+            print("  ✅ Created scheduled_job_runs table")
+
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,35 @@
+"""
+Migration: add the used_days / pending_days ledger columns to
+leave_balances and fill them from the existing leaves.
+
+Run:  python scripts/migrate_leave_ledger.py
+"""
+from sqlalchemy import text
+
+from app.app import create_app
+from app.extensions import db
+from app.leave_ledger import rebuild_ledger
+
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting leave ledger migration...")
+        columns = {c['name'] for c in db.inspect(db.engine).get_columns('leave_balances')}
+
+        for column in ('used_days', 'pending_days'):
+            if column in columns:
+                print(f"  ℹ️  leave_balances.{column} already exists")
+                continue
+            db.session.execute(text(
+                f"ALTER TABLE leave_balances ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+            ))
+            db.session.commit()
+            print(f"  ✅ Added leave_balances.{column}")
+
+        fixes = rebuild_ledger()
+        print(f"  ✅ Ledger filled from leaves ({len(fixes)} balance row(s) written)")
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
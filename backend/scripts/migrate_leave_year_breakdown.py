@@ -0,0 +1,57 @@
+"""
+Migration: add leaves.year_breakdown (working days per calendar year).
+
+Existing leaves keep charging all their days to start_date's year.  Pass
+--split-existing to also split existing leaves that cross a year
+boundary (using today's holiday / weekend calendar, and only where that
+still matches their stored working_days), then rebuild the ledger.
+
+Run:  python scripts/migrate_leave_year_breakdown.py [--split-existing]
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.app import create_app
+from app.extensions import db
+from app.leave_ledger import rebuild_ledger
+from app.models.leave import Leave
+from app.workdays import working_days_by_year
+
+
+def migrate(split_existing: bool = False):
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting leave year breakdown migration...")
+        columns = {c['name'] for c in db.inspect(db.engine).get_columns('leaves')}
+
+        if 'year_breakdown' in columns:
+            print("  ℹ️  leaves.year_breakdown already exists")
+        else:
+            column_type = 'JSONB' if db.engine.dialect.name == 'postgresql' else 'JSON'
+            db.session.execute(text(f"ALTER TABLE leaves ADD COLUMN year_breakdown {column_type}"))
+            db.session.commit()
+            print("  ✅ Added leaves.year_breakdown")
+
+        if split_existing:
+            split = skipped = 0
+            for leave in Leave.query.filter(Leave.year_breakdown.is_(None)):
+                if leave.start_date.year == leave.end_date.year:
+                    continue
+                by_year = working_days_by_year(leave.start_date, leave.end_date)
+                if sum(by_year.values()) != (leave.working_days or 0):
+                    skipped += 1
+                    continue
+                leave.year_breakdown = {str(y): d for y, d in sorted(by_year.items())}
+                split += 1
+            db.session.commit()
+            print(f"  ✅ Split {split} leave(s) across years ({skipped} left as-is: calendar changed since)")
+            fixes = rebuild_ledger()
+            print(f"  ✅ Ledger rebuilt ({len(fixes)} balance row(s) corrected)")
+
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--split-existing', action='store_true')
+    migrate(parser.parse_args().split_existing)
@@ -0,0 +1,26 @@
+"""
+Migration: create the ``outbox`` table used to queue outbound WhatsApp
+messages and emails (see app/outbox.py).
+
+Run:  python scripts/migrate_outbox.py
+"""
+from app.app import create_app
+from app.extensions import db
+from app.models.outbox import OutboxMessage
+
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting outbox migration...")
+
+        if OutboxMessage.__tablename__ in db.inspect(db.engine).get_table_names():
+            print("  ℹ️  outbox table already exists")
+        else:
+            OutboxMessage.__table__.create(bind=db.engine)
+            print("  ✅ Created outbox table")
+
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,26 @@
+"""
+Migration: create the ``scheduler_leases`` table used to elect the one
+process that runs the schedulers (see app/leader.py).
+
+Run:  python scripts/migrate_scheduler_leases.py
+"""
+from app.app import create_app
+from app.extensions import db
+from app.models.scheduler_lease import SchedulerLease
+
+
+def migrate():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Starting scheduler leases migration...")
+
+        if SchedulerLease.__tablename__ in db.inspect(db.engine).get_table_names():
+            print("  ℹ️  scheduler_leases table already exists")
+        else:
+            SchedulerLease.__table__.create(bind=db.engine)
+            print("  ✅ Created scheduler_leases table")
+
+        print("✅ Migration complete!")
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,130 @@
+"""
+Local stand-in for the Meta Graph API ``/messages`` endpoint.
+
+Accepts template sends, waits a configurable latency, and answers the
+way the real API does — or with a 500 for a configurable fraction of
+requests so retry behaviour can be exercised.  Point the backend at it
+with WHATSAPP_API_BASE_URL:
+
+    python -m scripts.mock_graph_api --port 8089 --latency-ms 150 --fail-rate 0.05
+    WHATSAPP_API_BASE_URL=http://127.0.0.1:8089 WHATSAPP_PHONE_NUMBER_ID=mock \\
+        WHATSAPP_ACCESS_TOKEN=mock flask run
+
+Speaks HTTP/1.1 keep-alive, so connection reuse by the client shows up
+in the numbers.
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockGraphAPI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms: float = 100, fail_rate: float = 0.0, quiet: bool = True):
+        super().__init__(address, _Handler)
+        self.latency = latency_ms / 1000
+        self.fail_rate = fail_rate
+        self.quiet = quiet
+        self.received = 0
+        self.failed = 0
+        self.connections = 0
+        self.accepted: list[dict] = []  # payloads answered with 200
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'received': self.received, 'failed': self.failed, 'connections': self.connections}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def _reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        time.sleep(server.latency)
+
+        if not self.path.endswith("/messages") or not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._reply(400, {"error": {"message": "Invalid request", "code": 100}})
+            return
+
+        with server._lock:
+            server.received += 1
+            fail = random.random() < server.fail_rate
+            if fail:
+                server.failed += 1
+            msg_id = next(server._ids)
+            if not fail:
+                server.accepted.append(payload)
+
+        if fail:
+            self._reply(500, {"error": {"message": "Service temporarily unavailable", "code": 2}})
+            return
+
+        to = payload.get("to", "")
+        self._reply(200, {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": to, "wa_id": to}],
+            "messages": [{"id": f"wamid.mock{msg_id:08d}"}],
+        })
+
+
+def serve_in_background(host: str = "127.0.0.1", port: int = 0, **kwargs) -> MockGraphAPI:
+    """Start a mock server on a daemon thread (port 0 = any free port)."""
+    server = MockGraphAPI((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="mock-graph-api").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=100, help='delay before each response')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of sends answered with HTTP 500')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    server = MockGraphAPI((args.host, args.port), latency_ms=args.latency_ms,
+                          fail_rate=args.fail_rate, quiet=not args.verbose)
+    print(f"📡 Mock Graph API on {server.base_url} "
+          f"(latency {args.latency_ms:.0f} ms, fail rate {args.fail_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Stats: {server.stats()}")
+
+
+if __name__ == '__main__':
+    main()
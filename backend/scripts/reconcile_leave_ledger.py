@@ -0,0 +1,35 @@
+"""
+Rebuild the paid-leave ledger (leave_balances.used_days / pending_days)
+from the leaves table and report every balance that had drifted.
+
+Run:  python scripts/reconcile_leave_ledger.py               # fix all years
+      python scripts/reconcile_leave_ledger.py --year 2026   # one year
+      python scripts/reconcile_leave_ledger.py --dry-run     # report only
+"""
+import argparse
+
+from app.app import create_app
+from app.leave_ledger import rebuild_ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--year', type=int, help='only reconcile this year')
+    parser.add_argument('--dry-run', action='store_true', help='report drift without writing')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        fixes = rebuild_ledger(year=args.year, dry_run=args.dry_run)
+
+    for fix in fixes:
+        before, after = fix['before'], fix['after']
+        print(f"  user {fix['user_id']} / {fix['year']}: "
+              f"used {before['used_days']} → {after['used_days']}, "
+              f"pending {before['pending_days']} → {after['pending_days']}")
+    verb = "would be corrected" if args.dry_run else "corrected"
+    print(f"✅ {len(fixes)} balance(s) {verb}." if fixes else "✅ Ledger matches leaves.")
+
+
+if __name__ == '__main__':
+    main()
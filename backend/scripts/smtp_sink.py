@@ -0,0 +1,163 @@
+"""
+Local SMTP sink — accepts and discards mail so email delivery can be
+measured and tested offline.
+
+Speaks enough ESMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any
+credentials), MAIL, RCPT, DATA, RSET, NOOP, QUIT.  No TLS, so point the
+backend at it with SMTP_USE_TLS=false:
+
+    python -m scripts.smtp_sink --port 8025 --latency-ms 20
+    SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_USER=sink@example.com SMTP_PASS=x \\
+        SMTP_USE_TLS=false flask run
+
+--latency-ms delays every reply, standing in for the network round trips
+of a real server so connection reuse shows up in the numbers.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency_ms: float = 0, reject: set[str] | None = None):
+        super().__init__(address, _Handler)
+        self.latency = latency_ms / 1000
+        self.reject = {a.lower() for a in (reject or ())}  # RCPT answered with 550
+        self.connections = 0
+        self.logins = 0
+        self.messages: list[dict] = []  # {'from', 'to', 'data'}
+        self._open: set = set()
+        self._lock = threading.Lock()
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.server_address[:2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'connections': self.connections, 'logins': self.logins, 'messages': len(self.messages)}
+
+    def drop_connections(self) -> None:
+        """Close every open client connection, as a server's idle timeout would."""
+        with self._lock:
+            open_sockets, self._open = self._open, set()
+        for sock in open_sockets:
+            try:
+                sock.shutdown(2)
+                sock.close()
+            except OSError:
+                pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line: str):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def _read(self) -> str | None:
+        line = self.rfile.readline(65537)
+        return line.decode("utf-8", "replace").rstrip("\r\n") if line else None
+
+    def handle(self):
+        server = self.server
+        with server._lock:
+            server.connections += 1
+            server._open.add(self.request)
+        try:
+            self._session()
+        except OSError:
+            pass
+        finally:
+            with server._lock:
+                server._open.discard(self.request)
+
+    def _session(self):
+        server = self.server
+        mail_from, rcpt_to = None, []
+        self._reply("220 smartattend-sink ESMTP ready")
+        while (line := self._read()) is not None:
+            verb, _, arg = line.partition(" ")
+            verb = verb.upper()
+
+            if verb == "EHLO":
+                self.wfile.write(b"250-smartattend-sink\r\n250-AUTH PLAIN LOGIN\r\n")
+                self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 smartattend-sink")
+            elif verb == "AUTH":
+                method, _, initial = arg.partition(" ")
+                if method.upper() == "LOGIN":
+                    self._reply("334 VXNlcm5hbWU6")
+                    self._read()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self._read()
+                elif not initial:
+                    self._reply("334 ")
+                    self._read()
+                with server._lock:
+                    server.logins += 1
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpt_to = arg.partition(":")[2].strip(" <>"), []
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                address = arg.partition(":")[2].strip(" <>")
+                if address.lower() in server.reject:
+                    self._reply("550 5.1.1 No such user")
+                else:
+                    rcpt_to.append(address)
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data_line := self._read()) is not None and data_line != ".":
+                    lines.append(data_line[1:] if data_line.startswith("..") else data_line)
+                with server._lock:
+                    server.messages.append({'from': mail_from, 'to': rcpt_to, 'data': "\n".join(lines)})
+                mail_from, rcpt_to = None, []
+                self._reply("250 OK queued")
+            elif verb == "RSET":
+                mail_from, rcpt_to = None, []
+                self._reply("250 OK")
+            elif verb == "NOOP":
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+def serve_in_background(host: str = "127.0.0.1", port: int = 0, **kwargs) -> SMTPSink:
+    """Start a sink on a daemon thread (port 0 = any free port)."""
+    server = SMTPSink((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="smtp-sink").start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=0, help='delay before every reply')
+    args = parser.parse_args()
+
+    server = SMTPSink((args.host, args.port), latency_ms=args.latency_ms)
+    host, port = server.address
+    print(f"📭 SMTP sink on {host}:{port} (latency {args.latency_ms:.0f} ms per reply)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Stats: {server.stats()}")
+
+
+if __name__ == '__main__':
+    main()
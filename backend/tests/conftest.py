@@ -2,12 +2,22 @@ import pytest
 from app.app import create_app
 from app.extensions import db
 from app.models import user, attendance, leave, tour
+from app.attendance_board import invalidate_board
+from app.models.whatsapp_schedule import WhatsAppScheduleConfig
+from app.token_auth import clear_auth_cache
+from app.workdays import invalidate_calendar
+from app.reports import invalidate_reports
+from app.presence import invalidate_presence
+from app.cache_sync import reset_cache_sync
 from flask import Flask
+from app import mail, whatsapp
+from app.mail_transport import reset_pool
+from scripts.mock_graph_api import serve_in_background
+from scripts import smtp_sink
 
 @pytest.fixture
 def app():
-    app = create_app()
-    app.config.update({
+    app = create_app({
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",  # In-memory DB
         "SQLALCHEMY_TRACK_MODIFICATIONS": False,
@@ -19,7 +29,44 @@ def app():
         yield app
         db.session.remove()
         db.drop_all()
+        # In-process caches outlive the in-memory DB
+        invalidate_board()
+        WhatsAppScheduleConfig.invalidate_settings()
+        clear_auth_cache()
+        invalidate_calendar()
+        invalidate_reports()
+        invalidate_presence()
+        reset_cache_sync()
 
 @pytest.fixture
 def client(app):
     return app.test_client()
+
+@pytest.fixture
+def graph_api(monkeypatch):
+    """Local mock Graph API, with app.whatsapp configured to send to it."""
+    server = serve_in_background(latency_ms=20)
+    monkeypatch.setattr(whatsapp, "WHATSAPP_PHONE_NUMBER_ID", "test")
+    monkeypatch.setattr(whatsapp, "WHATSAPP_ACCESS_TOKEN", "test")
+    monkeypatch.setattr(whatsapp, "API_URL", f"{server.base_url}/v21.0/test/messages")
+    monkeypatch.setattr(whatsapp, "RETRY_BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(whatsapp, "_session", None)
+    yield server
+    server.shutdown()
+    whatsapp._session = None
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """Local SMTP sink, with app.mail configured to send to it."""
+    server = smtp_sink.serve_in_background()
+    host, port = server.address
+    monkeypatch.setattr(mail, "SMTP_HOST", host)
+    monkeypatch.setattr(mail, "SMTP_PORT", port)
+    monkeypatch.setattr(mail, "SMTP_USER", "sink@example.com")
+    monkeypatch.setattr(mail, "SMTP_PASS", "test")
+    monkeypatch.setattr(mail, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(mail, "REPORT_RECIPIENTS", ["admin@example.com"])
+    reset_pool()
+    yield server
+    reset_pool()
+    server.shutdown()
@@ -0,0 +1,335 @@
+from app.attendance_board import invalidate_board
+from app.extensions import count_queries
+from app.presence import invalidate_presence
+from tests.utils import register_user, login_user
+
+
+def _employees_query_count(client, headers):
+    invalidate_board()  # measure the cold path: users + presence index
+    invalidate_presence()
+    with count_queries() as counter:
+        res = client.get("/admin/employees", headers=headers)
+    assert res.status_code == 200
+    return counter.count, res.get_json()
+
+
+def test_employee_roster_query_count_is_constant(client):
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+
+    register_user(client, "Emp 1", "emp1@test.com", "pass", "employee")
+    emp_token = login_user(client, "emp1@test.com", "pass")
+    client.post("/attendance/check-in", headers={"Authorization": f"Bearer {emp_token}"})
+
+    _employees_query_count(client, admin_headers)  # warm the auth cache
+    small_count, roster = _employees_query_count(client, admin_headers)
+    assert [e["today_status"] for e in roster] == ["checked_in"]
+
+    for i in range(2, 8):
+        register_user(client, f"Emp {i}", f"emp{i}@test.com", "pass", "employee")
+
+    large_count, roster = _employees_query_count(client, admin_headers)
+    assert len(roster) == 7
+    assert large_count == small_count
+
+    # Filters and pagination still apply to users
+    res = client.get("/admin/employees?top=2&orderBy=name&direction=desc", headers=admin_headers)
+    assert [e["name"] for e in res.get_json()] == ["Emp 7", "Emp 6"]
+
+
+def test_presence_index_follows_check_ins_without_queries(client):
+    from app.attendance_board import OVERTIME, CHECKED_OUT
+    from app.presence import get_presence
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    for name in ("Asha", "Bilal", "Chen"):
+        register_user(client, name, f"{name.lower()}@test.com", "pass", "employee")
+    asha, bilal = ({"Authorization": f"Bearer {login_user(client, f'{n}@test.com', 'pass')}"}
+                   for n in ("asha", "bilal"))
+
+    res = client.get("/admin/presence", headers=admin_headers)
+    assert res.get_json() == {"absent": 3, "online": 0, "overtime": 0, "checked_out": 0,
+                              "present": 0, "total": 3}
+    client.get("/admin/employees", headers=admin_headers)  # warm the auth cache
+
+    with count_queries() as counter:
+        index = get_presence()
+    assert counter.count == 0
+
+    # Check-ins, check-outs and overtime toggles update it in place
+    client.post("/attendance/check-in", headers=asha)
+    client.post("/attendance/check-in", headers=bilal)
+    client.post("/attendance/overtime", headers=bilal)
+    client.post("/attendance/check-out", headers=asha)
+    with count_queries() as counter:
+        assert get_presence() is index
+        assert index.counts() == {"absent": 1, "online": 0, "overtime": 1, "checked_out": 1}
+        assert [r.name for r in index.records(OVERTIME, CHECKED_OUT)] == ["Asha", "Bilal"]
+        roster = client.get("/admin/employees", headers=admin_headers).get_json()
+    assert counter.count == 1  # the users query only
+    assert {e["name"]: e["today_status"] for e in roster} == {
+        "Asha": "checked_out", "Bilal": "checked_in", "Chen": "absent"}
+
+    # A new employee means a rebuild
+    register_user(client, "Dev", "dev@test.com", "pass", "employee")
+    assert get_presence() is not index
+    assert get_presence().count("absent") == 2
+
+
+def test_admin_analytics_punctuality_and_absence(client, app):
+    from datetime import date, datetime
+    from app.extensions import db
+    from app.models.attendance import Attendance
+    from app.models.user import User
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    register_user(client, "Emp", "emp@test.com", "pass", "employee")
+    emp = User.query.filter_by(email="emp@test.com").first()
+    emp.created_at = datetime(2026, 1, 1)
+
+    # Mon 2 – Sat 7 Mar 2026 (Sunday is the default weekend); office starts 10:00 IST = 04:30 UTC
+    db.session.add_all([
+        Attendance(user_id=emp.id, date=date(2026, 3, 2),
+                   check_in_time=datetime(2026, 3, 2, 4, 30), check_out_time=datetime(2026, 3, 2, 12, 30)),
+        Attendance(user_id=emp.id, date=date(2026, 3, 3),
+                   check_in_time=datetime(2026, 3, 3, 5, 0), check_out_time=datetime(2026, 3, 3, 15, 0)),
+        Attendance(user_id=emp.id, date=date(2026, 3, 4),
+                   check_in_time=datetime(2026, 3, 4, 4, 40), check_out_time=datetime(2026, 3, 4, 13, 40)),
+    ])
+    db.session.commit()
+
+    res = client.get("/admin/analytics?from=2026-03-02&to=2026-03-07", headers=admin_headers)
+    assert res.status_code == 200
+    [row] = res.get_json()["employees"]
+    assert row["working_days"] == 6
+    assert row["days_present"] == 3
+    assert row["absent_days"] == 3
+    assert row["late_arrivals"] == 2
+    assert row["avg_hours"] == 9.0
+
+    lenient = client.get("/admin/analytics?from=2026-03-02&to=2026-03-07&grace_minutes=15",
+                         headers=admin_headers).get_json()
+    assert lenient["employees"][0]["late_arrivals"] == 1
+    assert lenient["organisation"]["punctuality"] == round(2 / 3, 4)
+
+
+def test_export_attendance_csv_and_xlsx(client, app):
+    import csv
+    import io
+    import zipfile
+    from datetime import date, datetime
+    from app.extensions import db
+    from app.models.attendance import Attendance
+    from app.models.user import User
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    register_user(client, "Emp <&>", "emp@test.com", "pass", "employee")
+    emp = User.query.filter_by(email="emp@test.com").first()
+    db.session.add_all([
+        Attendance(user_id=emp.id, date=date(2026, 3, d),
+                   check_in_time=datetime(2026, 3, d, 4, 30), check_out_time=datetime(2026, 3, d, 12, 30))
+        for d in range(1, 11)
+    ])
+    db.session.commit()
+
+    res = client.get("/admin/export/attendance?from=2026-03-03&to=2026-03-05&orderBy=date&direction=desc",
+                     headers=admin_headers)
+    assert res.status_code == 200
+    assert res.is_streamed
+    rows = list(csv.reader(io.StringIO(res.get_data(as_text=True).lstrip("﻿"))))
+    assert rows[0][:4] == ["id", "employee", "email", "date"]
+    assert [r[3] for r in rows[1:]] == ["2026-03-05", "2026-03-04", "2026-03-03"]
+    assert rows[1][4:7] == ["2026-03-05 10:00", "2026-03-05 18:00", "8.0"]  # office-local times
+
+    res = client.get("/admin/export/attendance?format=xlsx", headers=admin_headers)
+    assert res.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(res.get_data())) as xlsx:
+        assert xlsx.testzip() is None
+        sheet = xlsx.read("xl/worksheets/sheet1.xml").decode()
+    assert sheet.count("<row>") == 11
+    assert "Emp &lt;&amp;&gt;" in sheet
+
+    assert client.get("/admin/export/payroll", headers=admin_headers).status_code == 404
+    assert client.get("/admin/export/leaves?format=pdf", headers=admin_headers).status_code == 400
+
+
+def test_bulk_upload_runs_as_background_job(client, app, monkeypatch):
+    import io
+    from app import bulk_import
+    from app.bulk_import import get_job
+    from app.cache import TTLCache
+    from app.models.cache_version import CacheVersion
+    from app.models.user import User
+    from app.presence import get_presence
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    register_user(client, "Existing", "existing@test.com", "pass", "employee")
+    assert get_presence().count("absent") == 1
+    users_version = CacheVersion.current().get("users", 0)
+
+    csv_body = (
+        "name,email,password,role\n"
+        "New One,new1@test.com,pw1,employee\n"
+        "Existing,existing@test.com,pw2,employee\n"
+        "No Password,nopw@test.com,,employee\n"
+        "New Two,new2@test.com,pw3,admin\n"
+        "Twice,new1@test.com,pw4,employee\n"
+    )
+    res = client.post("/admin/employees/bulk-upload", headers=admin_headers,
+                      data={"file": (io.BytesIO(csv_body.encode()), "staff.csv")},
+                      content_type="multipart/form-data")
+    assert res.status_code == 202
+    job_id = res.get_json()["job_id"]
+    assert get_job(job_id).wait(timeout=60)
+
+    # Progress is read from the DB, not from the worker that ran the job
+    monkeypatch.setattr(bulk_import, "_jobs", TTLCache(maxsize=1, ttl=60))
+    status = client.get(f"/admin/employees/bulk-upload/{job_id}", headers=admin_headers).get_json()
+    assert status["status"] == "done"
+    assert status["processed"] == status["total"] == 5
+    summary = status["result"]["summary"]
+    assert (summary["created"], summary["skipped"], summary["errors"]) == (2, 2, 1)
+
+    # The bulk INSERTs reach this process's presence index and other processes' caches
+    assert get_presence().count("absent") == 2
+    assert CacheVersion.current()["users"] > users_version
+
+    # Hashed passwords work for login
+    assert login_user(client, "new2@test.com", "pw3")
+    assert User.query.filter_by(email="new2@test.com").one().role == "admin"
+
+    assert client.get("/admin/employees/bulk-upload/nope", headers=admin_headers).status_code == 404
+
+
+def test_leave_balances_for_all_employees_in_one_query(client):
+    from app.models.leave_balance import LeaveBalance
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    for i in range(1, 4):
+        register_user(client, f"Emp {i}", f"emp{i}@test.com", "pass", "employee")
+    emp_headers = {"Authorization": f"Bearer {login_user(client, 'emp2@test.com', 'pass')}"}
+    client.post("/request/leave/apply", headers=emp_headers, json={
+        "start_date": "2025-06-24", "end_date": "2025-06-25", "reason": "Trip"})
+    client.patch("/admin/leave-balance/4", headers=admin_headers, json={"year": 2025, "total_leaves": 25})
+    rows_before = LeaveBalance.query.count()
+
+    client.get("/admin/leave-balances?year=2025", headers=admin_headers)  # warm the auth cache
+    with count_queries() as counter:
+        res = client.get("/admin/leave-balances?year=2025&orderBy=name", headers=admin_headers)
+    assert res.status_code == 200
+    assert counter.count == 1
+    assert [(b["name"], b["total"], b["used"], b["pending"], b["available"]) for b in res.get_json()] == [
+        ("Emp 1", 21, 0, 0, 21),
+        ("Emp 2", 21, 0, 2, 19),
+        ("Emp 3", 25, 0, 0, 25),
+    ]
+    assert LeaveBalance.query.count() == rows_before  # defaults are not written on read
+
+    res = client.get("/admin/leave-balances?year=2024&search=Emp 3", headers=admin_headers)
+    assert [(b["name"], b["total"]) for b in res.get_json()] == [("Emp 3", 21)]
+
+
+def test_daily_report_preview_renders_from_compiled_templates(client):
+    from app.email_templates import env
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    token = login_user(client, "admin@test.com", "pass")
+    assert "No employees found" in client.get(f"/admin/preview-daily-report?token={token}").get_data(as_text=True)
+    invalidate_board()
+
+    register_user(client, "Emp <One>", "emp1@test.com", "pass", "employee")
+    register_user(client, "Emp Two", "emp2@test.com", "pass", "employee")
+    emp_headers = {"Authorization": f"Bearer {login_user(client, 'emp2@test.com', 'pass')}"}
+    client.post("/attendance/check-in", headers=emp_headers)
+
+    # Every template was compiled by create_app, not on first use
+    assert {name for _loader, name in env.cache} == set(env.list_templates())
+    res = client.get(f"/admin/preview-daily-report?token={token}")
+    assert res.status_code == 200
+    html = res.get_data(as_text=True)
+    assert "Emp &lt;One&gt;" in html  # names are escaped
+    assert html.count(">Absent</span>") == 1 and html.count(">Present</span>") == 1
+    assert "No employees found" not in html
+
+
+def test_past_daily_and_weekly_reports_cost_the_same_queries_at_any_headcount(client):
+    import re
+    from datetime import date, datetime
+    from app.extensions import db
+    from app.models.attendance import Attendance
+    from app.models.user import User
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    token = login_user(client, "admin@test.com", "pass")
+    register_user(client, "Emp One", "emp1@test.com", "pass", "employee")
+    register_user(client, "Emp Two", "emp2@test.com", "pass", "employee")
+    User.query.update({User.created_at: datetime(2026, 1, 1)})
+    emp1 = User.query.filter_by(email="emp1@test.com").one()
+    db.session.add_all([
+        # Mon 9 Feb: 10:30 IST (late), Tue 10 Feb: 9:30 IST — 8 h each
+        Attendance(user_id=emp1.id, date=date(2026, 2, 9),
+                   check_in_time=datetime(2026, 2, 9, 5, 0), check_out_time=datetime(2026, 2, 9, 13, 0)),
+        Attendance(user_id=emp1.id, date=date(2026, 2, 10),
+                   check_in_time=datetime(2026, 2, 10, 4, 0), check_out_time=datetime(2026, 2, 10, 12, 0)),
+    ])
+    db.session.commit()
+
+    def preview(query):
+        res = client.get(f"/admin/preview-daily-report?token={token}&{query}")
+        return res.status_code, res.get_data(as_text=True)
+
+    def cells(html, name):
+        row = html[html.index(name):]
+        return re.findall(r">([^<]*)</td>", row[:row.index("</tr>")])[:5]
+
+    status, html = preview("date=2026-02-09")
+    assert status == 200 and "Monday, February 09, 2026" in html
+    assert re.search(r">1</div>\s*<div[^>]*>Late<", html)
+    assert re.search(r">8\.0</div>\s*<div[^>]*>Avg Hours<", html)
+
+    status, html = preview("date=2026-02-11&period=weekly")
+    assert status == 200 and "Feb 09 – Feb 15, 2026" in html
+    assert cells(html, "Emp One") == ["2", "4", "1", "8.0", "16.0"]  # present, absent, late, avg, total
+    assert cells(html, "Emp Two")[:3] == ["0", "6", "0"]  # Mon–Sat are working days
+
+    def report_queries(query):
+        invalidate_board()
+        with count_queries() as counter:
+            assert preview(query)[0] == 200
+        return counter.count
+
+    before = {q: report_queries(q) for q in ("date=2026-02-09", "date=2026-02-11&period=weekly",
+                                             "date=2026-02-11&period=monthly")}
+    for i in range(3, 13):
+        register_user(client, f"Emp {i}", f"emp{i}@test.com", "pass", "employee")
+    assert {q: report_queries(q) for q in before} == before
+
+    assert preview("date=2999-01-01")[0] == 400
+    assert preview("period=yearly")[0] == 400
+
+
+def test_report_preview_is_cached_with_etag_until_attendance_changes(client):
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    token = login_user(client, "admin@test.com", "pass")
+    register_user(client, "Emp", "emp@test.com", "pass", "employee")
+    emp_headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+    today_url = f"/admin/preview-daily-report?token={token}"
+    past_url = f"{today_url}&date=2026-02-11&period=weekly"
+
+    first, past = client.get(today_url), client.get(past_url)
+    assert first.status_code == past.status_code == 200 and first.headers["ETag"]
+    with count_queries() as counter:
+        again = client.get(today_url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and counter.count == 0
+
+    client.post("/attendance/check-in", headers=emp_headers)
+    fresh = client.get(today_url, headers={"If-None-Match": first.headers["ETag"]})
+    assert fresh.status_code == 200 and fresh.headers["ETag"] != first.headers["ETag"]
+    assert ">Present</span>" in fresh.get_data(as_text=True)
+    # A check-in today doesn't touch a past week's report
+    assert client.get(past_url, headers={"If-None-Match": past.headers["ETag"]}).status_code == 304
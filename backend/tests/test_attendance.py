@@ -10,3 +10,250 @@ def test_check_in_and_out(client):
 
     res_out = client.post("/attendance/check-out", headers=headers)
     assert res_out.status_code == 200
+
+
+def test_attendance_board_tracks_check_in_out_and_overtime(client):
+    from app.attendance_board import get_board
+    from app.extensions import count_queries
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    register_user(client, "Other", "other@test.com", "pass")
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+
+    board = get_board()
+    assert [e.name for e in board.absent] == ["Emp", "Other"]
+    with count_queries() as counter:
+        assert get_board() is board  # cached
+    assert counter.count == 0
+
+    client.post("/attendance/check-in", headers=headers)
+    assert [e.name for e in get_board().still_online] == ["Emp"]
+
+    client.post("/attendance/overtime", headers=headers)
+    assert [e.name for e in get_board().overtime] == ["Emp"]
+
+    client.post("/attendance/check-out", headers=headers)
+    board = get_board()
+    assert [e.name for e in board.checked_out] == ["Emp"]
+    assert [e.name for e in board.absent] == ["Other"]
+
+
+def test_concurrent_check_ins_create_one_row_per_user_day(tmp_path):
+    """Hundreds of simultaneous taps must still leave exactly one row per user-day."""
+    from concurrent.futures import ThreadPoolExecutor
+    import jwt
+    from app.app import create_app
+    from app.extensions import db
+    from app.models.attendance import Attendance
+    from app.models.user import User
+    from app.models.whatsapp_schedule import WhatsAppScheduleConfig
+    from app.token_auth import SECRET_KEY
+
+    # File-backed DB so each request thread gets its own connection
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'concurrency.db'}",
+        "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 30}},
+    })
+    users, taps_per_user = 20, 15
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(WhatsAppScheduleConfig())
+        db.session.add_all([
+            User(name=f"Emp {i}", email=f"emp{i}@test.com", password_hash="x")
+            for i in range(users)
+        ])
+        db.session.commit()
+        tokens = [
+            jwt.encode({"user_id": u.id}, SECRET_KEY, algorithm="HS256")
+            for u in User.query.all()
+        ]
+
+    def tap(token):
+        client = app.test_client()
+        return client.post("/attendance/check-in", headers={"Authorization": f"Bearer {token}"}).status_code
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        statuses = list(pool.map(tap, tokens * taps_per_user))
+
+    assert statuses.count(200) == users
+    assert statuses.count(400) == users * (taps_per_user - 1)
+
+    with app.app_context():
+        rows = db.session.query(Attendance.user_id, Attendance.date).all()
+        assert len(rows) == users
+        assert len(set(rows)) == users
+        db.drop_all()
+
+
+def test_attendance_history_pagination_and_etag(client):
+    from datetime import date, datetime, timedelta
+    from app.extensions import db
+    from app.models.attendance import Attendance
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+    for i in range(5):
+        day = date(2026, 3, 1) + timedelta(days=i)
+        db.session.add(Attendance(user_id=1, date=day, check_in_time=datetime(2026, 3, 1 + i, 4, 30)))
+    db.session.commit()
+
+    full = client.get("/attendance/history", headers=headers)
+    assert [h["date"] for h in full.get_json()["history"]][0] == "2026-03-05"
+    assert len(full.get_json()["history"]) == 5
+
+    page1 = client.get("/attendance/history?limit=2", headers=headers).get_json()
+    assert [h["date"] for h in page1["history"]] == ["2026-03-05", "2026-03-04"]
+    page2 = client.get(f"/attendance/history?limit=2&cursor={page1['next_cursor']}", headers=headers).get_json()
+    assert [h["date"] for h in page2["history"]] == ["2026-03-03", "2026-03-02"]
+
+    bounded = client.get("/attendance/history?from=2026-03-02&to=2026-03-03", headers=headers).get_json()
+    assert len(bounded["history"]) == 2 and bounded["next_cursor"] is None
+
+    etag = full.headers["ETag"]
+    not_modified = client.get("/attendance/history", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+
+    assert client.get("/attendance/history?from=March", headers=headers).status_code == 400
+
+
+def test_range_hours_buckets_are_summed_in_sql(client):
+    from datetime import date, datetime, timedelta
+    from app.extensions import db
+    from app.models.attendance import Attendance
+    from app.office_config import office_today
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+    # Sun 29 Mar, Mon 30 Mar, Tue 31 Mar, Wed 1 Apr 2026; the last one never checked out
+    for day, hours in ((29, 8), (30, 9), (31, 7.5)):
+        db.session.add(Attendance(
+            user_id=1, date=date(2026, 3, day),
+            check_in_time=datetime(2026, 3, day, 4, 0),
+            check_out_time=datetime(2026, 3, day, 4, 0) + timedelta(hours=hours),
+        ))
+    db.session.add(Attendance(user_id=1, date=date(2026, 4, 1), check_in_time=datetime(2026, 4, 1, 4, 0)))
+    db.session.commit()
+
+    weekly = client.get("/attendance/hours?from=2026-03-29&to=2026-04-05&bucket=week", headers=headers).get_json()
+    assert [(b["start"], b["hours"], b["days_present"]) for b in weekly["buckets"]] == [
+        ("2026-03-23", 8.0, 1),
+        ("2026-03-30", 16.5, 3),  # the open past day counts as present but adds no hours
+    ]
+
+    monthly = client.get("/attendance/hours?from=2026-03-01&to=2026-04-30&bucket=month", headers=headers).get_json()
+    assert [(b["start"], b["hours"]) for b in monthly["buckets"]] == [("2026-03-01", 24.5), ("2026-04-01", 0.0)]
+    assert monthly["total_hours"] == 24.5
+
+    assert client.get("/attendance/hours?bucket=year", headers=headers).status_code == 400
+
+    # Still checked in today — counted up to now
+    client.post("/attendance/check-in", headers=headers, json={"time": "00:00"})
+    today = office_today().isoformat()
+    daily = client.get(f"/attendance/hours?from={today}&to={today}", headers=headers).get_json()
+    assert daily["total_hours"] > 0
+
+
+
+def _open_stream(address, path, last_event_id=None, headers=None):
+    import socket
+
+    sock = socket.create_connection(address, timeout=5)
+    extra = f"Last-Event-ID: {last_event_id}\r\n" if last_event_id else ""
+    extra += "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: test\r\n{extra}\r\n".encode())
+    return sock
+
+
+def _read_until(sock, marker: bytes, buf: bytes = b"") -> bytes:
+    while marker not in buf:
+        chunk = sock.recv(4096)
+        assert chunk, f"stream closed before {marker!r}: {buf!r}"
+        buf += chunk
+    return buf
+
+
+def _events(stream: bytes) -> list[tuple[str, dict]]:
+    import json
+
+    events = []
+    for frame in stream.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines() if ": " in line)
+        if fields.get("event") == "attendance":
+            events.append((fields["id"], json.loads(fields["data"])))
+    return events
+
+
+def test_event_stream_pushes_attendance_deltas_to_admins(client, app, monkeypatch):
+    from app import event_stream
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    emp_token = login_user(client, "emp@test.com", "pass")
+    emp_headers = {"Authorization": f"Bearer {emp_token}"}
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+
+    def path():
+        # A fresh one-time ticket per connection, as the dashboard does
+        res = client.post("/admin/event-stream/ticket", headers=admin_headers)
+        return f"{event_stream.STREAM_PATH}?ticket={res.get_json()['ticket']}"
+
+    assert client.post("/admin/event-stream/ticket", headers=emp_headers).status_code == 403
+    monkeypatch.setattr(event_stream, "EVENT_STREAM_ALLOWED_ORIGINS", frozenset({"http://localhost:5173"}))
+    server = event_stream.EventStreamServer(app, host="127.0.0.1", port=0,
+                                            max_subscribers=1, heartbeat_seconds=0.2)
+    assert server.start()
+    monkeypatch.setattr(event_stream, "_server", server)
+    try:
+        # Admins only; the long-lived token is no longer accepted in the URL
+        for bad in ("", f"?token={emp_token}", f"?token={admin_headers['Authorization'][7:]}"):
+            with _open_stream(server.address, event_stream.STREAM_PATH + bad) as sock:
+                assert b" 401 " in _read_until(sock, b"\r\n\r\n")
+
+        # A ticket opens one stream, and is no good as an API token
+        used = path()
+        assert client.get("/attendance/status",
+                          headers={"Authorization": f"Bearer {used.split('=', 1)[1]}"}).status_code == 401
+        with _open_stream(server.address, used, headers={"Origin": "https://evil.example"}) as sock:
+            head = _read_until(sock, b"retry:")
+            assert b" 200 " in head and b"Access-Control-Allow-Origin" not in head
+        with _open_stream(server.address, used) as sock:
+            assert b" 401 " in _read_until(sock, b"\r\n\r\n")
+
+        with _open_stream(server.address, path(), headers={"Origin": "http://localhost:5173"}) as sock:
+            stream = _read_until(sock, b"retry:")
+            assert b"text/event-stream" in stream
+            assert b"Access-Control-Allow-Origin: http://localhost:5173\r\n" in stream
+
+            # Streams don't hold gunicorn threads, but are still capped
+            with _open_stream(server.address, path()) as extra:
+                assert b" 503 " in _read_until(extra, b"\r\n\r\n")
+            with _open_stream(server.address, event_stream.STATS_PATH, headers=admin_headers) as stats:
+                assert b'"subscribers": 1' in _read_until(stats, b"}")
+
+            client.post("/attendance/check-in", headers=emp_headers)
+            client.post("/attendance/overtime", headers=emp_headers)
+            client.post("/attendance/check-out", headers=emp_headers)
+            stream = _read_until(sock, b'"type": "check_out"', stream)
+            stream = _read_until(sock, b": ping", stream)   # heartbeat while idle
+
+        events = _events(stream)
+        assert [(e["type"], e["name"], e["today_status"], e["is_overtime"]) for _, e in events] == [
+            ("check_in", "Emp", "checked_in", False),
+            ("overtime", "Emp", "checked_in", True),
+            ("check_out", "Emp", "checked_out", False),
+        ]
+        assert events[2][1]["check_out_time"].endswith("Z")
+
+        # A reconnecting client gets only what it missed …
+        with _open_stream(server.address, path(), last_event_id=events[0][0]) as sock:
+            stream = _read_until(sock, b'"type": "check_out"')
+        assert [e["type"] for _, e in _events(stream)] == ["overtime", "check_out"]
+
+        # … or is told to re-pull the roster if its id is from another run
+        with _open_stream(server.address, path(), last_event_id="0-1") as sock:
+            assert b"event: resync" in _read_until(sock, b"event: resync")
+    finally:
+        server.stop(timeout=5)
@@ -4,3 +4,60 @@ def test_register_and_login(client):
     register_user(client, "Admin", "admin@test.com", "pass", "admin")
     token = login_user(client, "admin@test.com", "pass")
     assert token is not None
+
+
+def test_token_auth_is_cached_and_invalidated_on_profile_change(client):
+    from app.extensions import count_queries
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+
+    client.get("/attendance/status", headers=headers)  # warm the cache
+    with count_queries() as counter:
+        res = client.post("/auth/request-otp", headers=headers)
+    assert res.status_code == 503  # SMTP not configured — but auth cost nothing
+    assert counter.count == 0
+
+    client.patch("/auth/profile", headers=headers, json={"name": "Renamed"})
+    assert client.get("/auth/profile", headers=headers).get_json()["name"] == "Renamed"
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    stats = client.get("/admin/auth-cache/stats", headers=admin_headers).get_json()
+    assert stats["tokens"]["hits"] > 0
+
+    client.delete("/admin/employees/1", headers=admin_headers)
+    assert client.get("/attendance/status", headers=headers).status_code == 401
+
+
+def test_user_changes_committed_by_another_process_reach_the_auth_cache(client, app):
+    from app import cache_sync
+    from app.extensions import db
+    from app.models.cache_version import CacheVersion
+    from app.models.user import User
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    assert client.get("/admin/auth-cache/stats", headers=headers).status_code == 200
+    cache_sync.sync()  # baseline
+
+    # What another worker's demotion looks like from here: a committed
+    # row change, no local session hook
+    with db.engine.begin() as conn:
+        conn.execute(db.update(User).where(User.email == "admin@test.com").values(role="employee"))
+        CacheVersion.bump(conn, "users")
+    assert client.get("/admin/auth-cache/stats", headers=headers).status_code == 200  # still cached
+
+    assert cache_sync.sync() == ["users"]
+    assert client.get("/admin/auth-cache/stats", headers=headers).status_code == 403
+    assert cache_sync.sync() == []
+
+
+def test_forgot_password_otp_email_is_sent_directly_not_stored(client, app, smtp_server):
+    from app.models.outbox import OutboxMessage
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    res = client.post("/auth/forgot-password", json={"email": "emp@test.com"})
+    assert res.status_code == 200
+    assert smtp_server.messages[0]["to"] == ["emp@test.com"]
+    assert OutboxMessage.query.count() == 0  # the code never sits in the outbox
@@ -0,0 +1,78 @@
+from app.leader import LeaderElector
+
+
+def test_one_leader_at_a_time_and_handover(app):
+    events = []
+
+    def elector(tag):
+        return LeaderElector(app, on_elected=lambda: events.append(f"{tag} elected"),
+                             on_demoted=lambda: events.append(f"{tag} demoted"), ttl_seconds=60)
+
+    first, second = elector("first"), elector("second")
+    assert first.tick()
+    assert not second.tick()
+    assert first.tick()          # renewal keeps the lease
+    assert events == ["first elected"]
+
+    # A clean shutdown hands over without waiting for the lease to lapse
+    first.stop()
+    assert second.tick()
+    assert not first.tick()
+    assert events == ["first elected", "first demoted", "second elected"]
+
+
+def test_forked_worker_drops_the_parents_pool_and_lease(app):
+    import os
+    from app import app as app_module, leader
+    from app.extensions import db
+
+    elector = LeaderElector(app, on_elected=lambda: None, on_demoted=lambda: None)
+    with app_module.app.app_context():
+        parent_pool = db.engine.pool
+    previous, leader._elector = leader._elector, elector
+    try:
+        pid = os.fork()
+        if pid == 0:  # the "worker": its own pool, no elector to release on exit
+            with app_module.app.app_context():
+                ok = db.engine.pool is not parent_pool and leader._elector is None
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+    finally:
+        leader._elector = previous
+    assert os.waitstatus_to_exitcode(status) == 0
+    with app_module.app.app_context():
+        assert db.engine.pool is parent_pool
+
+
+def test_changes_committed_by_another_process_reach_this_ones_caches(app):
+    from datetime import date
+    from app import cache_sync
+    from app.extensions import db
+    from app.models.cache_version import CacheVersion
+    from app.models.holiday import Holiday
+    from app.models.user import User
+    from app.models.whatsapp_schedule import WhatsAppScheduleConfig
+    from app.presence import get_presence
+    from app.workdays import is_working_day
+
+    day = date(2026, 3, 10)  # a Tuesday
+    assert is_working_day(day)
+    assert WhatsAppScheduleConfig.get_settings().reminder_time == "10:30"
+    assert len(get_presence()) == 0
+    cache_sync.sync()  # baseline
+
+    # Another worker's commits: rows plus version bumps, no local session hooks
+    with db.engine.begin() as conn:
+        conn.execute(db.insert(Holiday).values(date=day, name="Holi"))
+        conn.execute(db.update(WhatsAppScheduleConfig).values(reminder_time="09:45"))
+        conn.execute(db.insert(User).values(name="Emp", email="emp@test.com", password_hash="x",
+                                            role="employee", notify_reminder=True,
+                                            notify_checkout=True, notify_midnight=True))
+        for name in ("calendar", "whatsapp_schedule", "users"):
+            CacheVersion.bump(conn, name)
+    assert is_working_day(day)  # still cached
+
+    assert sorted(cache_sync.sync()) == ["calendar", "users", "whatsapp_schedule"]
+    assert not is_working_day(day)
+    assert WhatsAppScheduleConfig.get_settings().reminder_time == "09:45"
+    assert [r.name for r in get_presence().records("absent")] == ["Emp"]
@@ -34,3 +34,112 @@ def test_leave_and_tour(client):
     # Admin rejects tour ID 1
     res_reject = client.patch("/request/tour/1/status", headers=admin_headers, json={"status": "rejected"})
     assert res_reject.status_code == 200
+
+
+def test_working_day_calendar_matches_day_by_day_count(app):
+    from datetime import date, timedelta
+    from app.extensions import db
+    from app.models.holiday import Holiday
+    from app.models.weekend_config import WeekendConfig
+    from app.workdays import count_working_days
+
+    def brute_force(start, end):
+        weekend = WeekendConfig.get_current().get_weekend_set()
+        holidays = {h.date for h in Holiday.query.all()}
+        days = (start + timedelta(n) for n in range((end - start).days + 1))
+        return sum(1 for d in days if d.weekday() not in weekend and d not in holidays)
+
+    db.session.add_all([Holiday(date=date(2025, 12, 25), name="Christmas"),
+                        Holiday(date=date(2026, 1, 26), name="Republic Day")])
+    db.session.commit()
+    ranges = [(date(2025, 12, 20), date(2026, 1, 31)), (date(2024, 2, 29), date(2031, 3, 1)),
+              (date(2026, 1, 26), date(2026, 1, 26)), (date(2026, 2, 1), date(2026, 1, 1))]
+    for start, end in ranges:
+        assert count_working_days(start, end) == (brute_force(start, end) if start <= end else 0)
+
+    # Committed holiday / weekend changes are picked up despite the cache
+    holiday = Holiday.query.filter_by(name="Christmas").one()
+    holiday.date = date(2026, 12, 25)
+    WeekendConfig.get_current().weekend_days = "5,6"
+    db.session.commit()
+    for start, end in ranges[:2]:
+        assert count_working_days(start, end) == brute_force(start, end)
+
+
+def test_leave_balance_ledger_follows_status_and_reconciles(client):
+    from app.extensions import db
+    from app.leave_ledger import rebuild_ledger
+    from app.models.leave_balance import LeaveBalance
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    emp_headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+
+    def balance():
+        res = client.get("/request/leave/balance?year=2025", headers=emp_headers).get_json()
+        return res["used"], res["pending"], res["available"]
+
+    assert balance() == (0, 0, 21)
+    assert LeaveBalance.query.count() == 0  # reading does not create rows
+
+    # Tue 24 – Wed 25 June 2025: two working days
+    client.post("/request/leave/apply", headers=emp_headers, json={
+        "start_date": "2025-06-24", "end_date": "2025-06-25", "reason": "Trip"})
+    client.post("/request/leave/apply", headers=emp_headers, json={
+        "start_date": "2025-07-01", "end_date": "2025-07-01", "leave_type": "unpaid"})
+    assert balance() == (0, 2, 19)
+
+    client.patch("/request/leave/1/status", headers=admin_headers, json={"status": "approved"})
+    assert balance() == (2, 0, 19)
+    client.patch("/request/leave/1/status", headers=admin_headers, json={"status": "approved"})
+    assert balance() == (2, 0, 19)
+    client.patch("/request/leave/1/status", headers=admin_headers, json={"status": "rejected"})
+    assert balance() == (0, 0, 21)
+    client.patch("/request/leave/1/status", headers=admin_headers, json={"status": "approved"})
+
+    admin_view = client.get("/admin/leave-balance/1?year=2025", headers=admin_headers).get_json()
+    assert (admin_view["used"], admin_view["pending"]) == (2, 0)
+
+    # Drift is reported and repaired from the leaves table
+    LeaveBalance.query.filter_by(user_id=1, year=2025).update({"used_days": 7, "pending_days": 3})
+    db.session.commit()
+    fixes = rebuild_ledger()
+    assert [(f["before"], f["after"]) for f in fixes] == [
+        ({"used_days": 7, "pending_days": 3}, {"used_days": 2, "pending_days": 0})]
+    assert balance() == (2, 0, 19)
+    assert rebuild_ledger() == []
+
+
+def test_leave_across_new_year_is_split_and_previewed(client):
+    from app.extensions import count_queries
+
+    register_user(client, "Emp", "emp@test.com", "pass")
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    emp_headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    client.patch("/admin/leave-balance/1", headers=admin_headers, json={"year": 2026, "total_leaves": 1})
+
+    # Mon 29 Dec 2025 – Fri 2 Jan 2026: three days in 2025, two in 2026
+    dates = {"start_date": "2025-12-29", "end_date": "2026-01-02"}
+    client.get("/request/leave/preview", headers=emp_headers, query_string=dates)  # warm caches
+    with count_queries() as counter:
+        preview = client.get("/request/leave/preview", headers=emp_headers, query_string=dates).get_json()
+    assert counter.count == 1
+    assert preview["working_days"] == 5
+    assert preview["breakdown"] == [{"year": 2025, "working_days": 3, "available": 21},
+                                    {"year": 2026, "working_days": 2, "available": 1}]
+    assert not preview["ok"] and "2026: requested 2 day(s), available 1 day(s)" in preview["error"]
+
+    res = client.post("/request/leave/apply", headers=emp_headers, json={**dates, "reason": "Break"})
+    assert res.status_code == 400
+    assert res.get_json()["balance"]["year"] == 2026
+
+    client.patch("/admin/leave-balance/1", headers=admin_headers, json={"year": 2026, "total_leaves": 5})
+    res = client.post("/request/leave/apply", headers=emp_headers, json={**dates, "reason": "Break"})
+    assert res.status_code == 201
+    client.patch("/request/leave/1/status", headers=admin_headers, json={"status": "approved"})
+
+    def used(year):
+        return client.get(f"/request/leave/balance?year={year}", headers=emp_headers).get_json()["used"]
+    assert (used(2025), used(2026)) == (3, 2)
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+
+from app import outbox
+from app.extensions import db
+from app.models.outbox import OutboxMessage
+from app.models.whatsapp_config import WhatsAppConfig
+from tests.utils import register_user, login_user
+
+
+def test_enqueue_dedups_and_retries_with_backoff(app):
+    calls = []
+
+    @outbox.handler("test_flaky")
+    def _flaky(payloads):
+        calls.append(payloads)
+        return ["boom" if len(calls) == 1 else None for _ in payloads]
+
+    outbox.enqueue("test_flaky", {"n": 1}, dedup_key="flaky:1")
+    outbox.enqueue("test_flaky", {"n": 1}, dedup_key="flaky:1")
+    db.session.commit()
+    assert OutboxMessage.query.count() == 1
+
+    assert outbox.process_batch() == 1
+    msg = OutboxMessage.query.one()
+    assert (msg.status, msg.attempts, msg.last_error) == ("pending", 1, "boom")
+    assert msg.next_attempt_at > datetime.utcnow()
+    assert outbox.process_batch() == 0  # not due yet
+
+    msg.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    assert outbox.process_batch() == 1
+    msg = OutboxMessage.query.one()
+    assert (msg.status, msg.attempts) == ("sent", 2)
+    assert calls == [[{"n": 1}], [{"n": 1}]]
+
+
+
+def test_purge_drops_old_sent_and_failed_rows(app):
+    now = datetime.utcnow()
+    old_sent = now - timedelta(days=outbox.RETENTION_DAYS + 1)
+    old_failed = now - timedelta(days=outbox.FAILED_RETENTION_DAYS + 1)
+    db.session.add_all([
+        OutboxMessage(kind="k", payload={"n": 1}, status="sent", sent_at=old_sent, created_at=old_sent),
+        OutboxMessage(kind="k", payload={"n": 2}, status="sent", sent_at=now),
+        OutboxMessage(kind="k", payload={"n": 3}, status="failed", created_at=old_failed),
+        OutboxMessage(kind="k", payload={"n": 4}, status="failed", created_at=now),
+        OutboxMessage(kind="k", payload={"n": 5}, status="pending", created_at=old_failed),
+    ])
+    db.session.commit()
+
+    assert outbox.purge_outbox() == 2
+    assert sorted(m.payload["n"] for m in OutboxMessage.query) == [2, 4, 5]
+
+def test_check_in_alert_goes_through_outbox(client, app, graph_api):
+    db.session.add_all([WhatsAppConfig(phone_number="919900000001", label="Boss"),
+                        WhatsAppConfig(phone_number="919900000002")])
+    db.session.commit()
+    register_user(client, "Emp", "emp@test.com", "pass", "employee")
+    headers = {"Authorization": f"Bearer {login_user(client, 'emp@test.com', 'pass')}"}
+
+    assert client.post("/attendance/check-in", headers=headers).status_code == 200
+    queued = OutboxMessage.query.order_by(OutboxMessage.id).all()
+    assert [m.payload["to"] for m in queued] == ["919900000001", "919900000002"]
+    assert [m.payload["params"][0] for m in queued] == ["Boss", "Team"]
+    assert graph_api.stats()["received"] == 0  # nothing sent from the request
+
+    assert outbox.process_batch() == 2
+    assert outbox.outbox_stats() == {"pending": 0, "sent": 2, "failed": 0}
+    assert graph_api.stats()["received"] == 2
+
+
+def test_check_in_out_alerts_coalesce_into_digest(client, app, graph_api):
+    db.session.add_all([WhatsAppConfig(phone_number="919900000001", label="Boss"),
+                        WhatsAppConfig(phone_number="919900000002", label="Ops")])
+    db.session.commit()
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    admin_headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    res = client.patch("/admin/whatsapp/schedule", headers=admin_headers,
+                       json={"alert_digest_window_minutes": 5})
+    assert res.status_code == 200
+    assert client.patch("/admin/whatsapp/schedule", headers=admin_headers,
+                        json={"alert_digest_window_minutes": -1}).status_code == 400
+
+    for name in ("Asha", "Ravi", "Meera"):
+        register_user(client, name, f"{name.lower()}@test.com", "pass", "employee")
+        headers = {"Authorization": f"Bearer {login_user(client, f'{name.lower()}@test.com', 'pass')}"}
+        client.post("/attendance/check-in", headers=headers)
+    client.post("/attendance/check-out", headers=headers)
+
+    queued = OutboxMessage.query.all()
+    assert len(queued) == 8 and {m.kind for m in queued} == {"whatsapp_digest"}
+    assert outbox.process_batch() == 0  # held until the window closes
+
+    OutboxMessage.query.update({"next_attempt_at": datetime.utcnow()})
+    db.session.commit()
+    assert outbox.process_batch(limit=1) == 8  # the whole window goes out together
+    digests = sorted(graph_api.accepted, key=lambda p: p["to"])
+    assert len(digests) == 2
+    params = [p["text"] for p in digests[0]["template"]["components"][0]["parameters"]]
+    assert params[:2] == ["Boss", "3"]
+    assert [n.split(" (")[0] for n in params[2].split(", ")] == ["Asha", "Ravi", "Meera"]
+    assert params[3] == "1" and params[4].startswith("Meera (")
+
+
+def test_emails_go_out_in_batches_over_one_pooled_connection(app, smtp_server):
+    from app.mail import send_html_emails
+    from app.mail_transport import get_pool
+
+    emails = [(f"Report {i}", f"<p>{i}</p>", [f"user{i}@test.com"]) for i in range(20)]
+    assert send_html_emails(emails) == [True] * 20
+    assert smtp_server.stats() == {"connections": 1, "logins": 1, "messages": 20}
+    assert smtp_server.messages[3]["to"] == ["user3@test.com"]
+
+    # The server drops the idle connection: the pool reconnects and retries
+    smtp_server.drop_connections()
+    assert send_html_emails(emails[:2]) == [True, True]
+    assert smtp_server.stats()["connections"] == 2
+    assert get_pool().stats()["sent"] == 22
+
+
+def test_digest_windows_follow_the_office_clock():
+    from app.office_config import OFFICE_TZ
+    from app.whatsapp import seconds_to_window_end
+
+    # 10:10 office time: an hourly digest goes at 11:00 local, not at :30
+    now = datetime(2026, 3, 2, 10, 10, tzinfo=OFFICE_TZ)
+    assert seconds_to_window_end(60, now) == 50 * 60
+    assert seconds_to_window_end(120, now) == 110 * 60
+    assert seconds_to_window_end(5, now) == 5 * 60
@@ -0,0 +1,98 @@
+from app import whatsapp
+
+
+def test_fan_out_reuses_connections(graph_api):
+    messages = [(f"91990000{n:04d}", "daily_attendence_v2", [f"Emp {n}", "30 minutes"]) for n in range(40)]
+    outcome = whatsapp.fan_out(messages)
+    assert outcome == {"sent": 40, "failed": 0}
+    stats = graph_api.stats()
+    assert stats["received"] == 40
+    assert stats["connections"] <= whatsapp.WHATSAPP_CONCURRENCY
+
+
+def test_fan_out_retries_server_errors(graph_api):
+    graph_api.fail_rate = 1.0
+    outcome = whatsapp.fan_out([("919900000001", "attendence_daily_v3", ["Emp"])])
+    assert outcome == {"sent": 0, "failed": 1}
+    assert graph_api.stats()["received"] == whatsapp.MAX_RETRIES
+
+
+def test_scheduled_job_runs_once_and_catches_up_within_grace(app, monkeypatch):
+    from datetime import datetime
+    from app import whatsapp_jobs
+    from app.extensions import db
+    from app.models.whatsapp_schedule import WhatsAppScheduleConfig
+    from app.office_config import OFFICE_TZ
+
+    WhatsAppScheduleConfig.get_current().midnight_alert_time = "23:50"
+    db.session.commit()
+    runs = []
+    job = whatsapp_jobs.JOBS["midnight_alert"]
+    monkeypatch.setitem(whatsapp_jobs.JOBS, "midnight_alert",
+                        job._replace(run=lambda settings, board: runs.append(board.day)))
+
+    def at(day, hm):
+        return datetime.strptime(f"2026-03-{day:02d} {hm}", "%Y-%m-%d %H:%M").replace(tzinfo=OFFICE_TZ)
+
+    assert not whatsapp_jobs.run_job("midnight_alert", now=at(10, "23:49"))   # not due yet
+    # Process was down at 23:50; a restart 20 minutes later (past midnight) catches up
+    assert whatsapp_jobs.run_job("midnight_alert", now=at(11, "00:10"))
+    assert not whatsapp_jobs.run_job("midnight_alert", now=at(11, "00:11"))   # exactly once
+    assert runs == [at(10, "23:50").date()]
+
+    # Too late to be useful: skipped rather than sent
+    assert not whatsapp_jobs.run_job("midnight_alert", now=at(12, "00:30"))
+    assert whatsapp_jobs.run_job("midnight_alert", now=at(12, "23:50"))
+    assert len(runs) == 2
+
+
+class _RecordingScheduler:
+    """Stands in for the leader's APScheduler: records what gets planned."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def remove_job(self, job_id):
+        del self.jobs[job_id]
+
+    def add_job(self, func, trigger=None, args=None, id=None, **kwargs):
+        self.jobs[id] = (trigger, args)
+
+
+def test_schedule_patch_in_a_worker_replans_and_catches_up_in_the_leader(client, app, monkeypatch):
+    from datetime import datetime, timedelta
+    from app import cache_sync, whatsapp_jobs
+    from app.models.whatsapp_schedule import WhatsAppScheduleConfig
+    from app.office_config import OFFICE_TZ
+    from tests.utils import register_user, login_user
+
+    register_user(client, "Admin", "admin@test.com", "pass", "admin")
+    headers = {"Authorization": f"Bearer {login_user(client, 'admin@test.com', 'pass')}"}
+    old = WhatsAppScheduleConfig.get_current().to_dict()
+    cache_sync.sync()  # baseline
+
+    # The worker handling the PATCH runs no scheduler, so can't re-plan itself
+    assert whatsapp_jobs._scheduler is None
+    now = datetime.now(OFFICE_TZ)
+    due = (now - timedelta(minutes=2)).strftime("%H:%M")
+    if due == old["evening_report_time"]:
+        due = (now - timedelta(minutes=3)).strftime("%H:%M")
+    res = client.patch("/admin/whatsapp/schedule", headers=headers, json={"evening_report_time": due})
+    assert res.status_code == 200
+
+    # The leader: planned from the old config, then its sync thread ticks
+    leader = _RecordingScheduler()
+    monkeypatch.setattr(whatsapp_jobs, "_scheduler", leader)
+    monkeypatch.setattr(whatsapp_jobs, "_app", app)
+    monkeypatch.setattr(whatsapp_jobs, "_plan", {job_id: old[job.time_field]
+                                                 for job_id, job in whatsapp_jobs.JOBS.items()})
+    assert cache_sync.sync() == ["whatsapp_schedule"]
+
+    trigger, args = leader.jobs["whatsapp_evening_report"]
+    assert (str(trigger.fields[5]), str(trigger.fields[6])) == (str(int(due[:2])), str(int(due[3:])))
+    # 2 minutes late: run now rather than tomorrow (run_job claims it, so once)
+    assert leader.jobs["whatsapp_evening_report_catch_up"] == (None, ["evening_report"])
+    assert set(leader.jobs) == {"whatsapp_evening_report", "whatsapp_evening_report_catch_up"}
@@ -242,6 +242,19 @@ export const AdminPanel = () => {
     fetchEmployees();
   }, [employeeFilters]);
 
+  // Live check-ins / check-outs: patch the listed employee in place
+  useEffect(() => {
+    return adminService.subscribeAttendanceEvents(
+      (event) => setEmployees((prev) => prev.map((emp) => emp.id === event.id ? {
+        ...emp,
+        today_status: event.today_status,
+        check_in_time: event.check_in_time,
+        check_out_time: event.check_out_time,
+      } : emp)),
+      () => fetchEmployees(),
+    );
+  }, [employeeFilters]);
+
   useEffect(() => {
     fetchLeaves();
   }, [leaveFilters]);
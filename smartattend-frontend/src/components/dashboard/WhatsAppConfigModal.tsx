@@ -37,6 +37,7 @@ const DEFAULT_SCHEDULE: WhatsAppSchedule = {
     midnight_alert_enabled: true,
     checkin_alert_enabled: true,
     checkout_alert_enabled: true,
+    alert_digest_window_minutes: 0,
 };
 
 export const WhatsAppConfigSection = () => {
@@ -229,6 +230,22 @@ export const WhatsAppConfigSection = () => {
                                                 </div>
                                             </div>
                                         ))}
+                                        <div className="flex items-center gap-3 p-2.5 rounded-lg border border-gray-200 dark:border-gray-700 bg-white dark:bg-gray-900">
+                                            <div className="flex-1 min-w-0">
+                                                <p className="text-xs font-medium text-gray-700 dark:text-gray-300">📦 Digest Window (minutes)</p>
+                                                <p className="text-[11px] text-gray-400 dark:text-gray-500">Bundle check-in/out alerts into one message per window (0 = send instantly)</p>
+                                            </div>
+                                            <Input
+                                                type="number"
+                                                min={0}
+                                                max={120}
+                                                value={schedule.alert_digest_window_minutes}
+                                                onChange={(e: React.ChangeEvent<HTMLInputElement>) =>
+                                                    setSchedule(prev => ({ ...prev, alert_digest_window_minutes: Math.max(0, parseInt(e.target.value, 10) || 0) }))}
+                                                className="w-20 text-sm"
+                                                disabled={!schedule.checkin_alert_enabled && !schedule.checkout_alert_enabled}
+                                            />
+                                        </div>
                                     </div>
                                 </div>
 
@@ -5,6 +5,8 @@ export const API_CONFIG = {
   // Use empty string in production so requests go to the same origin (Nginx will proxy to backend)
   // Use localhost in dev environment
   BASE_URL: import.meta.env.PROD ? '' : 'http://localhost:8000',
+  // Live dashboard events are served on their own port (Nginx proxies /events/ in production)
+  EVENTS_URL: import.meta.env.PROD ? '' : 'http://localhost:8001',
   DUMMY_DELAY: 500, // Simulate network delay for dummy responses
 };
 
@@ -13,6 +13,14 @@ export interface Employee {
   check_out_time: string | null;
 }
 
+/** One employee's new state, pushed on check-in, check-out or overtime toggle. */
+export interface AttendanceEvent extends Pick<Employee, 'id' | 'name' | 'check_in_time' | 'check_out_time'> {
+  type: 'check_in' | 'check_out' | 'overtime';
+  date: string;
+  today_status: 'checked_in' | 'checked_out';
+  is_overtime: boolean;
+}
+
 export interface AdminLeave {
   id: number;
   user_id: number;
@@ -153,17 +161,36 @@ class AdminService {
     if (!response.ok) {
       throw new Error(data.error || 'Bulk upload failed');
     }
-    return data;
+
+    // The import runs as a background job — poll until it finishes
+    let job: BulkUploadJob = data;
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const statusResponse = await fetch(
+        `${API_CONFIG.BASE_URL}/admin/employees/bulk-upload/${job.job_id}`,
+        { headers: authService.getAuthHeaders() },
+      );
+      job = await statusResponse.json();
+      if (!statusResponse.ok) {
+        throw new Error((job as unknown as { error?: string }).error || 'Failed to fetch upload status');
+      }
+    }
+
+    if (job.status !== 'done' || !job.result) {
+      throw new Error(job.error || 'Bulk upload failed');
+    }
+    return job.result;
   }
 
   getCsvTemplateUrl(): string {
     return `${API_CONFIG.BASE_URL}/admin/employees/csv-template`;
   }
 
-  async sendDailyReport(): Promise<{ message: string }> {
+  async sendDailyReport(options: ReportOptions = {}): Promise<{ message: string }> {
     const response = await fetch(`${API_CONFIG.BASE_URL}/admin/send-daily-report`, {
       method: 'POST',
       headers: authService.getAuthHeaders(),
+      body: JSON.stringify(options),
     });
 
     const data = await response.json();
@@ -173,9 +200,68 @@ class AdminService {
     return data;
   }
 
-  getPreviewReportUrl(): string {
-    const token = localStorage.getItem('token');
-    return `${API_CONFIG.BASE_URL}/admin/preview-daily-report?token=${token}`;
+  /**
+   * Subscribe to live attendance events. `onEvent` gets each delta to patch
+   * into the roster; `onResync` fires when events were missed and the roster
+   * should be re-fetched. Returns a function that closes the stream.
+   *
+   * Each connection needs a fresh one-time ticket (the login token must not
+   * appear in the stream URL), so instead of EventSource's own reconnect the
+   * stream is reopened with a new ticket, resuming after the last event seen.
+   */
+  subscribeAttendanceEvents(
+    onEvent: (event: AttendanceEvent) => void,
+    onResync: () => void,
+  ): () => void {
+    let source: EventSource | null = null;
+    let lastEventId = '';
+    let closed = false;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+
+    const reconnect = () => {
+      if (!closed) retry = setTimeout(connect, 3000);
+    };
+
+    const connect = async () => {
+      try {
+        const response = await fetch(`${API_CONFIG.BASE_URL}/admin/event-stream/ticket`, {
+          method: 'POST',
+          headers: authService.getAuthHeaders(),
+        });
+        if (!response.ok) throw new Error('Failed to get an event stream ticket');
+        const { ticket } = await response.json();
+        if (closed) return;
+
+        const params = new URLSearchParams({ ticket });
+        if (lastEventId) params.set('lastEventId', lastEventId);
+        source = new EventSource(`${API_CONFIG.EVENTS_URL}/events/attendance?${params}`);
+        source.addEventListener('attendance', (e) => {
+          lastEventId = (e as MessageEvent).lastEventId;
+          onEvent(JSON.parse((e as MessageEvent).data));
+        });
+        source.addEventListener('resync', onResync);
+        source.onerror = () => {
+          source?.close();
+          reconnect();
+        };
+      } catch {
+        reconnect();
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      source?.close();
+    };
+  }
+
+  getPreviewReportUrl(options: ReportOptions = {}): string {
+    const params = new URLSearchParams({ token: localStorage.getItem('token') || '' });
+    if (options.date) params.set('date', options.date);
+    if (options.period) params.set('period', options.period);
+    return `${API_CONFIG.BASE_URL}/admin/preview-daily-report?${params}`;
   }
 
   // ── Holiday Management ────────────────────────────────────────────────
@@ -239,6 +325,25 @@ class AdminService {
     return response.json();
   }
 
+  // ── Leave Balances ──────────────────────────────────────────────────
+
+  async getLeaveBalances(year?: number, filters: SearchFilters = {}): Promise<EmployeeLeaveBalance[]> {
+    const queryParams = this.buildQueryParams(filters);
+    const params = new URLSearchParams(queryParams);
+    if (year) params.set('year', year.toString());
+    const response = await fetch(`${API_CONFIG.BASE_URL}/admin/leave-balances?${params.toString()}`, {
+      method: 'GET',
+      headers: authService.getAuthHeaders(),
+    });
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.message || 'Failed to fetch leave balances');
+    }
+
+    return response.json();
+  }
+
   // ── Weekend Configuration ────────────────────────────────────────────
 
   async getWeekendConfig(): Promise<{ weekend_days: number[]; weekend_days_string: string }> {
@@ -381,6 +486,7 @@ export interface WhatsAppSchedule {
   midnight_alert_enabled: boolean;
   checkin_alert_enabled: boolean;
   checkout_alert_enabled: boolean;
+  alert_digest_window_minutes: number;
 }
 
 export interface Holiday {
@@ -390,6 +496,31 @@ export interface Holiday {
   type: string;
 }
 
+export interface ReportOptions {
+  date?: string;  // YYYY-MM-DD, default today
+  period?: 'daily' | 'weekly' | 'monthly';
+}
+
+export interface EmployeeLeaveBalance {
+  user_id: number;
+  name: string;
+  email: string;
+  year: number;
+  total: number;
+  used: number;
+  pending: number;
+  available: number;
+}
+
+export interface BulkUploadJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'done' | 'failed';
+  total: number;
+  processed: number;
+  error: string | null;
+  result?: BulkUploadResult;
+}
+
 export interface BulkUploadResult {
   message: string;
   created: { row: number; email: string; name: string }[];
@@ -1,6 +1,16 @@
 import { authService } from './authService';
 import { API_CONFIG } from '@/config/api';
 
+export interface LeavePreview {
+  start_date: string;
+  end_date: string;
+  leave_type: string;
+  working_days: number;
+  breakdown: { year: number; working_days: number; available: number | null }[];
+  ok: boolean;
+  error: string | null;
+}
+
 class RequestService {
   async applyLeave(leaveData: { start_date: string; end_date: string; reason: string; leave_type?: string }) {
     const response = await fetch(`${API_CONFIG.BASE_URL}/request/leave/apply`, {
@@ -90,6 +100,21 @@ class RequestService {
     return response.json();
   }
 
+  async previewLeave(params: { start_date: string; end_date: string; leave_type?: string }): Promise<LeavePreview> {
+    const query = new URLSearchParams(params as Record<string, string>).toString();
+    const response = await fetch(`${API_CONFIG.BASE_URL}/request/leave/preview?${query}`, {
+      method: 'GET',
+      headers: authService.getAuthHeaders(),
+    });
+
+    if (!response.ok) {
+      const error = await response.json();
+      throw new Error(error.error || error.message || 'Failed to preview leave');
+    }
+
+    return response.json();
+  }
+
   async getLeaveBalance(year?: number) {
     const params = year ? `?year=${year}` : '';
     const response = await fetch(`${API_CONFIG.BASE_URL}/request/leave/balance${params}`, {